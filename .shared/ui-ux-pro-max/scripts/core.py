@@ -8,7 +8,9 @@ import csv
 import re
 from pathlib import Path
 from math import log
-from collections import defaultdict
+from collections import defaultdict, Counter
+from functools import lru_cache
+from heapq import nlargest
 
 # ============ CONFIGURATION ============
 DATA_DIR = Path(__file__).parent.parent / "data"
@@ -87,10 +89,12 @@ class BM25:
         self.k1 = k1
         self.b = b
         self.corpus = []
+        self.term_freqs = []
         self.doc_lengths = []
         self.avgdl = 0
         self.idf = {}
         self.doc_freqs = defaultdict(int)
+        self.postings = defaultdict(list)
         self.N = 0
 
     def tokenize(self, text):
@@ -104,34 +108,32 @@ class BM25:
         self.N = len(self.corpus)
         if self.N == 0:
             return
+        self.term_freqs = [Counter(doc) for doc in self.corpus]
         self.doc_lengths = [len(doc) for doc in self.corpus]
         self.avgdl = sum(self.doc_lengths) / self.N
 
-        for doc in self.corpus:
-            seen = set()
-            for word in doc:
-                if word not in seen:
-                    self.doc_freqs[word] += 1
-                    seen.add(word)
+        for idx, freqs in enumerate(self.term_freqs):
+            norm = 1 - self.b + self.b * self.doc_lengths[idx] / self.avgdl
+            for word, tf in freqs.items():
+                self.doc_freqs[word] += 1
+                # Saturated term frequency, to be multiplied by the IDF
+                self.postings[word].append((idx, tf * (self.k1 + 1) / (tf + self.k1 * norm)))
 
         for word, freq in self.doc_freqs.items():
             self.idf[word] = log((self.N - freq + 0.5) / (freq + 0.5) + 1)
 
     def score(self, query):
         """Score all documents against query"""
-        query_tokens = self.tokenize(query)
+        query_tokens = [t for t in self.tokenize(query) if t in self.idf]
         scores = []
 
-        for idx, doc in enumerate(self.corpus):
+        for idx, term_freqs in enumerate(self.term_freqs):
             score = 0
             doc_len = self.doc_lengths[idx]
-            term_freqs = defaultdict(int)
-            for word in doc:
-                term_freqs[word] += 1
 
             for token in query_tokens:
-                if token in self.idf:
-                    tf = term_freqs[token]
+                tf = term_freqs[token]
+                if tf:
                     idf = self.idf[token]
                     numerator = tf * (self.k1 + 1)
                     denominator = tf + self.k1 * (1 - self.b + self.b * doc_len / self.avgdl)
@@ -141,6 +143,15 @@ class BM25:
 
         return sorted(scores, key=lambda x: x[1], reverse=True)
 
+    def max_score(self, tokens):
+        """Upper bound of score() for tokens in this corpus (every term saturated).
+
+        Tokens missing from the corpus count at the IDF of a term no document
+        contains, so a corpus matching only part of the query cannot reach 1.0.
+        """
+        unseen = log((self.N + 0.5) / 0.5 + 1)
+        return sum(self.idf.get(token, unseen) for token in tokens) * (self.k1 + 1)
+
 
 # ============ SEARCH FUNCTIONS ============
 def _load_csv(filepath):
@@ -149,19 +160,25 @@ def _load_csv(filepath):
         return list(csv.DictReader(f))
 
 
-def _search_csv(filepath, search_cols, output_cols, query, max_results):
-    """Core search function using BM25"""
-    if not filepath.exists():
-        return []
-
+@lru_cache(maxsize=None)
+def _load_index(filepath, search_cols):
+    """Load CSV and build its BM25 index once per process"""
     data = _load_csv(filepath)
 
     # Build documents from search columns
     documents = [" ".join(str(row.get(col, "")) for col in search_cols) for row in data]
 
-    # BM25 search
     bm25 = BM25()
     bm25.fit(documents)
+    return data, bm25
+
+
+def _search_csv(filepath, search_cols, output_cols, query, max_results):
+    """Core search function using BM25"""
+    if not filepath.exists():
+        return []
+
+    data, bm25 = _load_index(filepath, tuple(search_cols))
     ranked = bm25.score(query)
 
     # Get top results with score > 0
@@ -236,3 +253,77 @@ def search_stack(query, stack, max_results=MAX_RESULTS):
         "count": len(results),
         "results": results
     }
+
+
+@lru_cache(maxsize=None)
+def _all_index(include_stacks):
+    """Every domain (and stack) with a data file, plus one inverted index over all of them.
+
+    Returns:
+        ([(label, data, bm25, output_cols)], {token: [(corpus, row, score)]})
+    """
+    sources = [
+        ({"domain": domain}, DATA_DIR / config["file"], config["search_cols"], config["output_cols"])
+        for domain, config in CSV_CONFIG.items()
+    ]
+    if include_stacks:
+        sources += [
+            ({"domain": "stack", "stack": stack}, DATA_DIR / config["file"],
+             _STACK_COLS["search_cols"], _STACK_COLS["output_cols"])
+            for stack, config in STACK_CONFIG.items()
+        ]
+    corpora = [
+        (label, *_load_index(filepath, tuple(search_cols)), output_cols)
+        for label, filepath, search_cols, output_cols in sources
+        if filepath.exists()
+    ]
+
+    postings = defaultdict(list)
+    for corpus, (_, _, bm25, _) in enumerate(corpora):
+        for token, docs in bm25.postings.items():
+            idf = bm25.idf[token]
+            postings[token] += [(corpus, idx, idf * weight) for idx, weight in docs]
+    return corpora, postings
+
+
+def search_all(query, max_results=MAX_RESULTS, include_stacks=True):
+    """Search every domain (and stack) and merge the rankings.
+
+    Raw BM25 scores depend on each corpus' IDF table, so every hit is divided
+    by the best score its corpus could give the whole query before merging:
+    query terms that occur in any corpus count towards every corpus' ceiling.
+    Only rows containing a query term are visited, through one inverted
+    index over all corpora, so this costs about as much as a search().
+    """
+    corpora, postings = _all_index(include_stacks)
+
+    # Terms no corpus knows are dropped, as score() drops them
+    tokens = [token for token in dict.fromkeys(BM25().tokenize(query)) if token in postings]
+    scores = defaultdict(float)
+    for token in tokens:
+        for corpus, idx, score in postings[token]:
+            scores[corpus, idx] += score
+    ceilings = {corpus: corpora[corpus][2].max_score(tokens) for corpus in {corpus for corpus, _ in scores}}
+
+    # Ties keep corpus order, then row order
+    ranked = nlargest(max_results, (
+        (round(score / ceilings[corpus], 4), -corpus, -idx) for (corpus, idx), score in scores.items()
+    ))
+    results = []
+    for score, corpus, idx in ranked:
+        corpus, idx = -corpus, -idx
+        label, data, _, output_cols = corpora[corpus]
+        row = data[idx]
+        results.append({
+            **label,
+            "score": score,
+            "result": {col: row.get(col, "") for col in output_cols if col in row},
+        })
+
+    return {
+        "domain": "all",
+        "query": query,
+        "file": "*",
+        "count": len(results),
+        "results": results
+    }
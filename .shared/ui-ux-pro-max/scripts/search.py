@@ -2,14 +2,14 @@
 # -*- coding: utf-8 -*-
 """
 UI/UX Pro Max Search - BM25 search engine for UI/UX style guides
-Usage: python search.py "<query>" [--domain <domain>] [--stack <stack>] [--max-results 3]
+Usage: python search.py "<query>" [--domain <domain> | --stack <stack> | --all] [--max-results 3]
 
 Domains: style, prompt, color, chart, landing, product, ux, typography
 Stacks: html-tailwind, react, nextjs
 """
 
 import argparse
-from core import CSV_CONFIG, AVAILABLE_STACKS, MAX_RESULTS, search, search_stack
+from core import CSV_CONFIG, AVAILABLE_STACKS, MAX_RESULTS, search, search_stack, search_all
 
 
 def format_output(result):
@@ -27,7 +27,12 @@ def format_output(result):
     output.append(f"**Source:** {result['file']} | **Found:** {result['count']} results\n")
 
     for i, row in enumerate(result['results'], 1):
-        output.append(f"### Result {i}")
+        if "result" in row:
+            source = row.get("stack") or row["domain"]
+            output.append(f"### Result {i} ({source}, score {row['score']})")
+            row = row["result"]
+        else:
+            output.append(f"### Result {i}")
         for key, value in row.items():
             value_str = str(value)
             if len(value_str) > 300:
@@ -43,6 +48,7 @@ if __name__ == "__main__":
     parser.add_argument("query", help="Search query")
     parser.add_argument("--domain", "-d", choices=list(CSV_CONFIG.keys()), help="Search domain")
     parser.add_argument("--stack", "-s", choices=AVAILABLE_STACKS, help="Stack-specific search (html-tailwind, react, nextjs)")
+    parser.add_argument("--all", "-a", action="store_true", help="Search every domain and stack, merged ranking")
     parser.add_argument("--max-results", "-n", type=int, default=MAX_RESULTS, help="Max results (default: 3)")
     parser.add_argument("--json", action="store_true", help="Output as JSON")
 
@@ -51,6 +57,8 @@ if __name__ == "__main__":
     # Stack search takes priority
     if args.stack:
         result = search_stack(args.query, args.stack, args.max_results)
+    elif args.all:
+        result = search_all(args.query, args.max_results)
     else:
         result = search(args.query, args.domain, args.max_results)
 
@@ -0,0 +1,285 @@
+"""
+Admission control.
+Every API request passes a per-user token bucket (request rate) and then
+waits for an in-flight slot under a per-process and a per-user limit.
+Waiters are admitted by priority class (writes, then reads, then reports)
+and give up at their class's deadline. Rejected requests get 429 with
+Retry-After instead of queueing on the small connection pool.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from enum import IntEnum
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+
+from .auth import decode_access_token
+from .config import get_settings
+from . import metrics
+
+settings = get_settings()
+
+# Paths never limited: probes, metrics, docs and long-lived event streams
+EXEMPT_PREFIXES = ("/health", "/ready", "/metrics", "/events", "/docs", "/redoc", "/openapi.json")
+
+# Buckets kept in memory, least recently used evicted first
+MAX_BUCKETS = 10000
+
+
+class Priority(IntEnum):
+    """Admission order when requests queue; lower runs first."""
+    WRITE = 0
+    READ = 1
+    REPORT = 2
+
+
+def classify(method: str, path: str) -> Priority:
+    if method in ("POST", "PUT", "PATCH", "DELETE"):
+        return Priority.WRITE
+    if path.startswith("/reports"):
+        return Priority.REPORT
+    return Priority.READ
+
+
+def _max_wait(priority: Priority) -> float:
+    return {
+        Priority.WRITE: settings.ADMISSION_WRITE_WAIT_SECONDS,
+        Priority.READ: settings.ADMISSION_READ_WAIT_SECONDS,
+        Priority.REPORT: settings.ADMISSION_REPORT_WAIT_SECONDS,
+    }[priority]
+
+
+# ============== Rate (token buckets) ==============
+
+class MemoryBuckets:
+    """Token buckets of this process."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """
+        Take a token from the key's bucket.
+
+        Returns:
+            0 if taken, else seconds until a token is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            granted = tokens >= 1
+            self._buckets[key] = (tokens - 1 if granted else tokens, now)
+            if len(self._buckets) > MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        return 0.0 if granted else (1 - tokens) / self.rate
+
+
+class SharedBuckets:
+    """
+    Token buckets in a SQLite file, shared by the worker processes of a
+    host. Each take is one atomic UPSERT; the store fails open.
+    """
+
+    def __init__(self, path: str, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._takes = itertools.count()
+        self._connection = sqlite3.connect(path, timeout=0.05, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, granted INTEGER NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> float:
+        """Like MemoryBuckets.take."""
+        now = time.time()  # Wall clock: monotonic clocks differ between processes
+        refill = "min(:burst, tokens + (:now - updated) * :rate)"
+        try:
+            with self._lock:
+                tokens, granted = self._connection.execute(
+                    f"""
+                    INSERT INTO buckets (key, tokens, updated, granted) VALUES (:key, :burst - 1, :now, 1)
+                    ON CONFLICT (key) DO UPDATE SET
+                        tokens = CASE WHEN {refill} >= 1 THEN {refill} - 1 ELSE {refill} END,
+                        granted = {refill} >= 1,
+                        updated = :now
+                    RETURNING tokens, granted
+                    """,
+                    {"key": key, "now": now, "rate": self.rate, "burst": self.burst},
+                ).fetchone()
+                if next(self._takes) % 1000 == 0:
+                    # Idle buckets are full again; drop them
+                    self._connection.execute(
+                        "DELETE FROM buckets WHERE updated < ?", (now - self.burst / self.rate,)
+                    )
+        except sqlite3.Error:
+            return 0.0
+        return 0.0 if granted else (1 - tokens) / self.rate
+
+
+# ============== Concurrency (in-flight slots) ==============
+
+class Limiter:
+    """
+    Per-process and per-user in-flight limits with a priority queue.
+    Used from the event loop only.
+    """
+
+    def __init__(self, global_limit: int, user_limit: int, max_queue: int):
+        self.global_limit = global_limit
+        self.user_limit = user_limit
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._user_in_flight: Counter = Counter()
+        self._waiters: list = []  # heap of (priority, seq, user, future), live waiters only
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _can_run(self, user: str) -> bool:
+        return self.in_flight < self.global_limit and self._user_in_flight[user] < self.user_limit
+
+    def _start(self, user: str) -> None:
+        self.in_flight += 1
+        self._user_in_flight[user] += 1
+
+    async def acquire(self, user: str, priority: Priority, timeout: float) -> Optional[str]:
+        """
+        Wait for a slot.
+
+        Returns:
+            None once admitted, else why not: "queue_full" or "deadline".
+        """
+        if self._can_run(user) and not self._waiters:
+            self._start(user)
+            return None
+        if len(self._waiters) >= self.max_queue:
+            return "queue_full"
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (priority, next(self._seq), user, future)
+        heapq.heappush(self._waiters, waiter)
+        self._admit()  # Free slots may be held back only by other users' limits
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if not future.done():
+                self._abandon(waiter)
+                return "deadline"
+        except asyncio.CancelledError:
+            if future.done():
+                self.release(user)  # Admitted just as the client left
+            else:
+                self._abandon(waiter)
+            raise
+        return None
+
+    def _abandon(self, waiter: tuple) -> None:
+        """Take a waiter that gave up out of the queue."""
+        waiter[3].cancel()
+        self._waiters.remove(waiter)
+        heapq.heapify(self._waiters)
+
+    def release(self, user: str) -> None:
+        self.in_flight -= 1
+        self._user_in_flight[user] -= 1
+        if not self._user_in_flight[user]:
+            del self._user_in_flight[user]
+        self._admit()
+
+    def _admit(self) -> None:
+        """Start the highest-priority waiters that fit, skipping users at their limit."""
+        blocked = []
+        while self._waiters and self.in_flight < self.global_limit:
+            waiter = heapq.heappop(self._waiters)
+            future, user = waiter[3], waiter[2]
+            if self._user_in_flight[user] >= self.user_limit:
+                blocked.append(waiter)
+                continue
+            self._start(user)
+            future.set_result(None)
+        for waiter in blocked:
+            heapq.heappush(self._waiters, waiter)
+
+
+# ============== Middleware ==============
+
+buckets = (
+    SharedBuckets(settings.ADMISSION_SHARED_STORE, settings.ADMISSION_RATE_PER_SECOND, settings.ADMISSION_BURST)
+    if settings.ADMISSION_SHARED_STORE
+    else MemoryBuckets(settings.ADMISSION_RATE_PER_SECOND, settings.ADMISSION_BURST)
+)
+limiter = Limiter(
+    settings.ADMISSION_GLOBAL_CONCURRENCY, settings.ADMISSION_USER_CONCURRENCY, settings.ADMISSION_MAX_QUEUE
+)
+
+metrics.counter("admission_rejected_total", "Requests shed with 429, by reason and priority class")
+metrics.gauge("admission_in_flight", "Requests holding an in-flight slot")(lambda: limiter.in_flight)
+metrics.gauge("admission_queued", "Requests waiting for an in-flight slot")(lambda: limiter.queued)
+
+
+def _client_key(scope) -> str:
+    """The JWT's user, or the client address for anonymous requests."""
+    for name, value in scope["headers"]:
+        if name == b"authorization" and value[:7].lower() == b"bearer ":
+            token_data = decode_access_token(value[7:].decode("latin-1"))
+            if token_data and token_data.user_id is not None:
+                return f"user:{token_data.user_id}"
+            break
+    client = scope.get("client")
+    return f"addr:{client[0] if client else 'unknown'}"
+
+
+class AdmissionMiddleware:
+    """Applies the rate and in-flight limits to HTTP requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.ADMISSION_ENABLED
+            or scope["path"] == "/"
+            or scope["path"].startswith(EXEMPT_PREFIXES)
+        ):
+            return await self.app(scope, receive, send)
+
+        key = _client_key(scope)
+        priority = classify(scope["method"], scope["path"])
+
+        retry_after = buckets.take(key)
+        if retry_after:
+            return await self._reject(scope, receive, send, "rate", priority, retry_after)
+
+        rejected = await limiter.acquire(key, priority, _max_wait(priority))
+        if rejected:
+            return await self._reject(scope, receive, send, rejected, priority, 1)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(key)
+
+    @staticmethod
+    async def _reject(scope, receive, send, reason: str, priority: Priority, retry_after: float):
+        metrics.inc("admission_rejected_total", reason=reason, priority=priority.name.lower())
+        response = JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests, try again later"},
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,335 @@
+"""
+Anomaly detection job.
+Streams transactions created since the last run and flags unusually large
+amounts (per-category robust z-scores) and duplicate charges. NumPy is
+imported by the functions that use it, so app startup doesn't pay for it.
+
+Run periodically, e.g. from a CronJob:
+    python -m app.anomalies
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
+
+from .database import SessionLocal, engine
+from . import models
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "anomaly_scan"
+
+# Rows fetched per round trip from the server-side cursor
+CHUNK_SIZE = 5000
+
+# IDs are allocated at insert but become visible at commit, so a lower ID
+# can appear after a higher one was scanned. Rows are scanned once they
+# are this old; write transactions must commit within it.
+SETTLE_SECONDS = 300
+
+# Amounts before a transaction in its category used as its baseline
+HISTORY_WINDOW = 100
+MIN_HISTORY = 5
+
+# Robust z-score (MAD based) above which an amount is flagged;
+# the classic z-score threshold is used when MAD is 0
+ROBUST_Z_THRESHOLD = 3.5
+Z_THRESHOLD = 3.0
+
+# Scales MAD to the standard deviation of a normal distribution
+MAD_SCALE = 0.6745
+
+
+# ============== Vectorized statistics ==============
+
+def trailing_windows(
+    groups: "np.ndarray",
+    order: "np.ndarray",
+    values: "np.ndarray",
+    rows: "np.ndarray"
+) -> "np.ndarray":
+    """
+    Baseline of each of the given rows: the values of the HISTORY_WINDOW rows
+    before it (by order) in its group, most recent first, NaN padded.
+
+    Returns:
+        Array of shape (len(rows), HISTORY_WINDOW).
+    """
+    import numpy as np
+    ranked = np.lexsort((order, groups))
+    position = np.empty(len(ranked), dtype=np.int64)
+    position[ranked] = np.arange(len(ranked))
+    sorted_groups = groups[ranked]
+    sorted_values = values[ranked]
+
+    positions = position[rows]
+    group_starts = np.searchsorted(sorted_groups, sorted_groups[positions], side="left")
+    windows = np.full((len(rows), HISTORY_WINDOW), np.nan)
+    for back in range(1, HISTORY_WINDOW + 1):
+        earlier = positions - back
+        present = earlier >= group_starts
+        if not present.any():
+            break
+        windows[present, back - 1] = sorted_values[earlier[present]]
+    return windows
+
+
+def flag_large_amounts(windows: "np.ndarray", amounts: "np.ndarray") -> tuple:
+    """
+    Score each amount against its own baseline (a row of windows).
+    The score is the robust z-score 0.6745 * (x - median) / MAD, or the
+    classic z-score when MAD is 0; rows with too little history score 0.
+
+    Returns:
+        Tuple of (scores, flagged mask).
+    """
+    import numpy as np
+    scores = np.zeros(len(amounts))
+    flagged = np.zeros(len(amounts), dtype=bool)
+    enough = np.count_nonzero(~np.isnan(windows), axis=1) >= MIN_HISTORY
+    if not enough.any():
+        return scores, flagged
+
+    history = windows[enough]
+    x = amounts[enough]
+    medians = np.nanmedian(history, axis=1)
+    mad = np.nanmedian(np.abs(history - medians[:, None]), axis=1)
+    std = np.nanstd(history, axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        robust = MAD_SCALE * (x - medians) / mad
+        classic = (x - np.nanmean(history, axis=1)) / std
+    scores[enough] = np.where(mad > 0, robust, np.where(std > 0, classic, 0.0))
+    flagged[enough] = scores[enough] > np.where(mad > 0, ROBUST_Z_THRESHOLD, Z_THRESHOLD)
+    return scores, flagged
+
+
+# ============== Chunk processing ==============
+
+def _load_history(db: Session, category_ids: List[int], before_id: int) -> tuple:
+    """Last HISTORY_WINDOW (id, category, amount) of each category before before_id, as arrays."""
+    import numpy as np
+    recency = func.row_number().over(
+        partition_by=models.Transaction.category_id,
+        order_by=models.Transaction.id.desc(),
+    ).label("recency")
+    ranked = select(
+        models.Transaction.id,
+        models.Transaction.category_id,
+        models.Transaction.amount,
+        recency,
+    ).where(
+        models.Transaction.category_id.in_(category_ids),
+        models.Transaction.id < before_id,
+    ).subquery()
+    rows = db.execute(
+        select(ranked.c.id, ranked.c.category_id, ranked.c.amount).where(ranked.c.recency <= HISTORY_WINDOW)
+    ).all()
+    return (
+        np.fromiter((r.id for r in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((r.category_id for r in rows), dtype=np.int64, count=len(rows)),
+        np.fromiter((r.amount for r in rows), dtype=np.float64, count=len(rows)),
+    )
+
+
+def _day_bounds(db: Session, column) -> tuple:
+    """Start of the day of a datetime column and of the next day, in the database's dialect."""
+    if db.get_bind().dialect.name == "sqlite":
+        return func.datetime(column, "start of day"), func.datetime(column, "start of day", "+1 day")
+    start = func.date_trunc("day", column)
+    return start, start + timedelta(days=1)
+
+
+def _find_duplicates(db: Session, transaction_ids: List[int]) -> dict:
+    """
+    Map each given transaction to the number of earlier transactions with
+    the same user, amount, day and description.
+    Earlier rows are matched on a date range of the transaction's day, a
+    range scan of the (user_id, date) index; the description is compared
+    on that day's rows only.
+    """
+    earlier = aliased(models.Transaction)
+    t = models.Transaction
+    day_start, next_day = _day_bounds(db, t.date)
+    rows = db.execute(
+        select(t.id, func.count(earlier.id)).join(
+            earlier,
+            (earlier.user_id == t.user_id)
+            & (earlier.date >= day_start)
+            & (earlier.date < next_day)
+            & (earlier.amount == t.amount)
+            & (func.coalesce(func.lower(func.trim(earlier.description)), "")
+               == func.coalesce(func.lower(func.trim(t.description)), ""))
+            & (earlier.id < t.id)
+        ).where(t.id.in_(transaction_ids)).group_by(t.id)
+    ).all()
+    return {r[0]: r[1] for r in rows}
+
+
+def _scan_chunk(db: Session, rows: list) -> List[models.Anomaly]:
+    """Build anomalies for one chunk of (id, user_id, category_id, amount) rows."""
+    import numpy as np
+    anomalies = []
+    now = datetime.utcnow()
+
+    categorized = [r for r in rows if r.category_id is not None]
+    if categorized:
+        ids = np.fromiter((r.id for r in categorized), dtype=np.int64, count=len(categorized))
+        category_ids = np.fromiter((r.category_id for r in categorized), dtype=np.int64, count=len(categorized))
+        amounts = np.fromiter((r.amount for r in categorized), dtype=np.float64, count=len(categorized))
+
+        # Each row is scored against the rows before it: the history
+        # preceding the chunk, then the chunk's own earlier rows
+        history_ids, history_categories, history_amounts = _load_history(
+            db, np.unique(category_ids).tolist(), int(ids.min())
+        )
+        windows = trailing_windows(
+            np.concatenate((history_categories, category_ids)),
+            np.concatenate((history_ids, ids)),
+            np.concatenate((history_amounts, amounts)),
+            np.arange(len(history_ids), len(history_ids) + len(ids)),
+        )
+        scores, flagged = flag_large_amounts(windows, amounts)
+
+        users = {r.id: r.user_id for r in categorized}
+        for index in np.flatnonzero(flagged):
+            transaction_id = int(ids[index])
+            anomalies.append(models.Anomaly(
+                user_id=users[transaction_id],
+                transaction_id=transaction_id,
+                kind=models.AnomalyKind.LARGE_AMOUNT,
+                score=float(scores[index]),
+                detected_at=now,
+            ))
+
+    users = {r.id: r.user_id for r in rows}
+    for transaction_id, copies in _find_duplicates(db, list(users)).items():
+        anomalies.append(models.Anomaly(
+            user_id=users[transaction_id],
+            transaction_id=transaction_id,
+            kind=models.AnomalyKind.DUPLICATE,
+            score=float(copies),
+            detected_at=now,
+        ))
+
+    return anomalies
+
+
+def _scan_horizon(db: Session, last_id: int, settled_before: datetime) -> Optional[int]:
+    """Lowest ID above last_id of a row created at or after settled_before (None if there is none)."""
+    return db.execute(
+        select(func.min(models.Transaction.id)).where(
+            models.Transaction.id > last_id,
+            models.Transaction.created_at >= settled_before,
+        )
+    ).scalar()
+
+
+def _stream_new_transactions(last_id: int, chunk_size: int, horizon: Optional[int] = None) -> Iterator[list]:
+    """
+    Yield chunks of transactions with ID above last_id (and below horizon),
+    in ID order.
+    PostgreSQL streams through a server-side cursor on a dedicated
+    connection. SQLite has no server-side cursors and an open read blocks
+    commits, so it falls back to keyset pages.
+    """
+    columns = (
+        models.Transaction.id,
+        models.Transaction.user_id,
+        models.Transaction.category_id,
+        models.Transaction.amount,
+    )
+
+    bounds = [models.Transaction.id < horizon] if horizon is not None else []
+
+    if engine.dialect.name != "sqlite":
+        stream = select(*columns).where(
+            models.Transaction.id > last_id, *bounds
+        ).order_by(models.Transaction.id)
+        with engine.connect() as reader:
+            result = reader.execution_options(
+                stream_results=True, yield_per=chunk_size
+            ).execute(stream)
+            yield from result.partitions()
+        return
+
+    while True:
+        with engine.connect() as reader:
+            rows = reader.execute(
+                select(*columns).where(
+                    models.Transaction.id > last_id, *bounds
+                ).order_by(models.Transaction.id).limit(chunk_size)
+            ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def run_anomaly_scan(
+    chunk_size: int = CHUNK_SIZE,
+    on_chunk: Optional[Callable[[int], None]] = None,
+    settle_seconds: float = SETTLE_SECONDS
+) -> int:
+    """
+    Scan transactions created since the last watermark.
+    Memory stays bounded by chunk_size. Each chunk's anomalies and the
+    advanced watermark commit together, so an interrupted run resumes
+    after the last finished chunk. The scan stops before the first row
+    younger than settle_seconds; that row and the ones after it wait for
+    a later run.
+
+    Args:
+        chunk_size: Rows per chunk.
+        on_chunk: Called with the new watermark after each chunk commits.
+        settle_seconds: Minimum age of scanned rows.
+
+    Returns:
+        Number of anomalies recorded.
+    """
+    db = SessionLocal()
+    recorded = 0
+    try:
+        watermark = db.get(models.JobWatermark, WATERMARK_NAME)
+        if watermark is None:
+            watermark = models.JobWatermark(name=WATERMARK_NAME, last_id=0)
+            db.add(watermark)
+            db.commit()
+
+        horizon = _scan_horizon(db, watermark.last_id, datetime.utcnow() - timedelta(seconds=settle_seconds))
+        for rows in _stream_new_transactions(watermark.last_id, chunk_size, horizon):
+            anomalies = _scan_chunk(db, rows)
+            db.add_all(anomalies)
+            watermark.last_id = rows[-1].id
+            db.commit()
+            recorded += len(anomalies)
+            logger.info("Anomaly scan: %d rows up to id %d, %d flagged", len(rows), rows[-1].id, len(anomalies))
+            if on_chunk:
+                on_chunk(rows[-1].id)
+    finally:
+        db.close()
+    return recorded
+
+
+def get_anomalies(
+    db: Session,
+    user_id: int,
+    kind: Optional[models.AnomalyKind] = None,
+    limit: int = 50
+) -> List[models.Anomaly]:
+    """Get the user's most recently flagged transactions."""
+    query = db.query(models.Anomaly).filter(models.Anomaly.user_id == user_id)
+
+    if kind:
+        query = query.filter(models.Anomaly.kind == kind)
+
+    return query.order_by(models.Anomaly.detected_at.desc(), models.Anomaly.id.desc()).limit(limit).all()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Recorded {run_anomaly_scan()} anomalies")
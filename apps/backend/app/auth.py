@@ -8,6 +8,7 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.orm import Session
 
 from .config import get_settings
@@ -125,7 +126,10 @@ async def get_current_user(
     if token_data is None:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    email = token_data.email
+    user = db.scalars(lambda_stmt(
+        lambda: select(models.User).where(models.User.email == email).limit(1)
+    )).first()
     if user is None:
         raise credentials_exception
     
@@ -0,0 +1,194 @@
+"""
+Auto-categorization module.
+Suggests a category for a transaction description from the user's own
+history, using a BM25-weighted index of description tokens per category.
+"""
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from math import log
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from . import models
+
+settings = get_settings()
+
+# BM25 parameters (same defaults as the UI/UX search engine)
+K1 = 1.5
+B = 0.75
+
+# Descriptions loaded per user when (re)building an index
+TRAINING_LIMIT = 5000
+
+_TOKEN_RE = re.compile(r"[^\w\s]")
+
+
+def tokenize(text: Optional[str]) -> list:
+    """Lowercase, drop punctuation, numbers and words shorter than 3 letters."""
+    if not text:
+        return []
+    words = _TOKEN_RE.sub(" ", text.lower()).split()
+    return [w for w in words if len(w) > 2 and not w.isdigit()]
+
+
+class CategoryIndex:
+    """
+    Token index over one user's categorized descriptions.
+    Each category is scored as a BM25 document made of all its
+    descriptions; an inverted index keeps lookups proportional to the
+    query's tokens rather than the number of categories.
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Counter] = defaultdict(Counter)  # token -> {category: tf}
+        self.lengths: Counter = Counter()  # category -> token count
+        self.total_length = 0
+
+    def add(self, description: Optional[str], category_id: int) -> None:
+        """Learn one (description, category) pair."""
+        tokens = tokenize(description)
+        for token in tokens:
+            self.postings[token][category_id] += 1
+        self.lengths[category_id] += len(tokens)
+        self.total_length += len(tokens)
+
+    def suggest(self, description: Optional[str], allowed: Set[int]) -> Optional[Tuple[int, float]]:
+        """Best matching category among allowed and its score, or None if nothing matches."""
+        tokens = set(tokenize(description))
+        categories = len(self.lengths)
+        if not tokens or not categories:
+            return None
+
+        avg_length = self.total_length / categories
+        scores: Counter = Counter()
+        for token in tokens:
+            posting = self.postings.get(token)
+            if not posting:
+                continue
+            idf = log((categories - len(posting) + 0.5) / (len(posting) + 0.5) + 1)
+            for category_id, tf in posting.items():
+                if category_id not in allowed:
+                    continue
+                norm = 1 - B + B * self.lengths[category_id] / avg_length
+                scores[category_id] += idf * tf * (K1 + 1) / (tf + K1 * norm)
+
+        if not scores:
+            return None
+        return scores.most_common(1)[0]
+
+
+class _Entry:
+    """A user's cached index and category IDs; index is None until built."""
+
+    def __init__(self):
+        self.index: Optional[CategoryIndex] = None
+        self.live: Set[int] = set()
+
+
+# user_id -> _Entry, least recently used first. forget() drops the entry,
+# so a build that started before it finds another entry (or none) when it
+# finishes and is not cached.
+_entries: "OrderedDict[int, _Entry]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _build_index(db: Session, user_id: int) -> Tuple[CategoryIndex, Set[int]]:
+    """
+    Train an index on the user's most recent categorized descriptions.
+
+    Returns:
+        The index and the IDs of the user's categories.
+    """
+    live = set(db.scalars(select(models.Category.id).where(models.Category.user_id == user_id)))
+    rows = db.query(
+        models.Transaction.description,
+        models.Transaction.category_id,
+    ).filter(
+        models.Transaction.user_id == user_id,
+        models.Transaction.category_id.is_not(None),
+        models.Transaction.description.is_not(None),
+    ).order_by(models.Transaction.id.desc()).limit(TRAINING_LIMIT).all()
+
+    index = CategoryIndex()
+    for description, category_id in rows:
+        index.add(description, category_id)
+    return index, live
+
+
+def _get_entry(db: Session, user_id: int) -> _Entry:
+    """
+    Cached index and category IDs of a user, built on first use.
+    forget() only reaches the worker that made the change: a caller that
+    finds a suggested category gone calls forget() and asks again.
+    """
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is None:
+            entry = _entries[user_id] = _Entry()
+            while len(_entries) > settings.CATEGORIZER_CACHE_SIZE:
+                _entries.popitem(last=False)
+        _entries.move_to_end(user_id)
+        if entry.index is not None:
+            return entry
+
+    index, live = _build_index(db, user_id)
+    with _lock:
+        if _entries.get(user_id) is not entry:
+            entry = _Entry()  # Forgotten while building: may predate the change
+        entry.index, entry.live = index, live
+    return entry
+
+
+def suggest(db: Session, user_id: int, description: Optional[str]) -> Optional[Tuple[int, float]]:
+    """
+    Suggest a category for a description.
+
+    Returns:
+        Tuple of (category_id, score) or None if no history matches.
+    """
+    return suggest_many(db, user_id, [description])[0]
+
+
+def suggest_many(
+    db: Session,
+    user_id: int,
+    descriptions: List[Optional[str]]
+) -> List[Optional[Tuple[int, float]]]:
+    """
+    Suggest categories for several descriptions of one user. Only the
+    user's categories are suggested, as of the cached index: a category
+    another worker just deleted can still come back (see _get_entry).
+
+    Returns:
+        A (category_id, score) tuple or None per description.
+    """
+    if not any(tokenize(description) for description in descriptions):
+        return [None] * len(descriptions)
+    entry = _get_entry(db, user_id)
+    with _lock:
+        return [entry.index.suggest(description, entry.live) for description in descriptions]
+
+
+def learn(user_id: int, description: Optional[str], category_id: Optional[int]) -> None:
+    """
+    Add a new (description, category) pair to the user's index if it's
+    cached. The category was just used, so it exists even if another
+    worker created it.
+    """
+    if category_id is None or not description:
+        return
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is not None and entry.index is not None:
+            entry.index.add(description, category_id)
+            entry.live.add(category_id)
+
+
+def forget(user_id: int) -> None:
+    """Drop the user's index and category IDs; both are reloaded on next use."""
+    with _lock:
+        _entries.pop(user_id, None)
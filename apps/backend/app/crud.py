@@ -1,46 +1,122 @@
 """
 CRUD operations module.
 Database operations for User, Category, and Transaction models.
+Hot per-request lookups are lambda statements: SQLAlchemy caches both
+the statement construction and its compilation, keyed on the lambda's
+code location, and only binds the new parameter values.
 """
+import hashlib
+from collections import Counter
 from datetime import datetime
-from typing import Optional, List, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from typing import Callable, Optional, List, Tuple
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy import func, extract, insert, lambda_stmt, select, update, case, cast, literal, literal_column
+from sqlalchemy.dialects.postgresql import INTERVAL, insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 
-from . import models, schemas
+from . import categorizer, events, models, schemas
 from .auth import get_password_hash
 
 
+def _dialect_insert(db: Session, model):
+    """Dialect-specific INSERT construct (supports ON CONFLICT)."""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite_insert(model)
+    return pg_insert(model)
+
+
 # ============== User CRUD ==============
 
 def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
     """Get user by email address."""
-    return db.query(models.User).filter(models.User.email == email).first()
+    return db.scalars(lambda_stmt(
+        lambda: select(models.User).where(models.User.email == email).limit(1)
+    )).first()
 
 
 def get_user_by_id(db: Session, user_id: int) -> Optional[models.User]:
     """Get user by ID."""
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    return db.scalars(lambda_stmt(
+        lambda: select(models.User).where(models.User.id == user_id).limit(1)
+    )).first()
 
 
-def create_user(db: Session, user: schemas.UserCreate) -> models.User:
+def create_user(db: Session, user: schemas.UserCreate) -> Optional[models.User]:
     """
     Create a new user with hashed password.
+    A taken email is found by a probe of the unique email index, before
+    paying for the password hash. The INSERT ... ON CONFLICT DO NOTHING
+    still settles concurrent sign-ups with the same email.
     
     Args:
         db: Database session.
         user: UserCreate schema with email and password.
     
     Returns:
-        Created User model instance.
+        Created User model instance, or None if the email is taken.
     """
+    taken = get_user_by_email(db, user.email) is not None
+    db.rollback()  # Don't hold the read's transaction open while hashing
+    if taken:
+        return None
     hashed_password = get_password_hash(user.password)
-    db_user = models.User(
-        email=user.email,
-        hashed_password=hashed_password,
-        oauth_provider=models.OAuthProvider.LOCAL,
+    db_user = db.scalars(
+        _dialect_insert(db, models.User).values(
+            email=user.email,
+            hashed_password=hashed_password,
+            oauth_provider=models.OAuthProvider.LOCAL,
+        ).on_conflict_do_nothing(index_elements=["email"]).returning(models.User)
+    ).first()
+    db.commit()
+    return db_user
+
+
+def upsert_oauth_user(
+    db: Session,
+    email: str,
+    oauth_provider: models.OAuthProvider,
+    oauth_id: str
+) -> models.User:
+    """
+    Create an OAuth user, or link the provider to an existing local account.
+    Accounts already linked to a provider keep their link.
+    
+    Returns:
+        The created or existing User.
+    """
+    stmt = _dialect_insert(db, models.User).values(
+        email=email,
+        hashed_password=None,  # No password for OAuth users
+        oauth_provider=oauth_provider,
+        oauth_id=oauth_id,
     )
-    db.add(db_user)
+    is_local = models.User.oauth_provider == models.OAuthProvider.LOCAL
+    # DO UPDATE (rather than a filtered one) so RETURNING always yields the row
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["email"],
+        set_={
+            "oauth_provider": case((is_local, stmt.excluded.oauth_provider), else_=models.User.oauth_provider),
+            "oauth_id": case((is_local, stmt.excluded.oauth_id), else_=models.User.oauth_id),
+        },
+    ).returning(models.User)
+    db_user = db.scalars(stmt, execution_options={"populate_existing": True}).one()
+    db.commit()
+    return db_user
+
+
+def update_user(
+    db: Session,
+    db_user: models.User,
+    user_update: schemas.UserUpdate
+) -> models.User:
+    """Update the current user's settings."""
+    update_data = user_update.model_dump(exclude_unset=True, exclude_none=True)
+    
+    for key, value in update_data.items():
+        setattr(db_user, key, value)
+    
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -74,10 +150,12 @@ def get_categories(
 
 def get_category(db: Session, category_id: int, user_id: int) -> Optional[models.Category]:
     """Get a specific category by ID, ensuring it belongs to the user."""
-    return db.query(models.Category).filter(
-        models.Category.id == category_id,
-        models.Category.user_id == user_id
-    ).first()
+    return db.scalars(lambda_stmt(
+        lambda: select(models.Category).where(
+            models.Category.id == category_id,
+            models.Category.user_id == user_id
+        ).limit(1)
+    )).first()
 
 
 def create_category(
@@ -86,14 +164,15 @@ def create_category(
     user_id: int
 ) -> models.Category:
     """Create a new category for a user."""
-    db_category = models.Category(
-        name=category.name,
-        type=models.TransactionType(category.type.value),
-        user_id=user_id,
-    )
-    db.add(db_category)
+    db_category = db.scalars(
+        insert(models.Category).values(
+            name=category.name,
+            type=models.TransactionType(category.type.value),
+            user_id=user_id,
+        ).returning(models.Category)
+    ).one()
+    _record_changes(db, user_id, models.ChangeEntity.CATEGORY, _ids(models.Category, db_category.id))
     db.commit()
-    db.refresh(db_category)
     return db_category
 
 
@@ -112,10 +191,16 @@ def update_category(
     
     if "type" in update_data:
          update_data["type"] = models.TransactionType(update_data["type"].value)
+         if update_data["type"] != db_category.type:
+             # Flips the sign of every transaction in the category
+             _record_balance_change(db, user_id, _earliest_date(
+                 db, models.Transaction.category_id == category_id
+             ))
 
     for key, value in update_data.items():
         setattr(db_category, key, value)
-        
+    
+    _record_changes(db, user_id, models.ChangeEntity.CATEGORY, _ids(models.Category, category_id))
     db.commit()
     db.refresh(db_category)
     return db_category
@@ -124,21 +209,94 @@ def update_category(
 def delete_category(db: Session, category_id: int, user_id: int) -> bool:
     """
     Delete a category by ID.
+    Issued as a single DELETE; the database sets category_id to NULL on
+    the category's transactions (ON DELETE SET NULL).
     
     Returns:
         True if deleted, False if not found.
     """
-    category = get_category(db, category_id, user_id)
-    if not category:
-        return False
+    # Uncategorized transactions drop out of the totals
+    _record_balance_change(db, user_id, _earliest_date(
+        db,
+        models.Transaction.category_id == category_id,
+        models.Transaction.user_id == user_id
+    ))
+    _record_changes(db, user_id, models.ChangeEntity.TRANSACTION, select(models.Transaction.id).where(
+        models.Transaction.category_id == category_id,
+        models.Transaction.user_id == user_id
+    ))
+    _record_changes(db, user_id, models.ChangeEntity.CATEGORY, select(models.Category.id).where(
+        models.Category.id == category_id,
+        models.Category.user_id == user_id
+    ), deleted=True)
     
-    db.delete(category)
+    deleted = db.query(models.Category).filter(
+        models.Category.id == category_id,
+        models.Category.user_id == user_id
+    ).delete(synchronize_session=False)
     db.commit()
-    return True
+    categorizer.forget(user_id)
+    return deleted > 0
+
+
+def merge_category(
+    db: Session,
+    source: models.Category,
+    target: models.Category
+) -> models.Category:
+    """
+    Move every transaction of source into target, then delete source.
+    Runs as one UPDATE plus one DELETE inside a single transaction.
+    Source and target have the same type (the router rejects others), so
+    the user's totals and checkpoints are unaffected.
+    
+    Returns:
+        The target category.
+    """
+    _record_changes(db, source.user_id, models.ChangeEntity.TRANSACTION, select(models.Transaction.id).where(
+        models.Transaction.category_id == source.id,
+        models.Transaction.user_id == source.user_id
+    ))
+    _record_changes(db, source.user_id, models.ChangeEntity.CATEGORY, _ids(models.Category, source.id), deleted=True)
+    
+    db.query(models.Transaction).filter(
+        models.Transaction.category_id == source.id,
+        models.Transaction.user_id == source.user_id
+    ).update({models.Transaction.category_id: target.id}, synchronize_session=False)
+    
+    db.query(models.Category).filter(
+        models.Category.id == source.id
+    ).delete(synchronize_session=False)
+    
+    db.commit()
+    categorizer.forget(target.user_id)
+    db.refresh(target)
+    return target
 
 
 # ============== Transaction CRUD ==============
 
+def _transaction_filters(
+    user_id: int,
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> list:
+    """Build the WHERE criteria shared by transaction listing and bulk operations."""
+    criteria = [models.Transaction.user_id == user_id]
+    
+    if category_id:
+        criteria.append(models.Transaction.category_id == category_id)
+    
+    if start_date:
+        criteria.append(models.Transaction.date >= start_date)
+    
+    if end_date:
+        criteria.append(models.Transaction.date <= end_date)
+    
+    return criteria
+
+
 def get_transactions(
     db: Session,
     user_id: int,
@@ -165,35 +323,62 @@ def get_transactions(
     Returns:
         Tuple of (list of transactions, total count).
     """
-    query = db.query(models.Transaction).filter(models.Transaction.user_id == user_id)
-    
-    if category_id:
-        query = query.filter(models.Transaction.category_id == category_id)
+    def filtered(stmt):
+        # Each optional filter is its own cached lambda, so every
+        # combination of filters compiles once
+        if category_id:
+            stmt += lambda s: s.where(models.Transaction.category_id == category_id)
+        if start_date:
+            stmt += lambda s: s.where(models.Transaction.date >= start_date)
+        if end_date:
+            stmt += lambda s: s.where(models.Transaction.date <= end_date)
+        if transaction_type:
+            # Filter by category type
+            category_type = models.TransactionType(transaction_type)
+            stmt += lambda s: s.join(models.Category).where(models.Category.type == category_type)
+        return stmt
     
-    if start_date:
-        query = query.filter(models.Transaction.date >= start_date)
-    
-    if end_date:
-        query = query.filter(models.Transaction.date <= end_date)
-    
-    if transaction_type:
-        # Filter by category type
-        query = query.join(models.Category).filter(
-            models.Category.type == models.TransactionType(transaction_type)
-        )
-    
-    total = query.count()
-    transactions = query.order_by(models.Transaction.date.desc()).offset(skip).limit(limit).all()
+    total = db.scalar(filtered(lambda_stmt(
+        lambda: select(func.count(models.Transaction.id)).where(models.Transaction.user_id == user_id)
+    )))
+    page = filtered(lambda_stmt(
+        lambda: select(models.Transaction).where(models.Transaction.user_id == user_id)
+    ))
+    page += lambda s: s.order_by(models.Transaction.date.desc()).offset(skip).limit(limit)
+    transactions = db.scalars(page).all()
     
     return transactions, total
 
 
 def get_transaction(db: Session, transaction_id: int, user_id: int) -> Optional[models.Transaction]:
     """Get a specific transaction by ID, ensuring it belongs to the user."""
-    return db.query(models.Transaction).filter(
-        models.Transaction.id == transaction_id,
-        models.Transaction.user_id == user_id
-    ).first()
+    return db.scalars(lambda_stmt(
+        lambda: select(models.Transaction).where(
+            models.Transaction.id == transaction_id,
+            models.Transaction.user_id == user_id
+        ).limit(1)
+    )).first()
+
+
+def _suggest_category(
+    db: Session,
+    user_id: int,
+    description: Optional[str]
+) -> Optional[Tuple[models.Category, float]]:
+    """
+    Suggested category of a description and its score.
+    The categorizer caches the user's category IDs; if the suggestion was
+    deleted by another worker, the cache is dropped and asked once more.
+    """
+    for _ in range(2):
+        suggestion = categorizer.suggest(db, user_id, description)
+        if not suggestion:
+            return None
+        category = get_category(db, suggestion[0], user_id)
+        if category:
+            return category, suggestion[1]
+        categorizer.forget(user_id)
+    return None
 
 
 def create_transaction(
@@ -204,27 +389,261 @@ def create_transaction(
     """
     Create a new transaction.
     
+    Without a category_id, the category is suggested from the description.
+    
     Returns:
-        Created Transaction or None if category doesn't exist.
+        Created Transaction or None if category doesn't exist
+        (or none could be suggested).
     """
-    # Verify category exists and belongs to user
-    category = get_category(db, transaction.category_id, user_id)
-    if not category:
-        return None
+    if transaction.category_id is None:
+        suggestion = _suggest_category(db, user_id, transaction.description)
+        if not suggestion:
+            return None
+        category = suggestion[0]
+    else:
+        # Verify category exists and belongs to user
+        category = get_category(db, transaction.category_id, user_id)
+        if not category:
+            return None
+    category_id = category.id
     
-    db_transaction = models.Transaction(
-        amount=transaction.amount,
-        description=transaction.description,
-        date=transaction.date,
-        category_id=transaction.category_id,
-        user_id=user_id,
-    )
-    db.add(db_transaction)
+    _record_balance_change(db, user_id, transaction.date)
+    db_transaction = db.scalars(
+        insert(models.Transaction).values(
+            amount=transaction.amount,
+            description=transaction.description,
+            date=transaction.date,
+            category_id=category_id,
+            user_id=user_id,
+        ).returning(models.Transaction)
+    ).one()
+    _record_changes(db, user_id, models.ChangeEntity.TRANSACTION, _ids(models.Transaction, db_transaction.id))
     db.commit()
-    db.refresh(db_transaction)
+    # Callers may use the row after this session closes
+    set_committed_value(db_transaction, "category", category)
+    categorizer.learn(user_id, db_transaction.description, category_id)
     return db_transaction
 
 
+def create_transactions_batch(
+    db: Session,
+    entries: List[Tuple[int, schemas.TransactionCreate]]
+) -> List[Optional[models.Transaction]]:
+    """
+    Create transactions of several requests (and users) in one commit.
+    Categories are checked with one query and rows are inserted with one
+    multi-row INSERT ... RETURNING; used by the group-commit write buffer.
+    
+    Args:
+        db: Database session.
+        entries: (user_id, transaction) pairs.
+    
+    Returns:
+        Per entry, the created Transaction or None if its category doesn't
+        exist (or none could be suggested).
+    """
+    category_ids = [transaction.category_id for _, transaction in entries]
+    categories = {}
+    unresolved = range(len(entries))
+    # A second pass re-suggests categories another worker deleted
+    for _ in range(2):
+        for i in unresolved:
+            user_id, transaction = entries[i]
+            if transaction.category_id is None:
+                suggestion = categorizer.suggest(db, user_id, transaction.description)
+                category_ids[i] = suggestion[0] if suggestion else None
+        wanted = {category_ids[i] for i in unresolved if category_ids[i] is not None} - categories.keys()
+        if wanted:
+            categories.update(
+                (c.id, c) for c in db.query(models.Category).filter(models.Category.id.in_(wanted))
+            )
+        unresolved = [
+            i for i in unresolved
+            if entries[i][1].category_id is None and category_ids[i] is not None and category_ids[i] not in categories
+        ]
+        if not unresolved:
+            break
+        for user_id in {entries[i][0] for i in unresolved}:
+            categorizer.forget(user_id)
+    valid = [
+        i for i, ((user_id, _), category_id) in enumerate(zip(entries, category_ids))
+        if category_id in categories and categories[category_id].user_id == user_id
+    ]
+    results: List[Optional[models.Transaction]] = [None] * len(entries)
+    if not valid:
+        return results
+    
+    # Lock users in a fixed order
+    users = sorted({entries[i][0] for i in valid})
+    for user_id in users:
+        _record_balance_change(db, user_id, min(entries[i][1].date for i in valid if entries[i][0] == user_id))
+    
+    created = db.scalars(
+        insert(models.Transaction).returning(models.Transaction, sort_by_parameter_order=True),
+        [
+            {
+                "amount": entries[i][1].amount,
+                "description": entries[i][1].description,
+                "date": entries[i][1].date,
+                "category_id": category_ids[i],
+                "user_id": entries[i][0],
+            }
+            for i in valid
+        ],
+    ).all()
+    for user_id in users:
+        _record_changes(db, user_id, models.ChangeEntity.TRANSACTION, select(models.Transaction.id).where(
+            models.Transaction.id.in_([t.id for t in created if t.user_id == user_id])
+        ))
+    db.commit()
+    
+    for i, db_transaction in zip(valid, created):
+        # Callers use the rows after this session closes
+        set_committed_value(db_transaction, "category", categories[db_transaction.category_id])
+        categorizer.learn(db_transaction.user_id, db_transaction.description, db_transaction.category_id)
+        results[i] = db_transaction
+    return results
+
+
+def _normalize_description(description: Optional[str]) -> str:
+    """Lowercase and collapse whitespace so statement re-exports compare equal."""
+    return " ".join((description or "").lower().split())
+
+
+def _fingerprints(items: List[schemas.TransactionCreate]) -> List[str]:
+    """
+    Fingerprint each item by day, amount in cents and normalized description.
+    Identical lines within one batch are numbered, so a statement with two
+    equal charges imports both and re-importing it skips both.
+    """
+    seen = Counter()
+    fingerprints = []
+    for item in items:
+        key = f"{item.date.date().isoformat()}|{round(item.amount * 100)}|{_normalize_description(item.description)}"
+        seen[key] += 1
+        fingerprints.append(hashlib.sha256(f"{key}|{seen[key]}".encode()).hexdigest())
+    return fingerprints
+
+
+# Rows per INSERT of an import; on_batch runs between them
+IMPORT_BATCH_SIZE = 1000
+
+
+def import_transactions(
+    db: Session,
+    user_id: int,
+    items: List[schemas.TransactionCreate],
+    skip_duplicates: bool = True,
+    on_batch: Optional[Callable[[float], None]] = None
+) -> Optional[schemas.TransactionImportResult]:
+    """
+    Create many transactions with multi-row INSERTs of IMPORT_BATCH_SIZE
+    rows, committed together.
+    Rows without a category_id get the category suggested from their
+    description. Category validation is all-or-nothing.
+    
+    With skip_duplicates, rows are fingerprinted and inserted with
+    ON CONFLICT DO NOTHING against the (user_id, fingerprint) unique index,
+    so lines already imported are skipped by an index probe.
+    
+    on_batch, if given, is called with the share of rows inserted after
+    each INSERT, before the commit.
+    
+    Returns:
+        Import result, or None if a category is invalid or can't be suggested.
+    """
+    uncategorized = [item for item in items if item.category_id is None]
+    auto_categorized = len(uncategorized)
+    # A second pass re-suggests categories another worker deleted
+    for _ in range(2):
+        suggestions = iter(categorizer.suggest_many(db, user_id, [item.description for item in uncategorized]))
+        category_ids = []
+        for item in items:
+            category_id = item.category_id
+            if category_id is None:
+                suggestion = next(suggestions)
+                if not suggestion:
+                    return None
+                category_id = suggestion[0]
+            category_ids.append(category_id)
+        
+        # Verify all categories with one query
+        owned = set(db.scalars(select(models.Category.id).where(
+            models.Category.user_id == user_id,
+            models.Category.id.in_(set(category_ids)),
+        )))
+        missing = set(category_ids) - owned
+        if not missing:
+            break
+        if any(item.category_id in missing for item in items):
+            return None
+        categorizer.forget(user_id)
+    else:
+        return None
+    
+    fingerprints = _fingerprints(items) if skip_duplicates else [None] * len(items)
+    rows = [
+        {
+            "amount": item.amount,
+            "description": item.description,
+            "date": item.date,
+            "category_id": category_id,
+            "user_id": user_id,
+            "fingerprint": fingerprint,
+        }
+        for item, category_id, fingerprint in zip(items, category_ids, fingerprints)
+    ]
+    _record_balance_change(db, user_id, min(item.date for item in items))
+    
+    ids = []
+    for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+        batch = rows[start:start + IMPORT_BATCH_SIZE]
+        if skip_duplicates:
+            stmt = _dialect_insert(db, models.Transaction).on_conflict_do_nothing(
+                index_elements=["user_id", "fingerprint"],
+                index_where=models.Transaction.fingerprint.is_not(None),
+            ).returning(models.Transaction.id, models.Transaction.fingerprint)
+            inserted = {r.fingerprint: r.id for r in db.execute(stmt, batch)}
+            ids += [inserted.get(row["fingerprint"]) for row in batch]
+        else:
+            ids += db.scalars(
+                insert(models.Transaction).returning(models.Transaction.id, sort_by_parameter_order=True),
+                batch,
+            ).all()
+        if on_batch:
+            on_batch(len(ids) / len(rows))
+    
+    created_ids = [transaction_id for transaction_id in ids if transaction_id is not None]
+    if created_ids:
+        _record_changes(db, user_id, models.ChangeEntity.TRANSACTION, select(models.Transaction.id).where(
+            models.Transaction.id.in_(created_ids)
+        ))
+    db.commit()
+    
+    for item, category_id, transaction_id in zip(items, category_ids, ids):
+        if transaction_id is not None:
+            categorizer.learn(user_id, item.description, category_id)
+    
+    return schemas.TransactionImportResult(
+        created=len(created_ids),
+        skipped=len(ids) - len(created_ids),
+        auto_categorized=auto_categorized,
+        ids=ids,
+    )
+
+
+def suggest_category(
+    db: Session,
+    user_id: int,
+    description: str
+) -> Optional[schemas.CategorySuggestion]:
+    """Suggest a category for a description, or None without a match."""
+    suggestion = _suggest_category(db, user_id, description)
+    if not suggestion:
+        return None
+    return schemas.CategorySuggestion(category_id=suggestion[0].id, score=suggestion[1])
+
+
 def update_transaction(
     db: Session,
     transaction_id: int,
@@ -249,11 +668,19 @@ def update_transaction(
         if not category:
             return None
     
+    if update_data.keys() & BALANCE_FIELDS:
+        _record_balance_change(
+            db, user_id, min(db_transaction.date, update_data.get("date") or db_transaction.date)
+        )
+    
     for key, value in update_data.items():
         setattr(db_transaction, key, value)
     
+    _record_changes(db, user_id, models.ChangeEntity.TRANSACTION, _ids(models.Transaction, transaction_id))
     db.commit()
     db.refresh(db_transaction)
+    if update_data.keys() & CATEGORIZER_FIELDS:
+        categorizer.forget(user_id)
     return db_transaction
 
 
@@ -268,11 +695,414 @@ def delete_transaction(db: Session, transaction_id: int, user_id: int) -> bool:
     if not transaction:
         return False
     
+    _record_balance_change(db, user_id, transaction.date)
+    _record_changes(db, user_id, models.ChangeEntity.TRANSACTION, _ids(models.Transaction, transaction_id), deleted=True)
     db.delete(transaction)
     db.commit()
+    categorizer.forget(user_id)
     return True
 
 
+def _bulk_criteria(user_id: int, selector: schemas.TransactionBulkSelector) -> list:
+    """
+    Translate a bulk selector into WHERE criteria usable by UPDATE/DELETE.
+    The type filter uses a category subquery since UPDATE/DELETE can't join.
+    """
+    if selector.ids is not None:
+        return [
+            models.Transaction.user_id == user_id,
+            models.Transaction.id.in_(selector.ids),
+        ]
+    
+    f = selector.filter
+    criteria = _transaction_filters(user_id, f.category_id, f.start_date, f.end_date)
+    
+    if f.type:
+        criteria.append(models.Transaction.category_id.in_(
+            select(models.Category.id).where(
+                models.Category.user_id == user_id,
+                models.Category.type == models.TransactionType(f.type.value),
+            )
+        ))
+    
+    return criteria
+
+
+def bulk_update_transactions(
+    db: Session,
+    user_id: int,
+    bulk_update: schemas.TransactionBulkUpdate
+) -> Optional[int]:
+    """
+    Apply the same changes to every selected transaction in one UPDATE.
+    
+    Returns:
+        Number of updated rows, or None if the new category is invalid.
+    """
+    update_data = bulk_update.changes.model_dump(exclude_unset=True)
+    
+    # Verify new category once for the whole batch
+    if "category_id" in update_data:
+        category = get_category(db, update_data["category_id"], user_id)
+        if not category:
+            return None
+    
+    if not update_data:
+        return 0
+    
+    criteria = _bulk_criteria(user_id, bulk_update)
+    
+    if update_data.keys() & BALANCE_FIELDS:
+        since = _earliest_date(db, *criteria)
+        if since and update_data.get("date"):
+            since = min(since, update_data["date"])
+        _record_balance_change(db, user_id, since)
+    
+    # Recorded first: the criteria may match on the fields being changed
+    _record_changes(db, user_id, models.ChangeEntity.TRANSACTION, select(models.Transaction.id).where(*criteria))
+    
+    affected = db.query(models.Transaction).filter(
+        *criteria
+    ).update(update_data, synchronize_session=False)
+    db.commit()
+    if update_data.keys() & CATEGORIZER_FIELDS:
+        categorizer.forget(user_id)
+    return affected
+
+
+def bulk_delete_transactions(
+    db: Session,
+    user_id: int,
+    bulk_delete: schemas.TransactionBulkDelete
+) -> int:
+    """
+    Delete every selected transaction in one DELETE.
+    
+    Returns:
+        Number of deleted rows.
+    """
+    criteria = _bulk_criteria(user_id, bulk_delete)
+    _record_balance_change(db, user_id, _earliest_date(db, *criteria))
+    _record_changes(db, user_id, models.ChangeEntity.TRANSACTION, select(models.Transaction.id).where(*criteria), deleted=True)
+    
+    affected = db.query(models.Transaction).filter(
+        *criteria
+    ).delete(synchronize_session=False)
+    db.commit()
+    categorizer.forget(user_id)
+    return affected
+
+
+# ============== Balance Checkpoints ==============
+
+# Transaction fields whose change moves a user's running totals
+BALANCE_FIELDS = {"amount", "date", "category_id"}
+
+# Transaction fields the auto-categorization index is trained on
+CATEGORIZER_FIELDS = {"description", "category_id"}
+
+
+def _period_start(moment: datetime) -> datetime:
+    """Start of the calendar month containing moment (checkpoint boundary)."""
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _earliest_date(db: Session, *criteria) -> Optional[datetime]:
+    """Earliest transaction date matching criteria, or None if nothing matches."""
+    return db.query(func.min(models.Transaction.date)).filter(*criteria).scalar()
+
+
+def _lock_user(db: Session, user_id: int) -> None:
+    """
+    Row-lock the user until commit.
+    Serializes checkpoint builds against writes so a build can't persist
+    totals that miss a concurrently committed transaction.
+    """
+    db.query(models.User.id).filter(models.User.id == user_id).with_for_update().first()
+
+
+def _record_balance_change(db: Session, user_id: int, since: Optional[datetime]) -> None:
+    """
+    Record that a user's totals changed from `since` on.
+    Bumps the user's data version (which also row-locks the user) and
+    drops checkpoints that include the change; earlier checkpoints stay
+    valid. Runs in the caller's transaction; live-event subscribers learn
+    the earliest changed date after commit.
+    """
+    if since is None:
+        return
+    
+    db.query(models.User).filter(models.User.id == user_id).update(
+        {models.User.data_version: models.User.data_version + 1},
+        synchronize_session=False
+    )
+    db.query(models.BalanceCheckpoint).filter(
+        models.BalanceCheckpoint.user_id == user_id,
+        models.BalanceCheckpoint.period_start > since
+    ).delete(synchronize_session=False)
+    events.queue(db, user_id, balance_since=since)
+
+
+def _period_totals(
+    db: Session,
+    user_id: int,
+    start_date: Optional[datetime],
+    end_date: datetime,
+    include_end: bool = False
+) -> Tuple[float, float]:
+    """Sum income and expense between start_date (inclusive) and end_date."""
+    query = db.query(
+        func.coalesce(func.sum(case(
+            (models.Category.type == models.TransactionType.INCOME, models.Transaction.amount),
+            else_=0,
+        )), 0),
+        func.coalesce(func.sum(case(
+            (models.Category.type == models.TransactionType.EXPENSE, models.Transaction.amount),
+            else_=0,
+        )), 0),
+    ).join(
+        models.Category, models.Transaction.category_id == models.Category.id
+    ).filter(
+        *_transaction_filters(user_id, start_date=start_date)
+    )
+    
+    if include_end:
+        query = query.filter(models.Transaction.date <= end_date)
+    else:
+        query = query.filter(models.Transaction.date < end_date)
+    
+    income, expense = query.one()
+    return income, expense
+
+
+def get_checkpoint(db: Session, user_id: int, period_start: datetime) -> models.BalanceCheckpoint:
+    """
+    Get the checkpoint at period_start, building it if missing.
+    A missing checkpoint is rolled forward from the latest earlier one, so
+    only the transactions between the two are scanned.
+    """
+    checkpoint = db.query(models.BalanceCheckpoint).filter(
+        models.BalanceCheckpoint.user_id == user_id,
+        models.BalanceCheckpoint.period_start == period_start
+    ).first()
+    if checkpoint:
+        return checkpoint
+    
+    # Pick the base checkpoint only once writers are locked out
+    _lock_user(db, user_id)
+    checkpoint = db.query(models.BalanceCheckpoint).filter(
+        models.BalanceCheckpoint.user_id == user_id,
+        models.BalanceCheckpoint.period_start <= period_start
+    ).order_by(models.BalanceCheckpoint.period_start.desc()).first()
+    
+    if checkpoint and checkpoint.period_start == period_start:
+        db.commit()
+        return checkpoint
+    
+    base_start = checkpoint.period_start if checkpoint else None
+    income, expense = _period_totals(db, user_id, base_start, period_start)
+    
+    db_checkpoint = models.BalanceCheckpoint(
+        user_id=user_id,
+        period_start=period_start,
+        total_income=income + (checkpoint.total_income if checkpoint else 0),
+        total_expense=expense + (checkpoint.total_expense if checkpoint else 0),
+    )
+    db.add(db_checkpoint)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another request built the same checkpoint first
+        db.rollback()
+        return db.query(models.BalanceCheckpoint).filter(
+            models.BalanceCheckpoint.user_id == user_id,
+            models.BalanceCheckpoint.period_start == period_start
+        ).one()
+    return db_checkpoint
+
+
+# ============== Change Feed ==============
+
+def _ids(model, entity_id: int):
+    """Select of a single entity ID, as accepted by _record_changes."""
+    return select(model.id).where(model.id == entity_id)
+
+
+def _record_changes(
+    db: Session,
+    user_id: int,
+    entity: models.ChangeEntity,
+    ids_query,
+    deleted: bool = False
+) -> None:
+    """
+    Move the selected entities to the head of the user's change feed.
+    Set-based: the user's change_seq advances by the number of selected
+    rows (the UPDATE also locks the user row, so sequence numbers become
+    visible in commit order), then one INSERT ... SELECT upserts a change
+    row per entity with consecutive sequence numbers.
+    Call before a DELETE so the rows can still be selected. Subscribers
+    of live events are notified once the caller commits.
+    """
+    ids = ids_query.subquery()
+    top = db.execute(
+        update(models.User).where(models.User.id == user_id).values(
+            change_seq=models.User.change_seq + select(func.count()).select_from(ids).scalar_subquery()
+        ).returning(models.User.change_seq),
+        execution_options={"synchronize_session": False}
+    ).scalar_one()
+    events.queue(db, user_id, seq=top)
+    
+    rows = select(
+        literal(user_id),
+        cast(literal(entity, models.Change.entity.type), models.Change.entity.type),
+        ids.c.id,
+        top - func.count().over() + func.row_number().over(order_by=ids.c.id),
+        literal(deleted),
+        literal(datetime.utcnow()),
+    ).where(ids.c.id.is_not(None))  # SQLite needs a WHERE before ON CONFLICT
+    stmt = _dialect_insert(db, models.Change).from_select(
+        ["user_id", "entity", "entity_id", "seq", "deleted", "changed_at"], rows
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=["user_id", "entity", "entity_id"],
+        set_={
+            "seq": stmt.excluded.seq,
+            "deleted": stmt.excluded.deleted,
+            "changed_at": stmt.excluded.changed_at,
+        },
+    ))
+
+
+def get_changes(db: Session, user_id: int, since: int, limit: int = 500) -> schemas.SyncChanges:
+    """
+    Get transactions and categories changed after sequence number `since`.
+    An up-to-date client costs one range probe of (user_id, seq).
+    
+    Args:
+        db: Database session.
+        user_id: User ID.
+        since: Last sequence number the client has seen.
+        limit: Maximum number of changes to return.
+    
+    Returns:
+        SyncChanges with current rows, tombstones and the next cursor.
+    """
+    changes = db.query(models.Change).filter(
+        models.Change.user_id == user_id,
+        models.Change.seq > since
+    ).order_by(models.Change.seq).limit(limit + 1).all()
+    
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    def changed(entity, deleted):
+        return [c.entity_id for c in changes if c.entity == entity and c.deleted == deleted]
+    
+    category_ids = changed(models.ChangeEntity.CATEGORY, False)
+    transaction_ids = changed(models.ChangeEntity.TRANSACTION, False)
+    
+    categories = db.query(models.Category).filter(
+        models.Category.id.in_(category_ids),
+        models.Category.user_id == user_id
+    ).all() if category_ids else []
+    transactions = db.query(models.Transaction).options(
+        joinedload(models.Transaction.category)
+    ).filter(
+        models.Transaction.id.in_(transaction_ids),
+        models.Transaction.user_id == user_id
+    ).all() if transaction_ids else []
+    
+    # Keep feed order
+    category_order = {entity_id: i for i, entity_id in enumerate(category_ids)}
+    transaction_order = {entity_id: i for i, entity_id in enumerate(transaction_ids)}
+    
+    return schemas.SyncChanges(
+        since=since,
+        next_since=changes[-1].seq if changes else since,
+        has_more=has_more,
+        categories=sorted(categories, key=lambda c: category_order[c.id]),
+        transactions=sorted(transactions, key=lambda t: transaction_order[t.id]),
+        deleted_categories=changed(models.ChangeEntity.CATEGORY, True),
+        deleted_transactions=changed(models.ChangeEntity.TRANSACTION, True),
+    )
+
+
+# ============== Idempotency Keys ==============
+
+def reserve_idempotency_key(
+    db: Session,
+    user_id: int,
+    key: str,
+    request_hash: str,
+    expires_at: datetime
+) -> bool:
+    """
+    Claim an idempotency key in one upsert; an expired row is taken over.
+    Not committed: the claim commits together with the write and its
+    response, and a concurrent claim of the same key waits for that.
+    
+    Returns:
+        True if this request owns the key and should run the write.
+    """
+    now = datetime.utcnow()
+    stmt = _dialect_insert(db, models.IdempotencyKey).values(
+        user_id=user_id,
+        key=key,
+        request_hash=request_hash,
+        created_at=now,
+        expires_at=expires_at,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "key"],
+        set_={
+            "request_hash": stmt.excluded.request_hash,
+            "status_code": None,
+            "response": None,
+            "created_at": stmt.excluded.created_at,
+            "expires_at": stmt.excluded.expires_at,
+        },
+        where=models.IdempotencyKey.expires_at <= now,
+    ).returning(models.IdempotencyKey.id)
+    return db.execute(stmt).first() is not None
+
+
+def get_idempotency_key(db: Session, user_id: int, key: str) -> Optional[models.IdempotencyKey]:
+    """Get a stored idempotency key of a user."""
+    return db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.user_id == user_id,
+        models.IdempotencyKey.key == key
+    ).first()
+
+
+def complete_idempotency_key(
+    db: Session,
+    user_id: int,
+    key: str,
+    status_code: int,
+    response: str
+) -> None:
+    """Store the response of the write that owns the key (committed by the caller)."""
+    db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.user_id == user_id,
+        models.IdempotencyKey.key == key
+    ).update({"status_code": status_code, "response": response}, synchronize_session=False)
+
+
+def purge_idempotency_keys(db: Session) -> int:
+    """
+    Delete expired idempotency keys (a range scan of the expiry index).
+    
+    Returns:
+        Number of deleted keys.
+    """
+    deleted = db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.expires_at <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
 # ============== Report CRUD ==============
 
 def get_summary(
@@ -453,3 +1283,402 @@ def get_monthly_trends(
             balance=total_income - total_expense,
         )
     )
+
+
+# generate_series step for each bucket ('quarter' is not a valid interval unit)
+TIMESERIES_STEPS = {
+    schemas.TimeBucket.DAY: "1 day",
+    schemas.TimeBucket.WEEK: "1 week",
+    schemas.TimeBucket.MONTH: "1 month",
+    schemas.TimeBucket.QUARTER: "3 months",
+    schemas.TimeBucket.YEAR: "1 year",
+}
+
+
+def _signed_amount():
+    """Transaction amount signed by its category type (income +, expense -)."""
+    return case(
+        (models.Category.type == models.TransactionType.INCOME, models.Transaction.amount),
+        else_=-models.Transaction.amount,
+    )
+
+
+def _bucketed_totals(
+    user_id: int,
+    bucket: schemas.TimeBucket,
+    start_date: datetime,
+    end_date: datetime,
+    category_ids: Optional[List[int]] = None
+):
+    """
+    Build a select of (period, income, expense) for every bucket in range.
+    Buckets come from date_trunc in one grouped scan; generate_series
+    fills buckets without transactions with zeros.
+    """
+    # Bucket is a validated enum; inlining it keeps the SELECT and GROUP BY
+    # expressions textually identical for Postgres
+    unit = literal_column(f"'{bucket.value}'")
+    period = func.date_trunc(unit, models.Transaction.date).label("period")
+    
+    totals = select(
+        period,
+        func.sum(case(
+            (models.Category.type == models.TransactionType.INCOME, models.Transaction.amount),
+            else_=0,
+        )).label("income"),
+        func.sum(case(
+            (models.Category.type == models.TransactionType.EXPENSE, models.Transaction.amount),
+            else_=0,
+        )).label("expense"),
+    ).join(
+        models.Category, models.Transaction.category_id == models.Category.id
+    ).where(
+        *_transaction_filters(user_id, start_date=start_date, end_date=end_date)
+    ).group_by(period)
+    
+    if category_ids:
+        totals = totals.where(models.Transaction.category_id.in_(category_ids))
+    
+    totals = totals.subquery()
+    
+    series = func.generate_series(
+        func.date_trunc(unit, start_date),
+        func.date_trunc(unit, end_date),
+        cast(literal(TIMESERIES_STEPS[bucket]), INTERVAL),
+    ).table_valued("period").render_derived(name="series")
+    
+    return select(
+        series.c.period,
+        func.coalesce(totals.c.income, 0).label("income"),
+        func.coalesce(totals.c.expense, 0).label("expense"),
+    ).select_from(series).outerjoin(
+        totals, totals.c.period == series.c.period
+    )
+
+
+def get_timeseries(
+    db: Session,
+    user_id: int,
+    bucket: schemas.TimeBucket,
+    start_date: datetime,
+    end_date: datetime,
+    category_ids: Optional[List[int]] = None
+) -> schemas.TimeSeriesReport:
+    """
+    Get income/expense totals per time bucket between two dates.
+    
+    Args:
+        db: Database session.
+        user_id: User ID.
+        bucket: Bucket width (day/week/month/quarter/year).
+        start_date: Start of period (inclusive).
+        end_date: End of period (inclusive).
+        category_ids: Optional list of categories to include.
+    
+    Returns:
+        TimeSeriesReport with one column per measure.
+    """
+    series = _bucketed_totals(user_id, bucket, start_date, end_date, category_ids).subquery()
+    rows = db.execute(select(series).order_by(series.c.period)).all()
+    
+    return schemas.TimeSeriesReport(
+        bucket=bucket,
+        periods=[r.period.date() for r in rows],
+        income=[r.income for r in rows],
+        expense=[r.expense for r in rows],
+        balance=[r.income - r.expense for r in rows],
+    )
+
+
+def get_balance_history(
+    db: Session,
+    user: models.User,
+    bucket: schemas.TimeBucket,
+    start_date: datetime,
+    end_date: datetime
+) -> schemas.BalanceHistory:
+    """
+    Get the running balance at the end of each time bucket.
+    The cumulative sum is a SUM() OVER (ORDER BY period) window on top of
+    the bucketed totals, seeded with everything before start_date, so only
+    one row per bucket leaves the database.
+    
+    Args:
+        db: Database session.
+        user: User whose stored opening balance seeds the series.
+        bucket: Bucket width (day/week/month/quarter/year).
+        start_date: Start of period (inclusive).
+        end_date: End of period (inclusive).
+    
+    Returns:
+        BalanceHistory with per-bucket net flow and closing balance.
+    """
+    series = _bucketed_totals(user.id, bucket, start_date, end_date).subquery()
+    net = series.c.income - series.c.expense
+    
+    prior = select(
+        func.coalesce(func.sum(_signed_amount()), 0)
+    ).join(
+        models.Category, models.Transaction.category_id == models.Category.id
+    ).where(
+        models.Transaction.user_id == user.id,
+        models.Transaction.date < start_date
+    ).scalar_subquery()
+    
+    query = select(
+        series.c.period,
+        net.label("net"),
+        prior.label("prior"),
+        func.sum(net).over(order_by=series.c.period).label("cumulative"),
+    ).order_by(series.c.period)
+    
+    rows = db.execute(query).all()
+    
+    opening_balance = user.opening_balance or 0
+    starting_balance = opening_balance + (rows[0].prior if rows else 0)
+    
+    return schemas.BalanceHistory(
+        bucket=bucket,
+        opening_balance=opening_balance,
+        starting_balance=starting_balance,
+        periods=[r.period.date() for r in rows],
+        net=[r.net for r in rows],
+        balance=[starting_balance + r.cumulative for r in rows],
+    )
+
+
+def get_balance_at(db: Session, user: models.User, at: datetime) -> schemas.PointInTimeBalance:
+    """
+    Get the balance as of a moment (transactions dated on or before it).
+    Reads the checkpoint at the start of at's month and only scans the
+    partial month after it.
+    
+    Args:
+        db: Database session.
+        user: User whose stored opening balance is included.
+        at: Point in time.
+    
+    Returns:
+        PointInTimeBalance with cumulative totals.
+    """
+    checkpoint = get_checkpoint(db, user.id, _period_start(at))
+    income, expense = _period_totals(db, user.id, checkpoint.period_start, at, include_end=True)
+    
+    total_income = checkpoint.total_income + income
+    total_expense = checkpoint.total_expense + expense
+    opening_balance = user.opening_balance or 0
+    
+    return schemas.PointInTimeBalance(
+        at=at,
+        opening_balance=opening_balance,
+        total_income=total_income,
+        total_expense=total_expense,
+        balance=opening_balance + total_income - total_expense,
+    )
+
+
+# Length of each comparison period in months
+PERIOD_MONTHS = {
+    schemas.ComparisonPeriod.MONTH: 1,
+    schemas.ComparisonPeriod.QUARTER: 3,
+    schemas.ComparisonPeriod.YEAR: 12,
+}
+
+
+def _shift_months(moment: datetime, months: int) -> datetime:
+    """Move a first-of-month datetime by a number of months."""
+    index = moment.year * 12 + moment.month - 1 + months
+    return moment.replace(year=index // 12, month=index % 12 + 1)
+
+
+def get_comparison(
+    db: Session,
+    user_id: int,
+    period: schemas.ComparisonPeriod,
+    offset: int = 1,
+    reference: Optional[datetime] = None
+) -> schemas.ComparisonReport:
+    """
+    Compare per-category totals of the current period with an earlier one.
+    Both ranges are aggregated in a single grouped query using
+    conditional sums.
+    
+    Args:
+        db: Database session.
+        user_id: User ID.
+        period: Period length (month/quarter/year).
+        offset: How many periods back the comparison period is
+            (e.g. period=month, offset=12 for year-over-year).
+        reference: Moment inside the current period (default now).
+    
+    Returns:
+        ComparisonReport with current/previous summaries and deltas.
+    """
+    months = PERIOD_MONTHS[period]
+    reference = _period_start(reference or datetime.utcnow())
+    current_start = _shift_months(reference, -((reference.month - 1) % months))
+    current_end = _shift_months(current_start, months)
+    previous_start = _shift_months(current_start, -months * offset)
+    previous_end = _shift_months(previous_start, months)
+    
+    in_current = (models.Transaction.date >= current_start) & (models.Transaction.date < current_end)
+    in_previous = (models.Transaction.date >= previous_start) & (models.Transaction.date < previous_end)
+    
+    query = db.query(
+        models.Category.id,
+        models.Category.name,
+        models.Category.type,
+        func.coalesce(func.sum(case((in_current, models.Transaction.amount), else_=0)), 0).label("current_total"),
+        func.count(case((in_current, models.Transaction.id))).label("current_count"),
+        func.coalesce(func.sum(case((in_previous, models.Transaction.amount), else_=0)), 0).label("previous_total"),
+        func.count(case((in_previous, models.Transaction.id))).label("previous_count"),
+    ).join(
+        models.Transaction, models.Transaction.category_id == models.Category.id
+    ).filter(
+        models.Transaction.user_id == user_id,
+        in_current | in_previous
+    ).group_by(models.Category.id)
+    
+    results = query.all()
+    
+    totals = {
+        (side, kind): sum(getattr(r, f"{side}_total") for r in results if r.type == kind)
+        for side in ("current", "previous")
+        for kind in models.TransactionType
+    }
+    
+    def summarize(r, side):
+        total = getattr(r, f"{side}_total")
+        type_total = totals[(side, r.type)]
+        return schemas.CategorySummary(
+            category_id=r.id,
+            category_name=r.name,
+            category_type=schemas.TransactionType(r.type.value),
+            total=total,
+            percentage=(total / type_total * 100) if type_total > 0 else 0,
+            transaction_count=getattr(r, f"{side}_count"),
+        )
+    
+    categories = []
+    for r in results:
+        delta = r.current_total - r.previous_total
+        categories.append(schemas.CategoryComparison(
+            current=summarize(r, "current"),
+            previous=summarize(r, "previous"),
+            delta=delta,
+            delta_percentage=(delta / r.previous_total * 100) if r.previous_total else None,
+        ))
+    categories.sort(key=lambda c: abs(c.delta), reverse=True)
+    
+    def period_summary(side, start, end):
+        income = totals[(side, models.TransactionType.INCOME)]
+        expense = totals[(side, models.TransactionType.EXPENSE)]
+        return schemas.ReportSummary(
+            total_income=income,
+            total_expense=expense,
+            balance=income - expense,
+            period_start=start,
+            period_end=end,
+        )
+    
+    return schemas.ComparisonReport(
+        period=period,
+        offset=offset,
+        categories=categories,
+        current=period_summary("current", current_start, current_end),
+        previous=period_summary("previous", previous_start, previous_end),
+    )
+
+
+def get_distribution(
+    db: Session,
+    user_id: int,
+    buckets: int = 10,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None
+) -> schemas.DistributionReport:
+    """
+    Get per-category amount statistics and histograms.
+    Percentiles (percentile_cont) and histogram buckets (width_bucket) are
+    computed in Postgres from one CTE over the date-bounded scan, so no
+    individual transactions are returned.
+    
+    Args:
+        db: Database session.
+        user_id: User ID.
+        buckets: Number of equal-width histogram buckets.
+        start_date: Optional start of period.
+        end_date: Optional end of period.
+    
+    Returns:
+        DistributionReport with one entry per category.
+    """
+    scoped = select(
+        models.Transaction.category_id,
+        models.Transaction.amount,
+    ).where(
+        *_transaction_filters(user_id, start_date=start_date, end_date=end_date),
+        models.Transaction.category_id.is_not(None)
+    ).cte("scoped")
+    
+    stats = select(
+        scoped.c.category_id,
+        func.count().label("n"),
+        func.avg(scoped.c.amount).label("mean"),
+        func.stddev_samp(scoped.c.amount).label("stddev"),
+        func.percentile_cont(0.5).within_group(scoped.c.amount).label("median"),
+        func.percentile_cont(0.9).within_group(scoped.c.amount).label("p90"),
+        func.min(scoped.c.amount).label("lo"),
+        func.max(scoped.c.amount).label("hi"),
+    ).group_by(scoped.c.category_id).cte("stats")
+    
+    # width_bucket puts the maximum in bucket n+1 and rejects lo == hi
+    n = literal_column(str(int(buckets)))
+    bucket = case(
+        (stats.c.hi == stats.c.lo, literal_column("1")),
+        else_=func.least(func.width_bucket(scoped.c.amount, stats.c.lo, stats.c.hi, n), n),
+    ).label("bucket")
+    hist = select(
+        scoped.c.category_id,
+        bucket,
+        func.count().label("bucket_count"),
+    ).join(
+        stats, stats.c.category_id == scoped.c.category_id
+    ).group_by(scoped.c.category_id, bucket).cte("hist")
+    
+    query = select(
+        stats,
+        models.Category.name,
+        models.Category.type,
+        hist.c.bucket,
+        hist.c.bucket_count,
+    ).join(
+        models.Category, models.Category.id == stats.c.category_id
+    ).join(
+        hist, hist.c.category_id == stats.c.category_id
+    ).order_by(stats.c.category_id, hist.c.bucket)
+    
+    distributions = {}
+    for r in db.execute(query):
+        if r.category_id not in distributions:
+            distributions[r.category_id] = schemas.CategoryDistribution(
+                category_id=r.category_id,
+                category_name=r.name,
+                category_type=schemas.TransactionType(r.type.value),
+                transaction_count=r.n,
+                mean=r.mean,
+                median=r.median,
+                p90=r.p90,
+                stddev=r.stddev,
+                min=r.lo,
+                max=r.hi,
+                histogram=[0] * buckets,
+            )
+        distributions[r.category_id].histogram[r.bucket - 1] = r.bucket_count
+    
+    return schemas.DistributionReport(
+        buckets=buckets,
+        categories=sorted(distributions.values(), key=lambda d: d.category_name),
+        period_start=start_date,
+        period_end=end_date,
+    )
@@ -2,34 +2,119 @@
 Database configuration module.
 Sets up SQLAlchemy engine, session factory, and base model.
 """
-from sqlalchemy import create_engine
+from typing import Optional
+from fastapi import Depends, Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import get_settings
+from . import metrics, profiling
 
 settings = get_settings()
 
+connect_args = {}
+if make_url(settings.DATABASE_URL).drivername == "postgresql+psycopg":
+    # psycopg 3 prepares a statement server-side once it has run this many
+    # times on a connection; psycopg2 (the default driver) can't prepare
+    connect_args["prepare_threshold"] = settings.DB_PREPARE_THRESHOLD
+
 # Create SQLAlchemy engine
 # For PostgreSQL, use psycopg2 driver
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,  # Enable connection health checks
-    pool_size=5,
-    max_overflow=10,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    query_cache_size=settings.DB_STATEMENT_CACHE_SIZE,
+    connect_args=connect_args,
 )
 
+metrics.counter("db_statement_cache_total", "Statements executed, by compiled cache outcome")
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _count_statement_cache(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        metrics.inc("db_statement_cache_total", result=context.cache_hit.name.lower())
+
+
+@metrics.gauge("db_statement_cache_hit_ratio", "Share of cacheable statements served from the compiled cache")
+def _statement_cache_hit_ratio() -> float:
+    hits = metrics.value("db_statement_cache_total", result="cache_hit")
+    misses = metrics.value("db_statement_cache_total", result="cache_miss")
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+if engine.dialect.name == "sqlite":
+    # SQLite ignores foreign keys (and their ON DELETE actions) unless asked
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+        # pysqlite's own transaction handling breaks SAVEPOINT; let
+        # SQLAlchemy emit BEGIN itself
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_sqlite_transaction(connection):
+        connection.exec_driver_sql("BEGIN")
+
 # Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: rows loaded by INSERT ... RETURNING stay usable after
+# commit instead of being re-SELECTed on first attribute access
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Base class for ORM models
 Base = declarative_base()
 
 
-def get_db():
+@event.listens_for(SessionLocal, "after_begin")
+def _apply_timeouts(session, transaction, connection):
+    """SET LOCAL lasts one transaction, so apply the session's timeouts to each."""
+    timeouts = session.info.get("timeouts")
+    if timeouts and connection.dialect.name == "postgresql":
+        statement_ms, lock_ms = timeouts
+        connection.exec_driver_sql(
+            f"SET LOCAL statement_timeout = {int(statement_ms)}; SET LOCAL lock_timeout = {int(lock_ms)}"
+        )
+
+
+# SQLSTATEs of an exceeded budget: query_canceled (statement_timeout),
+# lock_not_available (lock_timeout)
+TIMEOUT_SQLSTATES = {"57014": "statement", "55P03": "lock"}
+
+
+def timeout_kind(exc: Exception) -> Optional[str]:
+    """'statement' or 'lock' if a database error is an exceeded timeout, else None."""
+    return TIMEOUT_SQLSTATES.get(getattr(getattr(exc, "orig", None), "pgcode", None))
+
+
+def db_timeouts(statement_ms: int, lock_ms: Optional[int] = None):
+    """
+    Router or route dependency setting the statement and lock timeouts of
+    the session get_db hands out, e.g.
+    APIRouter(dependencies=[db_timeouts(15000)]). Route dependencies run
+    after router ones, so a route can override its router.
+    """
+    def apply(request: Request) -> None:
+        request.state.db_timeouts = (statement_ms, lock_ms if lock_ms is not None else settings.DB_LOCK_TIMEOUT_MS)
+    return Depends(apply)
+
+
+def get_db(request: Request):
     """
     Dependency that provides a database session.
+    Transactions run with the route's db_timeouts, or the default
+    DB_STATEMENT_TIMEOUT_MS/DB_LOCK_TIMEOUT_MS.
     Automatically closes the session after the request is complete.
     """
+    profiling.attach()
     db = SessionLocal()
+    db.info["timeouts"] = getattr(
+        request.state, "db_timeouts", (settings.DB_STATEMENT_TIMEOUT_MS, settings.DB_LOCK_TIMEOUT_MS)
+    )
     try:
         yield db
     finally:
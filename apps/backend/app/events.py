@@ -0,0 +1,180 @@
+"""
+Live update events.
+Writes queue a per-user change notification on their session; it is
+published once the session commits. An in-process hub fans events out to
+the user's SSE/WebSocket subscribers. With EVENTS_PG_BRIDGE, events travel
+through Postgres NOTIFY instead, so every worker and pod receives them.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import SessionLocal, engine
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Postgres NOTIFY channel of the bridge
+CHANNEL = "finance_events"
+
+# Events buffered per subscriber; a slow client drops the oldest
+QUEUE_SIZE = 16
+
+
+def _offer(queue: asyncio.Queue, payload: dict) -> None:
+    """Enqueue an event, dropping the oldest when full (events carry latest state)."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(payload)
+
+
+class Hub:
+    """Per-user fan-out of events to subscriber queues on their event loops."""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[tuple]] = defaultdict(set)  # user_id -> {(loop, queue)}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def subscribe(self, user_id: int):
+        """Register a queue receiving the user's events while the context is open."""
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[user_id].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._subscribers[user_id].discard(entry)
+                if not self._subscribers[user_id]:
+                    del self._subscribers[user_id]
+
+    def dispatch(self, user_id: int, payload: dict) -> None:
+        """Deliver an event to the user's local subscribers (thread-safe)."""
+        with self._lock:
+            entries = list(self._subscribers.get(user_id, ()))
+        for loop, queue in entries:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, payload)
+            except RuntimeError:
+                pass  # Subscriber's loop already closed
+
+
+hub = Hub()
+
+
+# ============== Publishing on commit ==============
+
+def _bridge_enabled() -> bool:
+    return settings.EVENTS_PG_BRIDGE and engine.dialect.name == "postgresql"
+
+
+def queue(
+    db: Session,
+    user_id: int,
+    seq: Optional[int] = None,
+    balance_since: Optional[datetime] = None
+) -> None:
+    """
+    Queue a change notification on the session, published after commit.
+    Notifications of one commit are merged per user: the latest change
+    sequence number and the earliest date whose balances changed.
+    """
+    pending = db.info.setdefault("events", {}).setdefault(user_id, {"seq": None, "balance_since": None})
+    if seq is not None:
+        pending["seq"] = max(seq, pending["seq"] or 0)
+    if balance_since is not None:
+        current = pending["balance_since"]
+        pending["balance_since"] = balance_since if current is None else min(current, balance_since)
+
+
+def _payloads(pending: dict):
+    for user_id, change in pending.items():
+        since = change["balance_since"]
+        yield user_id, {
+            "type": "change",
+            "seq": change["seq"],
+            "balance_since": since.isoformat() if since else None,
+        }
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _notify_bridge(session: Session) -> None:
+    """With the bridge, NOTIFY inside the transaction; Postgres delivers it on commit."""
+    if not _bridge_enabled() or not session.info.get("events"):
+        return
+    for user_id, payload in _payloads(session.info.pop("events")):
+        session.execute(func.pg_notify(CHANNEL, json.dumps({"user_id": user_id, **payload})).select())
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_local(session: Session) -> None:
+    pending = session.info.pop("events", None)
+    if pending:
+        for user_id, payload in _payloads(pending):
+            hub.dispatch(user_id, payload)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard(session: Session) -> None:
+    session.info.pop("events", None)
+
+
+# ============== Postgres LISTEN bridge ==============
+
+_bridge: Optional[threading.Thread] = None
+_bridge_stop = threading.Event()
+
+
+def _listen() -> None:
+    """Forward NOTIFY payloads to the local hub; reconnects on failure."""
+    while not _bridge_stop.is_set():
+        connection = None
+        try:
+            connection = engine.raw_connection()
+            connection.detach()  # Held for the process lifetime, not a pool slot
+            driver = connection.driver_connection
+            driver.autocommit = True
+            driver.cursor().execute(f"LISTEN {CHANNEL}")
+            while not _bridge_stop.is_set():
+                if select.select([driver], [], [], 1.0) == ([], [], []):
+                    continue
+                driver.poll()
+                while driver.notifies:
+                    payload = json.loads(driver.notifies.pop(0).payload)
+                    hub.dispatch(payload.pop("user_id"), payload)
+        except Exception:
+            logger.exception("Event bridge connection failed, reconnecting")
+            _bridge_stop.wait(5)
+        finally:
+            if connection is not None:
+                connection.close()
+
+
+def start_bridge() -> None:
+    """Start the LISTEN thread when the bridge is enabled."""
+    global _bridge
+    if not _bridge_enabled() or _bridge is not None:
+        return
+    _bridge_stop.clear()
+    _bridge = threading.Thread(target=_listen, name="event-bridge", daemon=True)
+    _bridge.start()
+
+
+def stop_bridge() -> None:
+    """Stop the LISTEN thread, if running."""
+    global _bridge
+    if _bridge is not None:
+        _bridge_stop.set()
+        _bridge.join(timeout=5)
+        _bridge = None
@@ -0,0 +1,274 @@
+"""
+Cash-flow forecasting module.
+Fits a trend + seasonal baseline to a user's daily net flows with NumPy
+and projects the balance forward with confidence bands.
+NumPy is imported by the functions that use it, so app startup doesn't
+pay for it.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy import Date, case, func
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from . import models, schemas
+
+if TYPE_CHECKING:
+    import numpy as np
+
+settings = get_settings()
+
+# Days of history the baseline is fitted on
+HISTORY_DAYS = 730
+
+# z-score of the reported confidence band (95%)
+BAND_Z = 1.96
+
+# A day-of-month slot is recurring if it has a flow in this share of months
+RECURRING_SHARE = 0.75
+RECURRING_MIN_MONTHS = 3
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# user_id -> (data_version, fitted model), least recently used first
+_cache: "OrderedDict[int, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# ============== Vectorized model ==============
+
+def _day_of_month(days: "np.ndarray") -> "np.ndarray":
+    """0-based day of month for day numbers (days since 1970-01-01)."""
+    import numpy as np
+    moments = days.astype("datetime64[D]")
+    return (moments - moments.astype("datetime64[M]")).astype(np.int64)
+
+
+def _weekday(days: "np.ndarray") -> "np.ndarray":
+    """Weekday (Monday = 0) for day numbers; 1970-01-01 was a Thursday."""
+    return (days + 3) % 7
+
+
+def _profile(slots: "np.ndarray", values: "np.ndarray", size: int) -> "np.ndarray":
+    """Mean of values per slot, 0 for empty slots."""
+    import numpy as np
+    totals = np.bincount(slots, weights=values, minlength=size)
+    counts = np.bincount(slots, minlength=size)
+    return totals / np.maximum(counts, 1)
+
+
+def fit_model(day_numbers: "np.ndarray", net: "np.ndarray", end_day: int) -> dict:
+    """
+    Fit a daily net-flow baseline: linear trend, then day-of-month and
+    weekday profiles of the residual, then the remaining noise level.
+    Pure NumPy so it can run in a worker process.
+
+    Args:
+        day_numbers: Days (since epoch) that had flows, ascending.
+        net: Net flow of each of those days.
+        end_day: Last day of history (today).
+
+    Returns:
+        Model parameters as a dict of scalars and arrays.
+    """
+    import numpy as np
+    balance = float(net.sum())
+    start = max(int(day_numbers.min()) if len(day_numbers) else end_day, end_day - HISTORY_DAYS + 1)
+    length = end_day - start + 1
+
+    # Dense daily series, zero on days without transactions
+    y = np.zeros(length)
+    window = day_numbers >= start
+    np.add.at(y, day_numbers[window] - start, net[window])
+
+    t = np.arange(length)
+    if length > 1:
+        slope, intercept = np.polyfit(t, y, 1)
+    else:
+        slope, intercept = 0.0, float(y.mean())
+    residual = y - (slope * t + intercept)
+
+    days = start + t
+    dom = _day_of_month(days)
+    dow = _weekday(days)
+    dom_profile = _profile(dom, residual, 31)
+    residual = residual - dom_profile[dom]
+    dow_profile = _profile(dow, residual, 7)
+    residual = residual - dow_profile[dow]
+
+    # Recurring flows: day-of-month slots that see a flow in most months
+    month = (days.astype("datetime64[D]").astype("datetime64[M]")
+             - np.datetime64(int(days[0]), "D").astype("datetime64[M]")).astype(np.int64)
+    months = int(month[-1]) + 1
+    hits = np.zeros((months, 31), dtype=bool)
+    hits[month, dom] = y != 0
+    share = hits.mean(axis=0)
+    recurring = []
+    if months >= RECURRING_MIN_MONTHS:
+        for slot in np.flatnonzero(share >= RECURRING_SHARE):
+            amounts = y[(dom == slot) & (y != 0)]
+            recurring.append((int(slot) + 1, float(np.median(amounts)), int(hits[:, slot].sum())))
+
+    return {
+        "origin": start,
+        "end_day": end_day,
+        "slope": float(slope),
+        "intercept": float(intercept),
+        "dom_profile": dom_profile,
+        "dow_profile": dow_profile,
+        "sigma": float(residual.std()),
+        "balance": balance,
+        "recurring": recurring,
+    }
+
+
+def project(model: dict, start_balance: float, horizon: int) -> tuple:
+    """
+    Project daily balances `horizon` days past the model's end day.
+    The band widens with the square root of the horizon (independent
+    daily noise).
+
+    Returns:
+        Tuple of (day numbers, expected balance, lower band, upper band).
+    """
+    import numpy as np
+    ahead = np.arange(1, horizon + 1)
+    days = model["end_day"] + ahead
+    t = days - model["origin"]
+
+    expected = (
+        model["slope"] * t + model["intercept"]
+        + model["dom_profile"][_day_of_month(days)]
+        + model["dow_profile"][_weekday(days)]
+    )
+    path = start_balance + np.cumsum(expected)
+    band = BAND_Z * model["sigma"] * np.sqrt(ahead)
+    return days, path, path - band, path + band
+
+
+# ============== Extraction and caching ==============
+
+def _extract_daily_net(db: Session, user_id: int, until: date) -> tuple:
+    """Load daily net flows up to `until` (inclusive) as NumPy arrays in one query."""
+    import numpy as np
+    day = func.date(models.Transaction.date, type_=Date)
+    rows = db.query(
+        day.label("day"),
+        func.sum(case(
+            (models.Category.type == models.TransactionType.INCOME, models.Transaction.amount),
+            else_=-models.Transaction.amount,
+        )).label("net"),
+    ).join(
+        models.Category, models.Transaction.category_id == models.Category.id
+    ).filter(
+        models.Transaction.user_id == user_id,
+        models.Transaction.date < datetime.combine(until + timedelta(days=1), datetime.min.time())
+    ).group_by(day).order_by(day).all()
+
+    epoch = date(1970, 1, 1)
+    day_numbers = np.fromiter(((r.day - epoch).days for r in rows), dtype=np.int64, count=len(rows))
+    net = np.fromiter((r.net for r in rows), dtype=np.float64, count=len(rows))
+    return day_numbers, net
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """Lazily start the fitting process pool (None when disabled)."""
+    global _pool
+    if settings.FORECAST_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.FORECAST_WORKERS)
+        return _pool
+
+
+def start_pool() -> None:
+    """Start a fitting process ahead of the first forecast."""
+    pool = _get_pool()
+    if pool is not None:
+        pool.submit(int).result()
+
+
+def shutdown_pool() -> None:
+    """Stop the fitting process pool, if it was started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _get_model(db: Session, user: models.User, today: date) -> dict:
+    """Return the user's fitted model, refitting when their data version changed."""
+    key = user.id
+    version = (user.data_version, today)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == version:
+            _cache.move_to_end(key)
+            return cached[1]
+
+    day_numbers, net = _extract_daily_net(db, user.id, today)
+    end_day = (today - date(1970, 1, 1)).days
+    pool = _get_pool()
+    if pool is None:
+        model = fit_model(day_numbers, net, end_day)
+    else:
+        model = pool.submit(fit_model, day_numbers, net, end_day).result()
+
+    with _cache_lock:
+        _cache[key] = (version, model)
+        _cache.move_to_end(key)
+        while len(_cache) > settings.FORECAST_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return model
+
+
+def get_forecast(db: Session, user: models.User, months: int = 6) -> schemas.ForecastReport:
+    """
+    Forecast the user's balance at the end of each of the next months.
+
+    Args:
+        db: Database session.
+        user: User to forecast (data_version keys the model cache).
+        months: Number of month ends to project.
+
+    Returns:
+        ForecastReport with expected balance and 95% band per month end.
+    """
+    import numpy as np
+    today = datetime.utcnow().date()
+    model = _get_model(db, user, today)
+
+    month_ends = []
+    first = today.replace(day=1)
+    for k in range(1, months + 1):
+        index = first.year * 12 + first.month - 1 + k
+        month_ends.append(date(index // 12, index % 12 + 1, 1) - timedelta(days=1))
+
+    current_balance = (user.opening_balance or 0) + model["balance"]
+    horizon = max((month_ends[-1] - today).days, 1)
+    days, path, lower, upper = project(model, current_balance, horizon)
+
+    # Month ends that fall on today keep the current balance
+    offsets = np.array([(d - today).days for d in month_ends]) - 1
+    picks = np.clip(offsets, 0, None)
+    keep = offsets < 0
+
+    return schemas.ForecastReport(
+        months=months,
+        current_balance=current_balance,
+        dates=month_ends,
+        balance=np.where(keep, current_balance, path[picks]).tolist(),
+        lower=np.where(keep, current_balance, lower[picks]).tolist(),
+        upper=np.where(keep, current_balance, upper[picks]).tolist(),
+        recurring=[
+            schemas.RecurringFlow(day_of_month=day, amount=amount, occurrences=count)
+            for day, amount, count in model["recurring"]
+        ],
+    )
@@ -0,0 +1,155 @@
+"""
+Idempotency-Key support for write routes.
+A write sent with an Idempotency-Key header runs once; retries with the
+same key get the stored response back. The key, the write and the stored
+response commit in one transaction, so a crash can't leave a write
+without its response. Completed keys are cached in-process in front of
+the idempotency_keys table.
+
+Purge expired keys periodically, e.g. from a CronJob:
+    python -m app.idempotency
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional, Type
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import SessionLocal
+from . import crud, events
+
+settings = get_settings()
+
+# Response header marking a replayed response
+REPLAYED_HEADER = "Idempotency-Replayed"
+
+# (user_id, key) -> (expires_at, request_hash, status_code, body), least recently used first
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def request_hash(scope: str, payload: BaseModel) -> str:
+    """Hash of the route and request body a key was first used with."""
+    return hashlib.sha256(f"{scope}\n{payload.model_dump_json()}".encode()).hexdigest()
+
+
+def _cached(cache_key: tuple) -> Optional[tuple]:
+    """Completed entry from the front cache, if present and not expired."""
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+        if entry is None:
+            return None
+        if entry[0] <= datetime.utcnow():
+            del _cache[cache_key]
+            return None
+        _cache.move_to_end(cache_key)
+        return entry
+
+
+def _remember(cache_key: tuple, entry: tuple) -> None:
+    """Put a completed entry in the front cache."""
+    with _cache_lock:
+        _cache[cache_key] = entry
+        _cache.move_to_end(cache_key)
+        while len(_cache) > settings.IDEMPOTENCY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _replay(entry: tuple, fingerprint: str) -> JSONResponse:
+    """Return a stored response, rejecting a key reused for another request."""
+    _, stored_hash, status_code, body = entry
+    if stored_hash != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request"
+        )
+    return JSONResponse(content=body, status_code=status_code, headers={REPLAYED_HEADER: "true"})
+
+
+def run(
+    db: Session,
+    user_id: int,
+    key: Optional[str],
+    scope: str,
+    payload: BaseModel,
+    response_model: Type[BaseModel],
+    status_code: int,
+    write: Callable[[Session], Any]
+) -> Any:
+    """
+    Run a write once per idempotency key.
+    Without a key the write simply runs on db. Otherwise the key is
+    claimed, the write runs and its response is stored in db's
+    transaction, which commits once at the end. The write gets a session
+    joined to that transaction, whose own commits only release
+    savepoints. A concurrent retry's claim waits on the key's row and then
+    replays the response. Only successful responses are stored; a failed
+    write rolls back the claim with it.
+
+    Args:
+        db: Request database session.
+        user_id: Owner of the key.
+        key: Idempotency-Key header value.
+        scope: Route identifier, e.g. "POST /transactions".
+        payload: Request body.
+        response_model: Schema the write's result is serialized with.
+        status_code: Status code of a successful response.
+        write: Callable performing the write on the session it is given
+            and returning its result.
+    """
+    if key is None:
+        return write(db)
+
+    fingerprint = request_hash(scope, payload)
+    cache_key = (user_id, key)
+    entry = _cached(cache_key)
+    if entry is not None:
+        return _replay(entry, fingerprint)
+
+    expires_at = datetime.utcnow() + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS)
+    write_db = Session(bind=db.connection(), join_transaction_mode="create_savepoint", expire_on_commit=False)
+    try:
+        if not crud.reserve_idempotency_key(write_db, user_id, key, fingerprint, expires_at):
+            stored = crud.get_idempotency_key(write_db, user_id, key)
+            if stored is None or stored.status_code is None:
+                # Only possible if the key expired and was purged meanwhile
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this Idempotency-Key is in progress"
+                )
+            entry = (stored.expires_at, stored.request_hash, stored.status_code, json.loads(stored.response))
+            db.rollback()
+            _remember(cache_key, entry)
+            return _replay(entry, fingerprint)
+
+        result = write(write_db)
+        body = jsonable_encoder(response_model.model_validate(result))
+        crud.complete_idempotency_key(write_db, user_id, key, status_code, json.dumps(body))
+        # Live events go out once the request session really commits
+        for event_user_id, pending in write_db.info.pop("events", {}).items():
+            events.queue(db, event_user_id, pending["seq"], pending["balance_since"])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        write_db.close()
+
+    _remember(cache_key, (expires_at, fingerprint, status_code, body))
+    return JSONResponse(content=body, status_code=status_code)
+
+
+if __name__ == "__main__":
+    db = SessionLocal()
+    try:
+        print(f"Purged {crud.purge_idempotency_keys(db)} expired idempotency keys")
+    finally:
+        db.close()
@@ -0,0 +1,292 @@
+"""
+Background job subsystem.
+Jobs are rows in the jobs table; asyncio worker tasks in every API process
+claim them with SELECT ... FOR UPDATE SKIP LOCKED, so replicas share the
+queue without a broker. Handlers run in a thread and may report progress.
+
+Enqueue a system job, e.g. from a CronJob:
+    python -m app.jobs anomaly_scan
+"""
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Session
+
+from .config import get_settings
+from .database import SessionLocal
+from . import anomalies, crud, models, schemas
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Delay before retry n is RETRY_BASE_SECONDS * 2 ** (n - 1)
+RETRY_BASE_SECONDS = 10
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler for failures a retry can't fix."""
+
+
+class LeaseLost(Exception):
+    """Raised when a job's lease expired and another worker claimed it."""
+
+
+def _held(job_id: int, attempt: int):
+    """Criteria matching the job only while the given claim still holds it."""
+    return and_(
+        models.Job.id == job_id,
+        models.Job.attempts == attempt,
+        models.Job.status == models.JobStatus.RUNNING,
+    )
+
+
+class JobContext:
+    """What a handler gets to know about its job, plus progress reporting."""
+
+    def __init__(self, job: models.Job):
+        self.job_id = job.id
+        self.attempt = job.attempts  # Identifies this claim; a re-claim increments it
+        self.user_id = job.user_id
+        self.payload = job.payload or {}
+
+    def progress(self, fraction: Optional[float] = None, db: Optional[Session] = None) -> None:
+        """
+        Record progress (0..1) and extend the job's lease.
+        With db, the update joins that session's transaction and commits
+        with the handler's writes; on PostgreSQL its row lock also keeps
+        other workers from claiming the job meanwhile.
+
+        Raises:
+            LeaseLost: If another worker claimed the job.
+        """
+        values = {"lease_expires_at": datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)}
+        if fraction is not None:
+            values["progress"] = min(max(fraction, 0.0), 1.0)
+        session = db or SessionLocal()
+        try:
+            updated = session.query(models.Job).filter(
+                _held(self.job_id, self.attempt)
+            ).update(values, synchronize_session=False)
+            if db is None:
+                session.commit()
+        finally:
+            if db is None:
+                session.close()
+        if not updated:
+            raise LeaseLost(f"Job {self.job_id} was claimed again")
+
+
+# kind -> handler(db, context) returning a JSON-serializable result
+HANDLERS: Dict[str, Callable[[Session, JobContext], Any]] = {}
+
+
+def handler(kind: str):
+    """Register a job handler for a kind."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+@handler("anomaly_scan")
+def _anomaly_scan(db: Session, context: JobContext) -> dict:
+    return {"recorded": anomalies.run_anomaly_scan(on_chunk=lambda last_id: context.progress())}
+
+
+@handler("purge_idempotency_keys")
+def _purge_idempotency_keys(db: Session, context: JobContext) -> dict:
+    return {"deleted": crud.purge_idempotency_keys(db)}
+
+
+@handler("import_transactions")
+def _import_transactions(db: Session, context: JobContext) -> dict:
+    transaction_import = schemas.TransactionImport(**context.payload)
+    result = crud.import_transactions(
+        db, context.user_id, transaction_import.items, transaction_import.skip_duplicates,
+        on_batch=lambda fraction: context.progress(fraction, db),
+    )
+    if result is None:
+        raise PermanentJobError("Invalid category ID or no category could be suggested")
+    return result.model_dump()
+
+
+# ============== Queue ==============
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[dict] = None,
+    user_id: Optional[int] = None,
+    priority: int = 0,
+    max_attempts: int = 3
+) -> models.Job:
+    """Queue a job; higher priority runs first."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = db.scalars(
+        insert(models.Job).values(
+            kind=kind,
+            payload=payload,
+            user_id=user_id,
+            priority=priority,
+            max_attempts=max_attempts,
+        ).returning(models.Job)
+    ).one()
+    db.commit()
+    return job
+
+
+def get_job(db: Session, job_id: int, user_id: int) -> Optional[models.Job]:
+    """Get a job by ID, ensuring it belongs to the user."""
+    return db.query(models.Job).filter(
+        models.Job.id == job_id,
+        models.Job.user_id == user_id
+    ).first()
+
+
+def _claim() -> Optional[Tuple[int, int]]:
+    """
+    Claim the next runnable job: queued and due, or running with an
+    expired lease (its worker died).
+
+    Returns:
+        (job ID, attempt) of the claim, or None if there is nothing to run.
+    """
+    now = datetime.utcnow()
+    runnable = or_(
+        and_(models.Job.status == models.JobStatus.QUEUED, models.Job.run_after <= now),
+        and_(models.Job.status == models.JobStatus.RUNNING, models.Job.lease_expires_at < now),
+    )
+    db = SessionLocal()
+    try:
+        job_id = db.query(models.Job.id).filter(runnable).order_by(
+            models.Job.priority.desc(), models.Job.id
+        ).limit(1).with_for_update(skip_locked=True).scalar()
+        if job_id is None:
+            db.rollback()
+            return None
+
+        # Conditional, so backends without row locks (SQLite) can't double-claim
+        claimed = db.query(models.Job).filter(models.Job.id == job_id, runnable).update({
+            models.Job.status: models.JobStatus.RUNNING,
+            models.Job.attempts: models.Job.attempts + 1,
+            models.Job.started_at: now,
+            models.Job.lease_expires_at: now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        }, synchronize_session=False)
+        attempt = db.query(models.Job.attempts).filter(models.Job.id == job_id).scalar()
+        db.commit()
+        return (job_id, attempt) if claimed else None
+    finally:
+        db.close()
+
+
+def _execute(job_id: int, attempt: int) -> None:
+    """
+    Run a claimed job and record its outcome, scheduling a retry on failure.
+    The outcome is only written while the claim still holds the job.
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(models.Job, job_id)
+        kind, max_attempts = job.kind, job.max_attempts
+        values = {models.Job.lease_expires_at: None}
+        try:
+            if job.attempts != attempt:
+                raise LeaseLost(f"Job {job_id} was claimed again")
+            if attempt > max_attempts:
+                raise PermanentJobError("Lease expired too many times")
+            kind_handler = HANDLERS.get(kind)
+            if kind_handler is None:
+                raise PermanentJobError(f"Unknown job kind: {kind}")
+            result = kind_handler(db, JobContext(job))
+        except LeaseLost:
+            db.rollback()
+            logger.warning("Job %d (%s) lost its lease on attempt %d", job_id, kind, attempt)
+            return
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Job %d (%s) failed on attempt %d", job_id, kind, attempt)
+            values[models.Job.error] = f"{type(exc).__name__}: {exc}"
+            if isinstance(exc, PermanentJobError) or attempt >= max_attempts:
+                values[models.Job.status] = models.JobStatus.FAILED
+                values[models.Job.finished_at] = datetime.utcnow()
+            else:
+                values[models.Job.status] = models.JobStatus.QUEUED
+                values[models.Job.run_after] = datetime.utcnow() + timedelta(
+                    seconds=RETRY_BASE_SECONDS * 2 ** (attempt - 1)
+                )
+        else:
+            values.update({
+                models.Job.status: models.JobStatus.SUCCEEDED,
+                models.Job.progress: 1.0,
+                models.Job.result: result,
+                models.Job.error: None,
+                models.Job.finished_at: datetime.utcnow(),
+            })
+        recorded = db.query(models.Job).filter(_held(job_id, attempt)).update(values, synchronize_session=False)
+        db.commit()
+        if not recorded:
+            logger.warning("Job %d (%s) lost its lease on attempt %d; outcome not recorded", job_id, kind, attempt)
+    finally:
+        db.close()
+
+
+# ============== Workers ==============
+
+_tasks: List[asyncio.Task] = []
+_stop: Optional[asyncio.Event] = None
+
+
+async def _worker() -> None:
+    while not _stop.is_set():
+        try:
+            claim = await asyncio.to_thread(_claim)
+        except Exception:
+            logger.exception("Claiming a job failed")
+            claim = None
+
+        if claim is None:
+            try:
+                await asyncio.wait_for(_stop.wait(), settings.JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        try:
+            await asyncio.to_thread(_execute, *claim)
+        except Exception:
+            # The lease expires and another claim retries the job
+            logger.exception("Running job %d failed", claim[0])
+
+
+def start() -> None:
+    """Start JOB_WORKERS worker tasks on the running event loop."""
+    global _stop
+    if settings.JOB_WORKERS <= 0 or _tasks:
+        return
+    _stop = asyncio.Event()
+    for i in range(settings.JOB_WORKERS):
+        _tasks.append(asyncio.create_task(_worker(), name=f"job-worker-{i}"))
+
+
+async def stop() -> None:
+    """Stop the workers after their current job finishes."""
+    if not _tasks:
+        return
+    _stop.set()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        job = enqueue(db, sys.argv[1], priority=int(sys.argv[2]) if len(sys.argv) > 2 else 0)
+        print(f"Queued job {job.id} ({job.kind})")
+    finally:
+        db.close()
@@ -0,0 +1,123 @@
+"""
+Startup and shutdown steps of the API process.
+Startup verifies the schema revision (migrations are applied separately,
+with `alembic upgrade head`), opens pool connections and primes lazy
+caches before the process reports ready. Shutdown waits for in-flight
+requests before connections are closed.
+"""
+import asyncio
+import logging
+import time
+from pathlib import Path
+
+from .auth import pwd_context
+from .config import get_settings
+from .database import engine
+from . import forecast
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+_ready = False
+_in_flight = 0
+
+
+# ============== Readiness ==============
+
+def is_ready() -> bool:
+    """Whether the process should receive traffic."""
+    return _ready
+
+
+def set_ready(ready: bool) -> None:
+    global _ready
+    _ready = ready
+
+
+class InFlightMiddleware:
+    """Counts HTTP requests being served, so shutdown can wait for them."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        # Event streams stay open until the client leaves; don't wait for them
+        if scope["type"] != "http" or scope["path"].startswith("/events"):
+            return await self.app(scope, receive, send)
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _in_flight -= 1
+
+
+# ============== Startup ==============
+
+def schema_head() -> str:
+    """Head revision of the bundled migrations."""
+    # alembic.script pulls in mako and pygments; import only when checking
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(BACKEND_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def verify_schema() -> None:
+    """
+    Check the database is migrated to the head revision.
+    One read of alembic_version instead of DDL and catalog queries.
+
+    Raises:
+        RuntimeError: If the database revision differs from the head.
+    """
+    from alembic.runtime.migration import MigrationContext
+
+    head = schema_head()
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_revision()
+    if current != head:
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {head}; run 'alembic upgrade head'"
+        )
+
+
+def warm_pool() -> None:
+    """Open DB_POOL_WARMUP connections up front so first requests don't pay for them."""
+    count = min(settings.DB_POOL_WARMUP, settings.DB_POOL_SIZE)
+    connections = [engine.connect() for _ in range(count)]
+    for connection in connections:
+        connection.exec_driver_sql("SELECT 1")
+    for connection in connections:
+        connection.close()
+
+
+def prime_caches() -> None:
+    """Load lazily initialized backends that would otherwise slow the first requests."""
+    pwd_context.handler("bcrypt").get_backend()
+    forecast.start_pool()
+
+
+def startup() -> None:
+    """Run the blocking startup steps; the caller marks the process ready afterwards."""
+    started = time.perf_counter()
+    if settings.SCHEMA_CHECK:
+        verify_schema()
+    warm_pool()
+    prime_caches()
+    logger.info("Startup finished in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+# ============== Shutdown ==============
+
+async def drain() -> None:
+    """Wait up to DRAIN_TIMEOUT_SECONDS for in-flight requests to finish."""
+    deadline = time.monotonic() + settings.DRAIN_TIMEOUT_SECONDS
+    while _in_flight and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    if _in_flight:
+        logger.warning("Shutting down with %d requests still in flight", _in_flight)
@@ -2,12 +2,17 @@
 Finance Manager API - Main Entry Point.
 FastAPI application with CORS, routers, and database initialization.
 """
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from .database import engine, Base
-from .routers import auth, categories, transactions, reports
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
+
+from .database import engine, timeout_kind
+from . import admission, events, forecast, jobs, lifecycle, metrics, profiling, write_buffer
+from .routers import auth, categories, transactions, reports, sync, live, jobs as jobs_router
 from .config import get_settings
 
 settings = get_settings()
@@ -17,13 +22,26 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     """
     Application lifespan handler.
-    Creates database tables on startup.
+    Verifies the schema, warms the connection pool and starts the event
+    bridge and job workers before reporting ready; on shutdown, stops
+    taking traffic, drains requests, then stops background work and pools.
     """
-    # Startup: Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Startup: Schema check and warm-up, then take traffic
+    await asyncio.to_thread(lifecycle.startup)
+    events.start_bridge()
+    jobs.start()
+    lifecycle.set_ready(True)
     yield
-    # Shutdown: Cleanup if needed
-    pass
+    # Shutdown: Fail readiness, let in-flight requests and running jobs
+    # finish, commit buffered writes, stop the event bridge and forecast
+    # worker processes, and close pooled connections
+    lifecycle.set_ready(False)
+    await lifecycle.drain()
+    await jobs.stop()
+    write_buffer.shutdown()
+    events.stop_bridge()
+    forecast.shutdown_pool()
+    engine.dispose()
 
 
 # Create FastAPI application
@@ -34,6 +52,12 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Opt-in profiling of single requests, innermost so queueing isn't profiled
+app.add_middleware(profiling.ProfileMiddleware)
+
+# Admission control, inside CORS so 429s carry CORS headers
+app.add_middleware(admission.AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -46,12 +70,49 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(lifecycle.InFlightMiddleware)
+
+metrics.counter("db_timeouts_total", "Requests failed by a database timeout, by kind and route")
+
+
+def _route_path(request: Request) -> str:
+    route = request.scope.get("route")
+    return route.path if route else request.url.path
+
+
+@app.exception_handler(DBAPIError)
+async def database_timeout_handler(request: Request, exc: DBAPIError):
+    """
+    A statement over its budget is a 504; a lock wait over its budget is
+    a 503 the client may retry. Other database errors stay 500s.
+    """
+    kind = timeout_kind(exc)
+    if kind is None:
+        raise exc
+    metrics.inc("db_timeouts_total", kind=kind, route=_route_path(request))
+    if kind == "statement":
+        return JSONResponse(status_code=504, content={"detail": "Query took too long"})
+    return JSONResponse(
+        status_code=503, content={"detail": "Data is busy, try again"}, headers={"Retry-After": "1"}
+    )
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """No pooled connection freed up within DB_POOL_TIMEOUT_SECONDS."""
+    metrics.inc("db_timeouts_total", kind="pool", route=_route_path(request))
+    return JSONResponse(
+        status_code=503, content={"detail": "Server busy, try again"}, headers={"Retry-After": "1"}
+    )
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(categories.router)
 app.include_router(transactions.router)
 app.include_router(reports.router)
+app.include_router(sync.router)
+app.include_router(live.router)
+app.include_router(jobs_router.router)
 
 
 @app.get("/", tags=["Health"])
@@ -66,5 +127,19 @@ def root():
 
 @app.get("/health", tags=["Health"])
 def health_check():
-    """Health check endpoint for Docker/K8s probes."""
+    """Liveness check endpoint for Docker/K8s probes."""
     return {"status": "healthy"}
+
+
+@app.get("/ready", tags=["Health"])
+def readiness_check():
+    """Readiness check endpoint: 503 until startup finishes and once shutdown begins."""
+    if not lifecycle.is_ready():
+        return JSONResponse(status_code=503, content={"status": "unavailable"})
+    return {"status": "ready"}
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Process metrics in the Prometheus text format."""
+    return metrics.render()
@@ -0,0 +1,65 @@
+"""
+Process metrics.
+Counters live in memory and are served in the Prometheus text format at
+GET /metrics; gauges are computed when scraped. Each API process reports
+its own values.
+"""
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Tuple
+
+PREFIX = "finance_"
+
+# (name, sorted label items) -> value
+_counters: Dict[Tuple[str, tuple], float] = defaultdict(float)
+_gauges: Dict[str, Callable[[], float]] = {}
+_help: Dict[str, Tuple[str, str]] = {}  # name -> (type, help text)
+_lock = threading.Lock()
+
+
+def counter(name: str, help_text: str) -> None:
+    """Declare a counter, so it is listed with its help text."""
+    _help[name] = ("counter", help_text)
+
+
+def gauge(name: str, help_text: str):
+    """Register a function computing a gauge's value at scrape time."""
+    def register(func: Callable[[], float]):
+        _help[name] = ("gauge", help_text)
+        _gauges[name] = func
+        return func
+    return register
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """Add to a counter."""
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] += value
+
+
+def value(name: str, **labels) -> float:
+    """Current value of a counter."""
+    with _lock:
+        return _counters.get((name, tuple(sorted(labels.items()))), 0.0)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    with _lock:
+        counters = dict(_counters)
+    samples: Dict[str, list] = defaultdict(list)
+    for (name, labels), count in counters.items():
+        samples[name].append((labels, count))
+    for name, func in _gauges.items():
+        samples[name].append(((), func()))
+
+    lines = []
+    for name in sorted(samples):
+        kind, help_text = _help.get(name, ("untyped", ""))
+        lines.append(f"# HELP {PREFIX}{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}{name} {kind}")
+        for labels, sample in sorted(samples[name]):
+            label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+            lines.append(f"{PREFIX}{name}{{{label_text}}} {sample}" if label_text else f"{PREFIX}{name} {sample}")
+    return "\n".join(lines) + "\n"
@@ -4,8 +4,8 @@ Defines User, Category, and Transaction tables.
 """
 from datetime import datetime
 from sqlalchemy import (
-    Column, Integer, String, Float, DateTime, 
-    ForeignKey, Enum as SQLEnum, Text
+    Column, Integer, String, Float, DateTime, Boolean, JSON,
+    ForeignKey, Enum as SQLEnum, Text, Index, UniqueConstraint, text
 )
 from sqlalchemy.orm import relationship
 import enum
@@ -19,6 +19,26 @@ class TransactionType(str, enum.Enum):
     EXPENSE = "expense"
 
 
+class AnomalyKind(str, enum.Enum):
+    """Enum for kinds of flagged transactions."""
+    LARGE_AMOUNT = "large_amount"
+    DUPLICATE = "duplicate"
+
+
+class ChangeEntity(str, enum.Enum):
+    """Enum for entity types in the sync change feed."""
+    TRANSACTION = "transaction"
+    CATEGORY = "category"
+
+
+class JobStatus(str, enum.Enum):
+    """Enum for background job states."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
 class OAuthProvider(str, enum.Enum):
     """Enum for OAuth providers."""
     LOCAL = "local"
@@ -42,11 +62,20 @@ class User(Base):
         nullable=False
     )
     oauth_id = Column(String(255), nullable=True)  # Provider-specific user ID
+    opening_balance = Column(Float, nullable=False, default=0, server_default="0")  # Balance before first transaction
+    data_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped when totals change
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")  # Last sync feed sequence number
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
-    categories = relationship("Category", back_populates="user", cascade="all, delete-orphan")
-    transactions = relationship("Transaction", back_populates="user", cascade="all, delete-orphan")
+    # passive_deletes: rely on the ON DELETE CASCADE foreign keys instead of
+    # loading every child row into the session before deleting it
+    categories = relationship(
+        "Category", back_populates="user", cascade="all, delete-orphan", passive_deletes=True
+    )
+    transactions = relationship(
+        "Transaction", back_populates="user", cascade="all, delete-orphan", passive_deletes=True
+    )
     
     def __repr__(self):
         return f"<User(id={self.id}, email={self.email})>"
@@ -67,7 +96,8 @@ class Category(Base):
     
     # Relationships
     user = relationship("User", back_populates="categories")
-    transactions = relationship("Transaction", back_populates="category", cascade="all, delete-orphan")
+    # Deleting a category keeps its transactions: the FK is ON DELETE SET NULL
+    transactions = relationship("Transaction", back_populates="category", passive_deletes=True)
     
     def __repr__(self):
         return f"<Category(id={self.id}, name={self.name}, type={self.type})>"
@@ -79,14 +109,27 @@ class Transaction(Base):
     Each transaction belongs to a user and a category.
     """
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Serves every per-user, date-bounded report scan
+        Index("ix_transactions_user_id_date", "user_id", "date"),
+        # Import dedupe: one row per statement line (manual entries have no fingerprint)
+        Index(
+            "uq_transactions_user_id_fingerprint", "user_id", "fingerprint",
+            unique=True,
+            postgresql_where=text("fingerprint IS NOT NULL"),
+            sqlite_where=text("fingerprint IS NOT NULL"),
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False)
     description = Column(Text, nullable=True)
     date = Column(DateTime, nullable=False, default=datetime.utcnow)
-    category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True)
+    category_id = Column(Integer, ForeignKey("categories.id", ondelete="SET NULL"), nullable=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Hash of day, amount and normalized description, set on imported rows
+    fingerprint = Column(String(64), nullable=True)
     
     # Relationships
     user = relationship("User", back_populates="transactions")
@@ -94,3 +137,144 @@ class Transaction(Base):
     
     def __repr__(self):
         return f"<Transaction(id={self.id}, amount={self.amount}, date={self.date})>"
+
+
+class BalanceCheckpoint(Base):
+    """
+    Cumulative income/expense of a user at a period boundary.
+    Totals cover every transaction dated before period_start; rows are
+    dropped when an earlier transaction changes and rebuilt on demand.
+    """
+    __tablename__ = "balance_checkpoints"
+    __table_args__ = (
+        UniqueConstraint("user_id", "period_start", name="uq_balance_checkpoints_user_period"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    period_start = Column(DateTime, nullable=False)
+    total_income = Column(Float, nullable=False, default=0)
+    total_expense = Column(Float, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<BalanceCheckpoint(user_id={self.user_id}, period_start={self.period_start})>"
+
+
+class Anomaly(Base):
+    """
+    A transaction flagged by the anomaly scan.
+    Score is the robust z-score for large amounts, the number of earlier
+    copies for duplicates.
+    """
+    __tablename__ = "anomalies"
+    __table_args__ = (
+        UniqueConstraint("transaction_id", "kind", name="uq_anomalies_transaction_kind"),
+        Index("ix_anomalies_user_id_detected_at", "user_id", "detected_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    transaction_id = Column(Integer, ForeignKey("transactions.id", ondelete="CASCADE"), nullable=False)
+    kind = Column(SQLEnum(AnomalyKind), nullable=False)
+    score = Column(Float, nullable=False)
+    detected_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    transaction = relationship("Transaction")
+    
+    def __repr__(self):
+        return f"<Anomaly(transaction_id={self.transaction_id}, kind={self.kind})>"
+
+
+class JobWatermark(Base):
+    """Last processed transaction ID of an incremental batch job."""
+    __tablename__ = "job_watermarks"
+    
+    name = Column(String(100), primary_key=True)
+    last_id = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<JobWatermark(name={self.name}, last_id={self.last_id})>"
+
+
+class IdempotencyKey(Base):
+    """
+    Stored outcome of a write sent with an Idempotency-Key header.
+    A row without status_code is a write still in progress; rows are
+    purged after expires_at.
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+        Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # Route + body, to reject key reuse
+    status_code = Column(Integer, nullable=True)
+    response = Column(Text, nullable=True)  # JSON body
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<IdempotencyKey(user_id={self.user_id}, key={self.key})>"
+
+
+class Change(Base):
+    """
+    Latest change of a transaction or category, for the sync feed.
+    One row per entity: each write moves it to the user's next sequence
+    number; deletes leave it as a tombstone.
+    """
+    __tablename__ = "changes"
+    __table_args__ = (
+        UniqueConstraint("user_id", "entity", "entity_id", name="uq_changes_user_entity"),
+        # Serves the "what changed since seq" range probe
+        Index("ix_changes_user_id_seq", "user_id", "seq"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    entity = Column(SQLEnum(ChangeEntity), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    seq = Column(Integer, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<Change(user_id={self.user_id}, {self.entity}={self.entity_id}, seq={self.seq})>"
+
+
+class Job(Base):
+    """
+    A background job, claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED.
+    A running job whose lease expired (its worker died) is claimed again.
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Serves the claim query: next runnable job by priority
+        Index("ix_jobs_status_priority", "status", "priority", "run_after"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)  # NULL for system jobs
+    kind = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=True)
+    status = Column(SQLEnum(JobStatus), nullable=False, default=JobStatus.QUEUED)
+    priority = Column(Integer, nullable=False, default=0)  # Higher runs first
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    progress = Column(Float, nullable=False, default=0)  # 0..1
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)  # Retry backoff
+    lease_expires_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind={self.kind}, status={self.status})>"
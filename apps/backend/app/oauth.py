@@ -1,14 +1,15 @@
 """
 OAuth utilities module.
 Handles Google and GitHub OAuth authentication flows.
+httpx is imported on first code exchange; it is a large import that
+most processes never need.
 """
 from typing import Optional, Tuple
 from urllib.parse import urlencode
-import httpx
 from sqlalchemy.orm import Session
 
 from .config import get_settings
-from . import models
+from . import crud, models
 from .auth import create_access_token
 
 settings = get_settings()
@@ -64,6 +65,8 @@ async def verify_google_token(code: str) -> Optional[dict]:
     Returns:
         Dictionary with user info (email, sub) or None if failed.
     """
+    import httpx
+    
     async with httpx.AsyncClient() as client:
         # Exchange code for access token
         token_response = await client.post(
@@ -108,6 +111,8 @@ async def verify_github_token(code: str) -> Optional[dict]:
     Returns:
         Dictionary with user info (email, id) or None if failed.
     """
+    import httpx
+    
     async with httpx.AsyncClient() as client:
         # Exchange code for access token
         token_response = await client.post(
@@ -172,7 +177,7 @@ def get_or_create_oauth_user(
     oauth_id: str
 ) -> Tuple[models.User, str]:
     """
-    Find or create a user from OAuth profile.
+    Find or create a user from OAuth profile in one upsert.
     
     Args:
         db: Database session.
@@ -183,27 +188,7 @@ def get_or_create_oauth_user(
     Returns:
         Tuple of (User model, JWT access token).
     """
-    # Check if user exists with this email
-    user = db.query(models.User).filter(models.User.email == email).first()
-    
-    if user:
-        # Update OAuth info if needed
-        if user.oauth_provider == models.OAuthProvider.LOCAL:
-            # Existing local user - link OAuth account
-            user.oauth_provider = oauth_provider
-            user.oauth_id = oauth_id
-            db.commit()
-    else:
-        # Create new OAuth user
-        user = models.User(
-            email=email,
-            hashed_password=None,  # No password for OAuth users
-            oauth_provider=oauth_provider,
-            oauth_id=oauth_id,
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    user = crud.upsert_oauth_user(db, email, oauth_provider, oauth_id)
     
     # Create access token
     access_token = create_access_token(
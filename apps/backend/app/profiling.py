@@ -0,0 +1,185 @@
+"""
+Per-request profiling.
+A request carrying `X-Profile: <PROFILE_ADMIN_TOKEN>` runs under a
+sampling profiler and has its SQL statements timed. The result is written
+to PROFILE_DIR/<request id>.json: folded stacks ("flamegraph", the input
+of flamegraph.pl or speedscope) and the query trace. The response carries
+the id in X-Profile-Id. Without the header nothing is sampled or traced.
+
+    jq -r '.flamegraph[]' <id>.json | flamegraph.pl > <id>.svg
+"""
+import asyncio
+import hmac
+import json
+import logging
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from .config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Client-supplied request ids used as file names must look like this
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_current: ContextVar[Optional["Profile"]] = ContextVar("profile", default=None)
+
+_sql_trace_installed = False
+_install_lock = threading.Lock()
+
+
+class Profile:
+    """Samples and queries of one request."""
+
+    def __init__(self, request_id: str, method: str, path: str):
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.threads = set()  # Threads working on the request
+        self.stacks: Counter = Counter()
+        self.queries = []
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+        self._duration = 0.0
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, name=f"profile-{request_id}", daemon=True)
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._duration = time.perf_counter() - self._started
+        self._stop.set()
+        self._sampler.join()
+
+    def _sample(self) -> None:
+        interval = settings.PROFILE_INTERVAL_MS / 1000
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.threads):
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                if stack and not stack[0].startswith("threading:"):  # Idle pool thread
+                    self.stacks[";".join(reversed(stack))] += 1
+
+    def write(self, status: Optional[int]) -> Path:
+        """Write the artifact; returns its path."""
+        directory = Path(settings.PROFILE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{self.request_id}.json"
+        path.write_text(json.dumps({
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self._duration * 1000, 3),
+            "sample_interval_ms": settings.PROFILE_INTERVAL_MS,
+            "samples": sum(self.stacks.values()),
+            "sql_ms": round(sum(query["duration_ms"] for query in self.queries), 3),
+            "flamegraph": [f"{stack} {count}" for stack, count in self.stacks.most_common()],
+            "queries": self.queries,
+        }, indent=2))
+        return path
+
+
+def attach() -> None:
+    """Mark the calling thread as working on the current profiled request, if any."""
+    profile = _current.get()
+    if profile is not None:
+        profile.threads.add(threading.get_ident())
+
+
+# ============== SQL trace ==============
+
+def _install_sql_trace() -> None:
+    """Register the statement timing listeners, on the first profiled request."""
+    global _sql_trace_installed
+    with _install_lock:
+        if _sql_trace_installed:
+            return
+        from sqlalchemy import event
+        from .database import engine
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            profile = _current.get()
+            if profile is not None:
+                profile.threads.add(threading.get_ident())
+                context.profile_started = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            profile = _current.get()
+            if profile is not None and hasattr(context, "profile_started"):
+                duration = time.perf_counter() - context.profile_started
+                # Parameters are left out: they hold user data and password hashes
+                profile.queries.append({
+                    "statement": statement,
+                    "duration_ms": round(duration * 1000, 3),
+                    "rowcount": cursor.rowcount,
+                    "executemany": executemany,
+                })
+
+        _sql_trace_installed = True
+
+
+# ============== Middleware ==============
+
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
+
+
+class ProfileMiddleware:
+    """Profiles requests that present the admin profiling token."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.PROFILE_ADMIN_TOKEN:
+            return await self.app(scope, receive, send)
+        header = _header(scope, b"x-profile")
+        if header is None or not hmac.compare_digest(header, settings.PROFILE_ADMIN_TOKEN.encode()):
+            return await self.app(scope, receive, send)
+
+        request_id = (_header(scope, b"x-request-id") or b"").decode("latin-1")
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        _install_sql_trace()
+
+        status = None
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", request_id.encode())]
+            await send(message)
+
+        profile = Profile(request_id, scope["method"], scope["path"])
+        profile.threads.add(threading.get_ident())  # The event loop
+        token = _current.set(profile)
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.stop()
+            _current.reset(token)
+            path = await asyncio.to_thread(profile.write, status)
+            logger.info("Profiled %s %s in %s", scope["method"], scope["path"], path)
@@ -34,14 +34,12 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     Raises:
         400: If email already registered.
     """
-    existing_user = crud.get_user_by_email(db, user.email)
-    if existing_user:
+    db_user = crud.create_user(db, user)
+    if not db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
-    
-    db_user = crud.create_user(db, user)
     return db_user
 
 
@@ -86,6 +84,21 @@ def get_me(current_user: models.User = Depends(get_current_user)):
     return current_user
 
 
+@router.patch("/me", response_model=schemas.UserResponse)
+def update_me(
+    user_update: schemas.UserUpdate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Update current user settings (e.g. opening balance).
+    
+    Returns:
+        Updated user information.
+    """
+    return crud.update_user(db, current_user, user_update)
+
+
 # ============== OAuth Routes ==============
 
 @router.get("/google")
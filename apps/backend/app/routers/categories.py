@@ -105,6 +105,45 @@ def get_category(
     return category
 
 
+@router.post("/{category_id}/merge-into/{target_id}", response_model=schemas.CategoryResponse)
+def merge_category(
+    category_id: int,
+    target_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Merge a category into another one.
+    All transactions are moved to the target and the source is deleted.
+    
+    Returns:
+        Target category.
+    
+    Raises:
+        404: If either category not found.
+        400: If categories are the same or have different types.
+    """
+    source = crud.get_category(db, category_id, current_user.id)
+    target = crud.get_category(db, target_id, current_user.id)
+    if not source or not target:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Category not found"
+        )
+    if source.id == target.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot merge a category into itself"
+        )
+    if source.type != target.type:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cannot merge categories of different types"
+        )
+    
+    return crud.merge_category(db, source, target)
+
+
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_category(
     category_id: int,
@@ -113,7 +152,7 @@ def delete_category(
 ):
     """
     Delete a category by ID.
-    Also deletes all associated transactions (cascade).
+    Associated transactions are kept and become uncategorized.
     
     Raises:
         404: If category not found.
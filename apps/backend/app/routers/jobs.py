@@ -0,0 +1,53 @@
+"""
+Jobs router.
+Queue heavy work in the background and poll its progress.
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from .. import schemas, jobs, models
+from ..database import get_db
+from ..auth import get_current_user
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+@router.post("/imports", response_model=schemas.JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def queue_import(
+    transaction_import: schemas.TransactionImport,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Queue a transaction import (same body as POST /transactions/import).
+    
+    Returns:
+        The queued job; poll GET /jobs/{id} for its result.
+    """
+    return jobs.enqueue(
+        db,
+        "import_transactions",
+        payload=transaction_import.model_dump(mode="json"),
+        user_id=current_user.id,
+    )
+
+
+@router.get("/{job_id}", response_model=schemas.JobResponse)
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Get the status, progress and result of a job.
+    
+    Raises:
+        404: If job not found.
+    """
+    job = jobs.get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
@@ -0,0 +1,97 @@
+"""
+Live events router.
+Pushes per-user change notifications over Server-Sent Events or WebSocket,
+so dashboards refetch only after a write instead of polling.
+"""
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from .. import events
+from ..auth import decode_access_token
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# Seconds between SSE keep-alive comments on an idle stream
+KEEPALIVE_SECONDS = 15
+
+
+def _user_id(token: Optional[str]) -> Optional[int]:
+    """User ID of a valid access token; no database access."""
+    token_data = decode_access_token(token) if token else None
+    return token_data.user_id if token_data else None
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None),
+):
+    """
+    Stream the current user's change notifications as Server-Sent Events.
+    Authenticate with the Authorization header or, for EventSource, the
+    `token` query parameter.
+    
+    Each `change` event carries the latest sync sequence number (`seq`,
+    see GET /sync/changes) and the earliest date whose balances changed
+    (`balance_since`); reports covering earlier periods are unaffected.
+    
+    Raises:
+        401: If the token is invalid.
+    """
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    user_id = _user_id(token)
+    if user_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    async def stream():
+        with events.hub.subscribe(user_id) as queue:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/ws")
+async def events_socket(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    WebSocket alternative to GET /events; sends the same events as JSON.
+    Authenticate with the `token` query parameter.
+    """
+    user_id = _user_id(token)
+    if user_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    
+    await websocket.accept()
+    with events.hub.subscribe(user_id) as queue:
+        async def forward():
+            while True:
+                await websocket.send_json(await queue.get())
+        
+        sender = asyncio.create_task(forward())
+        try:
+            while True:
+                await websocket.receive_text()  # Only to notice disconnects
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
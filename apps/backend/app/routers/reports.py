@@ -3,15 +3,47 @@ Reports router.
 Aggregated financial reports and analytics.
 """
 from datetime import datetime
-from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
-from .. import schemas, crud, models
-from ..database import get_db
+from .. import schemas, crud, models, forecast, anomalies
+from ..database import db_timeouts, get_db
 from ..auth import get_current_user
+from ..config import get_settings
 
-router = APIRouter(prefix="/reports", tags=["Reports"])
+settings = get_settings()
+
+# Aggregates over a long history legitimately take longer than CRUD
+router = APIRouter(
+    prefix="/reports",
+    tags=["Reports"],
+    dependencies=[db_timeouts(settings.DB_REPORTS_STATEMENT_TIMEOUT_MS)],
+)
+
+# Upper bound on points per time series (5 years of days fits comfortably)
+MAX_TIMESERIES_BUCKETS = 4000
+APPROX_BUCKET_DAYS = {
+    schemas.TimeBucket.DAY: 1,
+    schemas.TimeBucket.WEEK: 7,
+    schemas.TimeBucket.MONTH: 28,
+    schemas.TimeBucket.QUARTER: 90,
+    schemas.TimeBucket.YEAR: 365,
+}
+
+
+def _check_bucket_range(start: datetime, end: datetime, bucket: schemas.TimeBucket) -> None:
+    """Reject inverted ranges and series with too many buckets."""
+    if end < start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must not be before start"
+        )
+    if (end - start).days // APPROX_BUCKET_DAYS[bucket] + 1 > MAX_TIMESERIES_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many buckets, use a wider bucket (max {MAX_TIMESERIES_BUCKETS})"
+        )
 
 
 @router.get("/summary", response_model=schemas.ReportSummary)
@@ -70,3 +102,158 @@ def get_monthly_trends(
         Monthly trends with income, expense, and balance per month.
     """
     return crud.get_monthly_trends(db, current_user.id, months)
+
+
+@router.get("/timeseries", response_model=schemas.TimeSeriesReport)
+def get_timeseries(
+    start: datetime,
+    end: datetime,
+    bucket: schemas.TimeBucket = schemas.TimeBucket.MONTH,
+    category_ids: Optional[List[int]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Get income/expense totals per day, week, month, quarter or year.
+    
+    Args:
+        start: Start of period (inclusive).
+        end: End of period (inclusive).
+        bucket: Bucket width (default month).
+        category_ids: Optional categories to include (repeat the parameter).
+    
+    Returns:
+        Columnar series: periods, income, expense and balance lists.
+    
+    Raises:
+        400: If the range is inverted or has too many buckets.
+    """
+    _check_bucket_range(start, end, bucket)
+    return crud.get_timeseries(db, current_user.id, bucket, start, end, category_ids)
+
+
+@router.get("/balance-history", response_model=schemas.BalanceHistory)
+def get_balance_history(
+    start: datetime,
+    end: datetime,
+    bucket: schemas.TimeBucket = schemas.TimeBucket.MONTH,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Get the running balance at the end of each bucket.
+    
+    Args:
+        start: Start of period (inclusive).
+        end: End of period (inclusive).
+        bucket: Bucket width (default month).
+    
+    Returns:
+        Columnar series of periods, net flow and closing balance.
+    
+    Raises:
+        400: If the range is inverted or has too many buckets.
+    """
+    _check_bucket_range(start, end, bucket)
+    return crud.get_balance_history(db, current_user, bucket, start, end)
+
+
+@router.get("/balance-at", response_model=schemas.PointInTimeBalance)
+def get_balance_at(
+    at: datetime,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Get the balance as of a point in time.
+    
+    Args:
+        at: Point in time; transactions dated on or before it count.
+    
+    Returns:
+        Cumulative income, expense and balance (including opening balance).
+    """
+    return crud.get_balance_at(db, current_user, at)
+
+
+@router.get("/compare", response_model=schemas.ComparisonReport)
+def get_comparison(
+    period: schemas.ComparisonPeriod = schemas.ComparisonPeriod.MONTH,
+    offset: int = Query(1, ge=1, le=120),
+    date: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Compare per-category totals of a period with an earlier one.
+    
+    Args:
+        period: Period length (month, quarter or year).
+        offset: Periods back to compare with (month + 12 = year-over-year).
+        date: Any moment inside the current period (default now).
+    
+    Returns:
+        Current and previous totals per category with deltas.
+    """
+    return crud.get_comparison(db, current_user.id, period, offset, date)
+
+
+@router.get("/distribution", response_model=schemas.DistributionReport)
+def get_distribution(
+    buckets: int = Query(10, ge=1, le=50),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Get amount statistics and histogram per category.
+    
+    Args:
+        buckets: Number of histogram buckets (default 10, max 50).
+        start_date: Optional start of period.
+        end_date: Optional end of period.
+    
+    Returns:
+        Count, mean, median, p90, stddev, min/max and histogram per category.
+    """
+    return crud.get_distribution(db, current_user.id, buckets, start_date, end_date)
+
+
+@router.get("/forecast", response_model=schemas.ForecastReport)
+def get_forecast(
+    months: int = Query(6, ge=1, le=24),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Forecast the balance at the end of each of the next months.
+    
+    Args:
+        months: Number of months to project (default 6, max 24).
+    
+    Returns:
+        Expected balance with 95% band per month end and detected recurring flows.
+    """
+    return forecast.get_forecast(db, current_user, months)
+
+
+@router.get("/anomalies", response_model=list[schemas.AnomalyResponse])
+def get_anomalies(
+    kind: Optional[schemas.AnomalyKind] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    List transactions flagged by the anomaly scan, newest first.
+    
+    Args:
+        kind: Optional filter (large_amount/duplicate).
+        limit: Maximum items to return (default 50, max 200).
+    
+    Returns:
+        Flagged transactions with their scores.
+    """
+    kind_filter = models.AnomalyKind(kind.value) if kind else None
+    return anomalies.get_anomalies(db, current_user.id, kind_filter, limit)
@@ -0,0 +1,34 @@
+"""
+Sync router.
+Delta-sync feed so clients fetch only what changed since their last sync.
+"""
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from .. import schemas, crud, models
+from ..database import get_db
+from ..auth import get_current_user
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+@router.get("/changes", response_model=schemas.SyncChanges)
+def get_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Get transactions and categories created, updated or deleted after `since`.
+    Start with since=0, then pass the returned next_since; repeat while
+    has_more is true.
+    
+    Args:
+        since: Last sequence number seen by the client.
+        limit: Maximum number of changes per page.
+    
+    Returns:
+        Changed rows, deleted IDs and the cursor for the next call.
+    """
+    return crud.get_changes(db, current_user.id, since, limit)
@@ -4,14 +4,16 @@ CRUD operations for financial transactions.
 """
 from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
 from sqlalchemy.orm import Session
 
-from .. import schemas, crud, models
+from .. import schemas, crud, idempotency, models, write_buffer
 from ..database import get_db
 from ..auth import get_current_user
+from ..config import get_settings
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
+settings = get_settings()
 
 
 @router.get("", response_model=schemas.TransactionListResponse)
@@ -66,25 +68,144 @@ def list_transactions(
 @router.post("", response_model=schemas.TransactionResponse, status_code=status.HTTP_201_CREATED)
 def create_transaction(
     transaction: schemas.TransactionCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
     """
     Create a new transaction.
+    If category_id is omitted, the category is suggested from the description.
+    Retries with the same Idempotency-Key header replay the first response.
+    With WRITE_BUFFER_ENABLED, concurrent creates share one commit.
     
     Returns:
         Created transaction.
     
     Raises:
-        400: If category doesn't exist.
+        400: If category doesn't exist or none could be suggested.
+        409/422: If the Idempotency-Key is in use or was used for another request.
     """
-    db_transaction = crud.create_transaction(db, transaction, current_user.id)
-    if not db_transaction:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid category ID"
+    def write(db: Session):
+        # Group commit can't join the idempotency key's transaction
+        if settings.WRITE_BUFFER_ENABLED and idempotency_key is None:
+            db_transaction = write_buffer.create_transaction(transaction, current_user.id)
+        else:
+            db_transaction = crud.create_transaction(db, transaction, current_user.id)
+        if not db_transaction:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid category ID" if transaction.category_id is not None
+                else "No category could be suggested for this description"
+            )
+        return db_transaction
+    
+    return idempotency.run(
+        db, current_user.id, idempotency_key, "POST /transactions", transaction,
+        schemas.TransactionResponse, status.HTTP_201_CREATED, write,
+    )
+
+
+@router.post("/import", response_model=schemas.TransactionImportResult, status_code=status.HTTP_201_CREATED)
+def import_transactions(
+    transaction_import: schemas.TransactionImport,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Create many transactions at once.
+    Rows without category_id are categorized from their description.
+    With skip_duplicates (default), lines imported before are skipped.
+    Retries with the same Idempotency-Key header replay the first response.
+    
+    Returns:
+        Number of created, skipped and auto-categorized transactions and their IDs.
+    
+    Raises:
+        400: If a category is invalid or can't be suggested.
+        409/422: If the Idempotency-Key is in use or was used for another request.
+    """
+    def write(db: Session):
+        result = crud.import_transactions(
+            db, current_user.id, transaction_import.items, transaction_import.skip_duplicates
         )
-    return db_transaction
+        if result is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid category ID or no category could be suggested"
+            )
+        return result
+    
+    return idempotency.run(
+        db, current_user.id, idempotency_key, "POST /transactions/import", transaction_import,
+        schemas.TransactionImportResult, status.HTTP_201_CREATED, write,
+    )
+
+
+@router.get("/suggest-category", response_model=Optional[schemas.CategorySuggestion])
+def suggest_category(
+    description: str = Query(..., min_length=1),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Suggest a category for a description from the user's past transactions.
+    
+    Returns:
+        Suggested category ID and match score, or null without a match.
+    """
+    return crud.suggest_category(db, current_user.id, description)
+
+
+@router.patch("/bulk", response_model=schemas.BulkOperationResult)
+def bulk_update_transactions(
+    bulk_update: schemas.TransactionBulkUpdate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Apply the same update to many transactions at once.
+    Transactions are selected by an ID list or by a filter expression.
+    Retries with the same Idempotency-Key header replay the first response.
+    
+    Returns:
+        Number of updated transactions.
+    
+    Raises:
+        400: If new category ID is invalid.
+        409/422: If the Idempotency-Key is in use or was used for another request.
+    """
+    def write(db: Session):
+        affected = crud.bulk_update_transactions(db, current_user.id, bulk_update)
+        if affected is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid category ID"
+            )
+        return schemas.BulkOperationResult(affected=affected)
+    
+    return idempotency.run(
+        db, current_user.id, idempotency_key, "PATCH /transactions/bulk", bulk_update,
+        schemas.BulkOperationResult, status.HTTP_200_OK, write,
+    )
+
+
+@router.delete("/bulk", response_model=schemas.BulkOperationResult)
+def bulk_delete_transactions(
+    bulk_delete: schemas.TransactionBulkDelete,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Delete many transactions at once.
+    Transactions are selected by an ID list or by a filter expression.
+    
+    Returns:
+        Number of deleted transactions.
+    """
+    affected = crud.bulk_delete_transactions(db, current_user.id, bulk_delete)
+    return schemas.BulkOperationResult(affected=affected)
 
 
 @router.get("/{transaction_id}", response_model=schemas.TransactionResponse)
@@ -2,9 +2,9 @@
 Pydantic schemas for request/response validation.
 Defines data transfer objects for API endpoints.
 """
-from datetime import datetime
-from typing import Optional, List
-from pydantic import BaseModel, EmailStr, Field
+from datetime import date, datetime
+from typing import Any, Optional, List
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from enum import Enum
 
 
@@ -14,6 +14,36 @@ class TransactionType(str, Enum):
     EXPENSE = "expense"
 
 
+class ComparisonPeriod(str, Enum):
+    """Period length for comparison reports."""
+    MONTH = "month"
+    QUARTER = "quarter"
+    YEAR = "year"
+
+
+class JobStatus(str, Enum):
+    """Background job state enum for API."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class AnomalyKind(str, Enum):
+    """Kind of flagged transaction."""
+    LARGE_AMOUNT = "large_amount"
+    DUPLICATE = "duplicate"
+
+
+class TimeBucket(str, Enum):
+    """Bucket width for time-series reports."""
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+    QUARTER = "quarter"
+    YEAR = "year"
+
+
 # ============== User Schemas ==============
 
 class UserBase(BaseModel):
@@ -26,9 +56,15 @@ class UserCreate(UserBase):
     password: str = Field(..., min_length=6)
 
 
+class UserUpdate(BaseModel):
+    """Schema for updating the current user's settings."""
+    opening_balance: Optional[float] = None
+
+
 class UserResponse(UserBase):
     """Schema for user response (excludes password)."""
     id: int
+    opening_balance: float = 0
     created_at: datetime
     
     class Config:
@@ -104,7 +140,27 @@ class TransactionBase(BaseModel):
 
 class TransactionCreate(TransactionBase):
     """Schema for creating a transaction."""
-    pass
+    category_id: Optional[int] = None  # Suggested from the description when omitted
+
+
+class TransactionImport(BaseModel):
+    """Schema for creating many transactions at once."""
+    items: List[TransactionCreate] = Field(..., min_length=1, max_length=5000)
+    skip_duplicates: bool = True  # Skip lines already imported before
+
+
+class TransactionImportResult(BaseModel):
+    """IDs of imported transactions, in input order (null for skipped duplicates)."""
+    created: int
+    skipped: int
+    auto_categorized: int
+    ids: List[Optional[int]]
+
+
+class CategorySuggestion(BaseModel):
+    """Category suggested for a description from the user's history."""
+    category_id: int
+    score: float
 
 
 class TransactionUpdate(BaseModel):
@@ -118,6 +174,7 @@ class TransactionUpdate(BaseModel):
 class TransactionResponse(TransactionBase):
     """Schema for transaction response with category info."""
     id: int
+    category_id: Optional[int] = None  # NULL once its category is deleted
     user_id: int
     created_at: datetime
     category: Optional[CategoryResponse] = None
@@ -135,6 +192,41 @@ class TransactionListResponse(BaseModel):
     pages: int
 
 
+class TransactionFilter(BaseModel):
+    """Filter expression, same fields as the GET /transactions query parameters."""
+    category_id: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    type: Optional[TransactionType] = None
+
+
+class TransactionBulkSelector(BaseModel):
+    """Selects the transactions of a bulk operation by ID list or by filter."""
+    ids: Optional[List[int]] = None
+    filter: Optional[TransactionFilter] = None
+
+    @model_validator(mode="after")
+    def check_one_selector(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide exactly one of 'ids' or 'filter'")
+        return self
+
+
+class TransactionBulkUpdate(TransactionBulkSelector):
+    """Schema for applying the same update to many transactions."""
+    changes: TransactionUpdate
+
+
+class TransactionBulkDelete(TransactionBulkSelector):
+    """Schema for deleting many transactions."""
+    pass
+
+
+class BulkOperationResult(BaseModel):
+    """Number of rows touched by a bulk operation."""
+    affected: int
+
+
 # ============== Report Schemas ==============
 
 class ReportSummary(BaseModel):
@@ -175,3 +267,153 @@ class MonthlyReport(BaseModel):
     """Monthly trend report."""
     trends: List[MonthlyTrend]
     summary: ReportSummary
+
+
+class TimeSeriesReport(BaseModel):
+    """
+    Income/expense per time bucket in columnar form.
+    The i-th entry of every list belongs to periods[i]; empty buckets are zero.
+    """
+    bucket: TimeBucket
+    periods: List[date]
+    income: List[float]
+    expense: List[float]
+    balance: List[float]
+
+
+class BalanceHistory(BaseModel):
+    """
+    Running balance per time bucket in columnar form.
+    balance[i] is the closing balance of periods[i]; starting_balance is the
+    balance just before the first bucket (opening balance plus earlier history).
+    """
+    bucket: TimeBucket
+    opening_balance: float
+    starting_balance: float
+    periods: List[date]
+    net: List[float]
+    balance: List[float]
+
+
+class PointInTimeBalance(BaseModel):
+    """Cumulative totals and balance as of a point in time."""
+    at: datetime
+    opening_balance: float
+    total_income: float
+    total_expense: float
+    balance: float
+
+
+class CategoryComparison(BaseModel):
+    """One category's totals in the current and the previous period."""
+    current: CategorySummary
+    previous: CategorySummary
+    delta: float
+    delta_percentage: Optional[float] = None  # None when previous total is 0
+
+
+class ComparisonReport(BaseModel):
+    """Per-category comparison of two periods."""
+    period: ComparisonPeriod
+    offset: int
+    categories: List[CategoryComparison]
+    current: ReportSummary
+    previous: ReportSummary
+
+
+class CategoryDistribution(BaseModel):
+    """
+    Distribution of transaction amounts within one category.
+    histogram[i] counts amounts in the i-th of equal-width buckets
+    spanning [min, max].
+    """
+    category_id: int
+    category_name: str
+    category_type: TransactionType
+    transaction_count: int
+    mean: float
+    median: float
+    p90: float
+    stddev: Optional[float] = None  # None for a single transaction
+    min: float
+    max: float
+    histogram: List[int]
+
+
+class DistributionReport(BaseModel):
+    """Amount distribution per category."""
+    buckets: int
+    categories: List[CategoryDistribution]
+    period_start: Optional[datetime] = None
+    period_end: Optional[datetime] = None
+
+
+class RecurringFlow(BaseModel):
+    """A flow that shows up on the same day of most months."""
+    day_of_month: int
+    amount: float  # Typical net amount (negative for expenses)
+    occurrences: int
+
+
+class ForecastReport(BaseModel):
+    """
+    Projected balance at the next month ends in columnar form.
+    lower/upper bound the 95% confidence band.
+    """
+    months: int
+    current_balance: float
+    dates: List[date]
+    balance: List[float]
+    lower: List[float]
+    upper: List[float]
+    recurring: List[RecurringFlow]
+
+
+class AnomalyResponse(BaseModel):
+    """A flagged transaction."""
+    id: int
+    kind: AnomalyKind
+    score: float
+    detected_at: datetime
+    transaction: TransactionResponse
+    
+    class Config:
+        from_attributes = True
+
+
+# ============== Sync Schemas ==============
+
+class SyncChanges(BaseModel):
+    """
+    Transactions and categories changed after a sequence number.
+    Pass next_since as `since` on the next call; has_more means another
+    page is ready right away.
+    """
+    since: int
+    next_since: int
+    has_more: bool
+    categories: List[CategoryResponse]
+    transactions: List[TransactionResponse]
+    deleted_categories: List[int]
+    deleted_transactions: List[int]
+
+
+# ============== Job Schemas ==============
+
+class JobResponse(BaseModel):
+    """State of a background job."""
+    id: int
+    kind: str
+    status: JobStatus
+    priority: int
+    attempts: int
+    max_attempts: int
+    progress: float
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
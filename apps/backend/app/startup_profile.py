@@ -0,0 +1,103 @@
+"""
+Startup profiler.
+Starts the app in a fresh interpreter under `python -X importtime` and
+reports per-module import time plus the time to import the app, run its
+startup (schema check, warm-up, workers) and serve a first request.
+
+    python -m app.startup_profile [top]
+"""
+import json
+import re
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Written to stderr once app.main is imported; later imports are the profiler's own
+_MARKER = "-- app.main imported --"
+
+_CHILD = f"""
+import json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+print({_MARKER!r}, file=sys.stderr, flush=True)
+from fastapi.testclient import TestClient
+client = TestClient(app.main.app)
+constructing = time.perf_counter()
+with client:
+    ready = time.perf_counter()
+    client.get("/health").raise_for_status()
+    served = time.perf_counter()
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - constructing) * 1000,
+    "first_request_ms": (served - ready) * 1000,
+}}))
+"""
+
+# "import time:  self [us] | cumulative | <indented name>"
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def _parse_imports(stderr: str) -> List[Tuple[str, int, int]]:
+    """(module, self us, cumulative us) of each import made by app.main, in import order."""
+    imports = []
+    for line in stderr.splitlines():
+        if line == _MARKER:
+            break
+        match = _IMPORT_LINE.match(line)
+        if match:
+            imports.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return imports
+
+
+def profile() -> dict:
+    """
+    Profile a cold start of the app.
+
+    Returns:
+        Dict with import_ms, startup_ms, first_request_ms, total_ms and
+        imports: [(module, self us, cumulative us)] of app.main's imports.
+
+    Raises:
+        RuntimeError: If the app fails to start or serve.
+    """
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if child.returncode != 0:
+        raise RuntimeError(f"App failed to start:\n{child.stderr[-4000:]}")
+    timings = json.loads(child.stdout.strip().splitlines()[-1])
+    timings["total_ms"] = timings["import_ms"] + timings["startup_ms"] + timings["first_request_ms"]
+    timings["imports"] = _parse_imports(child.stderr)
+    return timings
+
+
+def report(timings: dict, top: int = 20) -> str:
+    """Format a profile: phase times, slowest packages and slowest modules."""
+    packages: Counter = Counter()
+    for module, self_us, _ in timings["imports"]:
+        packages[module.split(".")[0]] += self_us
+    slowest = sorted(timings["imports"], key=lambda entry: entry[1], reverse=True)[:top]
+
+    lines = [
+        f"Import app.main    {timings['import_ms']:8.1f} ms",
+        f"Startup (lifespan) {timings['startup_ms']:8.1f} ms",
+        f"First request      {timings['first_request_ms']:8.1f} ms",
+        f"Time to first req. {timings['total_ms']:8.1f} ms",
+        "",
+        f"Import time by package (top {top}):",
+    ]
+    lines += [f"  {us / 1000:8.1f} ms  {package}" for package, us in packages.most_common(top)]
+    lines += ["", f"Slowest modules, self time (top {top}):"]
+    lines += [f"  {self_us / 1000:8.1f} ms  {module}" for module, self_us, _ in slowest]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(report(profile(), top=int(sys.argv[1]) if len(sys.argv) > 1 else 20))
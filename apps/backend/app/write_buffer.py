@@ -0,0 +1,111 @@
+"""
+Group commit for transaction creation.
+Request threads hand their insert to a single batching thread, which
+gathers concurrent inserts for a few milliseconds and commits them with
+one multi-row INSERT ... RETURNING, so many requests share one commit
+(and one fsync). Enabled with WRITE_BUFFER_ENABLED.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+from .config import get_settings
+from .database import SessionLocal
+from . import crud, models, schemas
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+_queue: "queue.Queue" = queue.Queue()
+_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
+
+# Queued in place of an entry to stop the batching thread
+_STOP = object()
+
+
+def _collect(first) -> list:
+    """Gather entries arriving within the window after the first one."""
+    batch = [first]
+    deadline = time.monotonic() + settings.WRITE_BUFFER_WINDOW_MS / 1000
+    while len(batch) < settings.WRITE_BUFFER_MAX_BATCH:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            entry = _queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if entry is _STOP:
+            _queue.put(_STOP)  # Stop after this batch
+            break
+        batch.append(entry)
+    return batch
+
+
+def _flush(batch: list) -> None:
+    """Commit a batch and resolve each entry's future with its own outcome."""
+    db = SessionLocal()
+    try:
+        results = crud.create_transactions_batch(db, [(user_id, t) for user_id, t, _ in batch])
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+        return
+    except Exception:
+        db.rollback()
+        logger.exception("Group commit of %d transactions failed, retrying one by one", len(batch))
+    finally:
+        db.close()
+
+    # Isolate the failing entry so the others still succeed
+    for user_id, transaction, future in batch:
+        db = SessionLocal()
+        try:
+            future.set_result(crud.create_transaction(db, transaction, user_id))
+        except Exception as exc:
+            future.set_exception(exc)
+        finally:
+            db.close()
+
+
+def _run() -> None:
+    while True:
+        entry = _queue.get()
+        if entry is _STOP:
+            return
+        _flush(_collect(entry))
+
+
+def create_transaction(
+    transaction: schemas.TransactionCreate,
+    user_id: int
+) -> Optional[models.Transaction]:
+    """
+    Create a transaction through the write buffer; blocks until its batch commits.
+
+    Returns:
+        Created Transaction or None if category doesn't exist
+        (or none could be suggested), like crud.create_transaction.
+    """
+    global _thread
+    with _thread_lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="write-buffer", daemon=True)
+            _thread.start()
+
+    future: Future = Future()
+    _queue.put((user_id, transaction, future))
+    return future.result()
+
+
+def shutdown() -> None:
+    """Commit what is queued and stop the batching thread, if it was started."""
+    global _thread
+    with _thread_lock:
+        if _thread is not None:
+            _queue.put(_STOP)
+            _thread.join()
+            _thread = None
@@ -0,0 +1,105 @@
+"""
+CPU per call of the hot crud lookups: ORM Query (as they were written
+before) against the cached lambda statements in app.crud.
+Runs on an in-memory SQLite database so query execution is cheap and the
+difference is statement construction and compilation.
+
+    cd apps/backend && python -m benchmarks.statements [iterations]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app import crud, models
+from app.database import Base
+
+
+def _legacy_get_user_by_email(db, email):
+    return db.query(models.User).filter(models.User.email == email).first()
+
+
+def _legacy_get_category(db, category_id, user_id):
+    return db.query(models.Category).filter(
+        models.Category.id == category_id,
+        models.Category.user_id == user_id
+    ).first()
+
+
+def _legacy_get_transactions(db, user_id, skip, limit, category_id, start_date, transaction_type):
+    query = db.query(models.Transaction).filter(
+        *crud._transaction_filters(user_id, category_id, start_date)
+    ).join(models.Category).filter(models.Category.type == models.TransactionType(transaction_type))
+    total = query.count()
+    return query.order_by(models.Transaction.date.desc()).offset(skip).limit(limit).all(), total
+
+
+def _seed(db: Session) -> tuple:
+    user = models.User(email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.flush()
+    categories = [
+        models.Category(name=f"Category {i}", type=models.TransactionType.EXPENSE, user_id=user.id)
+        for i in range(5)
+    ]
+    db.add_all(categories)
+    db.flush()
+    start = datetime(2026, 1, 1)
+    db.add_all(
+        models.Transaction(
+            amount=10 + i, description=f"Purchase {i}", date=start + timedelta(days=i % 300),
+            category_id=categories[i % 5].id, user_id=user.id,
+        )
+        for i in range(500)
+    )
+    db.commit()
+    return user.id, categories[0].id, start
+
+
+def _cpu_us(func, iterations: int) -> float:
+    started = time.process_time()
+    for i in range(iterations):
+        func(i)
+    return (time.process_time() - started) / iterations * 1_000_000
+
+
+def main(iterations: int = 2000) -> None:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    with Session(engine, expire_on_commit=False) as db:
+        user_id, category_id, start = _seed(db)
+        cases = [
+            (
+                "get_user_by_email",
+                lambda i: _legacy_get_user_by_email(db, f"user{i % 50}@example.com"),
+                lambda i: crud.get_user_by_email(db, f"user{i % 50}@example.com"),
+            ),
+            (
+                "get_category",
+                lambda i: _legacy_get_category(db, category_id + i % 5, user_id),
+                lambda i: crud.get_category(db, category_id + i % 5, user_id),
+            ),
+            (
+                "get_transactions (filtered)",
+                lambda i: _legacy_get_transactions(db, user_id, i % 5, 20, category_id, start, "expense"),
+                lambda i: crud.get_transactions(
+                    db, user_id, i % 5, 20, category_id, start, transaction_type="expense"
+                ),
+            ),
+        ]
+
+        print(f"{'lookup':<30}{'Query us':>10}{'cached us':>11}{'saved':>8}")
+        for name, legacy, cached in cases:
+            # Warm both paths so the cached side is measured on cache hits
+            legacy(0), cached(0)
+            before = _cpu_us(legacy, iterations)
+            after = _cpu_us(cached, iterations)
+            print(f"{name:<30}{before:>10.1f}{after:>11.1f}{(before - after) / before:>8.0%}")
+            db.expunge_all()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
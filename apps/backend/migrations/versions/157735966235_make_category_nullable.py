@@ -1,7 +1,7 @@
 """make_category_nullable
 
 Revision ID: 157735966235
-Revises: 
+Revises: 202601120000
 Create Date: 2026-01-12 17:01:33.982277
 
 """
@@ -13,7 +13,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision: str = '157735966235'
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = '202601120000'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
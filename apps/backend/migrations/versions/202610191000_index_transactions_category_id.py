@@ -0,0 +1,27 @@
+"""index_transactions_category_id
+
+Revision ID: 202610191000
+Revises: 202601151124
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '202610191000'
+down_revision: Union[str, None] = '202601151124'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Index category_id so merges and ON DELETE SET NULL don't scan the table."""
+    op.create_index(op.f('ix_transactions_category_id'), 'transactions', ['category_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_transactions_category_id'), table_name='transactions')
@@ -0,0 +1,27 @@
+"""index_transactions_user_id_date
+
+Revision ID: 202610191100
+Revises: 202610191000
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '202610191100'
+down_revision: Union[str, None] = '202610191000'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Composite index for per-user, date-bounded report queries."""
+    op.create_index('ix_transactions_user_id_date', 'transactions', ['user_id', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_user_id_date', table_name='transactions')
@@ -0,0 +1,26 @@
+"""add_user_opening_balance
+
+Revision ID: 202610191200
+Revises: 202610191100
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '202610191200'
+down_revision: Union[str, None] = '202610191100'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('opening_balance', sa.Float(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'opening_balance')
@@ -0,0 +1,37 @@
+"""add_balance_checkpoints
+
+Revision ID: 202610191300
+Revises: 202610191200
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '202610191300'
+down_revision: Union[str, None] = '202610191200'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('balance_checkpoints',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('period_start', sa.DateTime(), nullable=False),
+        sa.Column('total_income', sa.Float(), nullable=False),
+        sa.Column('total_expense', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'period_start', name='uq_balance_checkpoints_user_period')
+    )
+    op.create_index(op.f('ix_balance_checkpoints_id'), 'balance_checkpoints', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_balance_checkpoints_id'), table_name='balance_checkpoints')
+    op.drop_table('balance_checkpoints')
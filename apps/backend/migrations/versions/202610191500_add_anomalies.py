@@ -0,0 +1,49 @@
+"""add_anomalies
+
+Revision ID: 202610191500
+Revises: 202610191400
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '202610191500'
+down_revision: Union[str, None] = '202610191400'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('anomalies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('transaction_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.Enum('LARGE_AMOUNT', 'DUPLICATE', name='anomalykind'), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('detected_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('transaction_id', 'kind', name='uq_anomalies_transaction_kind')
+    )
+    op.create_index(op.f('ix_anomalies_id'), 'anomalies', ['id'], unique=False)
+    op.create_index('ix_anomalies_user_id_detected_at', 'anomalies', ['user_id', 'detected_at'], unique=False)
+    op.create_table('job_watermarks',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('job_watermarks')
+    op.drop_index('ix_anomalies_user_id_detected_at', table_name='anomalies')
+    op.drop_index(op.f('ix_anomalies_id'), table_name='anomalies')
+    op.drop_table('anomalies')
+    sa.Enum(name='anomalykind').drop(op.get_bind(), checkfirst=True)
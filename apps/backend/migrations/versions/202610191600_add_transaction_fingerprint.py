@@ -0,0 +1,32 @@
+"""add_transaction_fingerprint
+
+Revision ID: 202610191600
+Revises: 202610191500
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '202610191600'
+down_revision: Union[str, None] = '202610191500'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.create_index(
+        'uq_transactions_user_id_fingerprint', 'transactions', ['user_id', 'fingerprint'],
+        unique=True,
+        postgresql_where=sa.text('fingerprint IS NOT NULL'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_transactions_user_id_fingerprint', table_name='transactions')
+    op.drop_column('transactions', 'fingerprint')
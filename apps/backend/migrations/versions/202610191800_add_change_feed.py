@@ -0,0 +1,44 @@
+"""add_change_feed
+
+Revision ID: 202610191800
+Revises: 202610191700
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '202610191800'
+down_revision: Union[str, None] = '202610191700'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('users', sa.Column('change_seq', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('changes',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.Enum('TRANSACTION', 'CATEGORY', name='changeentity'), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('deleted', sa.Boolean(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('user_id', 'entity', 'entity_id', name='uq_changes_user_entity')
+    )
+    op.create_index(op.f('ix_changes_id'), 'changes', ['id'], unique=False)
+    op.create_index('ix_changes_user_id_seq', 'changes', ['user_id', 'seq'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_changes_user_id_seq', table_name='changes')
+    op.drop_index(op.f('ix_changes_id'), table_name='changes')
+    op.drop_table('changes')
+    sa.Enum(name='changeentity').drop(op.get_bind(), checkfirst=True)
+    op.drop_column('users', 'change_seq')
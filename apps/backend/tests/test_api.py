@@ -1,19 +1,45 @@
 """
 Basic API tests for Finance Manager backend.
 """
+import asyncio
+import json
+import time
+import tracemalloc
 import pytest
+from datetime import datetime
 from fastapi.testclient import TestClient
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
 from app.main import app
-from app.database import Base, engine
+from app.config import get_settings
+from app.database import Base, engine, SessionLocal
+from concurrent.futures import ThreadPoolExecutor
+from app import admission, categorizer, crud, jobs, lifecycle, metrics, models, profiling, schemas, anomalies, startup_profile, write_buffer
+
+# Reports built on date_trunc/generate_series etc. only run against Postgres
+requires_postgres = pytest.mark.skipif(
+    engine.dialect.name != "postgresql", reason="requires PostgreSQL"
+)
+
+# Cold start budget: import, lifespan startup and one request, under -X importtime.
+# Measured 1.6-2.2 s (SQLite, cold and warm page cache); the margin covers slower CI hosts.
+TIME_TO_FIRST_REQUEST_BUDGET_MS = 3500
 
 
 @pytest.fixture(scope="module")
 def client():
-    """Create test client with fresh database."""
+    """Create test client with fresh database, stamped as fully migrated."""
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        migrations = MigrationContext.configure(connection)
+        migrations.stamp(ScriptDirectory(str(lifecycle.BACKEND_DIR / "migrations")), "head")
     with TestClient(app) as c:
         yield c
     Base.metadata.drop_all(bind=engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP TABLE alembic_version")
 
 
 class TestHealthCheck:
@@ -31,6 +57,69 @@ class TestHealthCheck:
         assert response.status_code == 200
         assert response.json()["status"] == "healthy"
 
+    def test_ready_endpoint(self, client):
+        """Test readiness reflects startup/shutdown state, unlike liveness."""
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+
+        lifecycle.set_ready(False)
+        try:
+            assert client.get("/ready").status_code == 503
+            assert client.get("/health").status_code == 200
+        finally:
+            lifecycle.set_ready(True)
+
+    def test_schema_check_rejects_unmigrated_database(self, client):
+        """Test startup refuses a database not at the migrations head."""
+        lifecycle.verify_schema()
+        with engine.begin() as connection:
+            connection.exec_driver_sql("UPDATE alembic_version SET version_num = 'stale'")
+        try:
+            with pytest.raises(RuntimeError, match="stale"):
+                lifecycle.verify_schema()
+        finally:
+            with engine.begin() as connection:
+                connection.execute(
+                    text("UPDATE alembic_version SET version_num = :head"), {"head": lifecycle.schema_head()}
+                )
+
+
+class TestMetrics:
+    """Test the metrics endpoint."""
+
+    def test_statement_cache_hits_are_counted(self, client):
+        """Test repeated lookups are served from the compiled statement cache."""
+        db = SessionLocal()
+        try:
+            crud.get_user_by_email(db, "nobody@example.com")
+            hits = metrics.value("db_statement_cache_total", result="cache_hit")
+            crud.get_user_by_email(db, "someone-else@example.com")
+        finally:
+            db.close()
+        assert metrics.value("db_statement_cache_total", result="cache_hit") == hits + 1
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert "finance_db_statement_cache_hit_ratio " in response.text
+        assert 'finance_db_statement_cache_total{result="cache_hit"}' in response.text
+
+
+class TestStartup:
+    """Test cold start cost."""
+
+    def test_time_to_first_request_within_budget(self, client):
+        """Test a fresh process serves its first request within the budget."""
+        timings = startup_profile.profile()
+        assert timings["total_ms"] < TIME_TO_FIRST_REQUEST_BUDGET_MS, startup_profile.report(timings)
+
+    def test_rarely_used_dependencies_load_lazily(self, client):
+        """Test importing the app doesn't load the OAuth client, migration tooling or NumPy."""
+        imported = {module for module, _, _ in startup_profile.profile()["imports"]}
+        assert "httpx" not in imported
+        assert "alembic" not in imported
+        assert "numpy" not in imported
+
 
 class TestAuthEndpoints:
     """Test authentication endpoints."""
@@ -59,6 +148,22 @@ class TestAuthEndpoints:
         )
         assert response.status_code == 400
 
+    def test_register_duplicate_email_skips_hashing(self, client, monkeypatch):
+        """Test a taken email is rejected before the password is hashed."""
+        client.post(
+            "/auth/register",
+            json={"email": "hashonce@example.com", "password": "testpass123"},
+        )
+        hashed = []
+        hash_password = crud.get_password_hash
+        monkeypatch.setattr(crud, "get_password_hash", lambda password: hashed.append(password) or hash_password(password))
+        response = client.post(
+            "/auth/register",
+            json={"email": "hashonce@example.com", "password": "testpass123"},
+        )
+        assert response.status_code == 400
+        assert hashed == []
+
     def test_login_success(self, client):
         """Test successful login returns token."""
         # Register first
@@ -110,6 +215,43 @@ class TestAuthEndpoints:
         assert response.status_code == 200
         assert response.json()["email"] == "me@example.com"
 
+    def test_update_opening_balance(self, client):
+        """Test setting the stored opening balance on the current user."""
+        client.post(
+            "/auth/register",
+            json={"email": "opening@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "opening@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+        response = client.patch("/auth/me", json={"opening_balance": 250.0}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["opening_balance"] == 250.0
+
+    def test_oauth_upsert_links_local_account(self, client):
+        """Test OAuth sign-in links a local account once and keeps the link."""
+        client.post(
+            "/auth/register",
+            json={"email": "linked@example.com", "password": "testpass123"},
+        )
+        db = SessionLocal()
+        try:
+            user = crud.upsert_oauth_user(db, "linked@example.com", models.OAuthProvider.GOOGLE, "g-1")
+            assert user.oauth_provider == models.OAuthProvider.GOOGLE
+            again = crud.upsert_oauth_user(db, "linked@example.com", models.OAuthProvider.GITHUB, "gh-1")
+            assert again.id == user.id
+            assert again.oauth_provider == models.OAuthProvider.GOOGLE
+            assert again.oauth_id == "g-1"
+
+            created = crud.upsert_oauth_user(db, "newoauth@example.com", models.OAuthProvider.GITHUB, "gh-2")
+            assert created.id != user.id
+            assert created.hashed_password is None
+        finally:
+            db.close()
+
     def test_get_me_unauthenticated(self, client):
         """Test getting current user without token fails."""
         response = client.get("/auth/me")
@@ -177,6 +319,54 @@ class TestCategoryEndpoints:
         response = client.delete(f"/categories/{category_id}", headers=auth_headers)
         assert response.status_code == 204
 
+    def test_merge_category(self, client, auth_headers):
+        """Test merging a category moves its transactions to the target."""
+        source = client.post(
+            "/categories",
+            json={"name": "Gas & Fuel", "type": "expense"},
+            headers=auth_headers,
+        ).json()["id"]
+        target = client.post(
+            "/categories",
+            json={"name": "Transportation", "type": "expense"},
+            headers=auth_headers,
+        ).json()["id"]
+        client.post(
+            "/transactions",
+            json={"amount": 40.0, "date": "2024-01-10T08:00:00", "category_id": source},
+            headers=auth_headers,
+        )
+
+        response = client.post(
+            f"/categories/{source}/merge-into/{target}", headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json()["id"] == target
+
+        assert client.get(f"/categories/{source}", headers=auth_headers).status_code == 404
+        response = client.get(
+            "/transactions", params={"category_id": target}, headers=auth_headers
+        )
+        assert response.json()["total"] == 1
+
+    def test_merge_category_type_mismatch(self, client, auth_headers):
+        """Test merging an income category into an expense one fails."""
+        income = client.post(
+            "/categories",
+            json={"name": "Refund", "type": "income"},
+            headers=auth_headers,
+        ).json()["id"]
+        expense = client.post(
+            "/categories",
+            json={"name": "Shopping", "type": "expense"},
+            headers=auth_headers,
+        ).json()["id"]
+
+        response = client.post(
+            f"/categories/{income}/merge-into/{expense}", headers=auth_headers
+        )
+        assert response.status_code == 400
+
 
 class TestTransactionEndpoints:
     """Test transaction CRUD endpoints."""
@@ -239,6 +429,438 @@ class TestTransactionEndpoints:
         assert "items" in response.json()
         assert "total" in response.json()
 
+    def test_import_auto_categorizes(self, client, auth_and_category):
+        """Test import assigns categories learned from past descriptions."""
+        headers = auth_and_category["headers"]
+        coffee = client.post(
+            "/categories",
+            json={"name": "Coffee", "type": "expense"},
+            headers=headers,
+        ).json()["id"]
+        client.post(
+            "/transactions",
+            json={
+                "amount": 4.5,
+                "description": "Starbucks espresso",
+                "date": "2024-02-01T08:00:00",
+                "category_id": coffee,
+            },
+            headers=headers,
+        )
+
+        response = client.get(
+            "/transactions/suggest-category",
+            params={"description": "STARBUCKS #1234"},
+            headers=headers,
+        )
+        assert response.json()["category_id"] == coffee
+
+        response = client.post(
+            "/transactions/import",
+            json={"items": [
+                {"amount": 3.9, "description": "Starbucks latte", "date": "2024-02-02T08:00:00"},
+                {
+                    "amount": 60.0,
+                    "description": "Market",
+                    "date": "2024-02-02T09:00:00",
+                    "category_id": auth_and_category["category_id"],
+                },
+            ]},
+            headers=headers,
+        )
+        assert response.status_code == 201
+        result = response.json()
+        assert result["created"] == 2
+        assert result["auto_categorized"] == 1
+
+        imported = client.get(f"/transactions/{result['ids'][0]}", headers=headers).json()
+        assert imported["category_id"] == coffee
+
+        response = client.post(
+            "/transactions",
+            json={"amount": 1.0, "description": "zzqx unknown", "date": "2024-02-03T08:00:00"},
+            headers=headers,
+        )
+        assert response.status_code == 400
+
+    def test_suggestions_skip_categories_merged_by_another_worker(self, client, auth_and_category, monkeypatch):
+        """Test a cached index never suggests a category deleted elsewhere."""
+        headers = auth_and_category["headers"]
+        source = client.post(
+            "/categories", json={"name": "Pourover", "type": "expense"}, headers=headers
+        ).json()["id"]
+        client.post(
+            "/transactions",
+            json={
+                "amount": 5.5,
+                "description": "Bluebottle pourover",
+                "date": "2024-02-05T08:00:00",
+                "category_id": source,
+            },
+            headers=headers,
+        )
+        params = {"description": "BLUEBOTTLE"}
+        response = client.get("/transactions/suggest-category", params=params, headers=headers)
+        assert response.json()["category_id"] == source
+
+        # Another worker merges: this worker's index is not told
+        with monkeypatch.context() as patch:
+            patch.setattr(categorizer, "forget", lambda user_id: None)
+            client.post(f"/categories/{source}/merge-into/{auth_and_category['category_id']}", headers=headers)
+
+        response = client.get("/transactions/suggest-category", params=params, headers=headers)
+        assert response.json()["category_id"] == auth_and_category["category_id"]
+        response = client.post(
+            "/transactions",
+            json={"amount": 6.0, "description": "Bluebottle latte", "date": "2024-02-06T08:00:00"},
+            headers=headers,
+        )
+        assert response.status_code == 201
+
+    def test_cached_suggestions_skip_the_database(self, client, auth_and_category):
+        """Test suggestions from a cached index don't query the user's categories."""
+        headers = auth_and_category["headers"]
+        client.post(
+            "/transactions",
+            json={
+                "amount": 3.0,
+                "description": "Corner bakery croissant",
+                "date": "2024-02-07T08:00:00",
+                "category_id": auth_and_category["category_id"],
+            },
+            headers=headers,
+        )
+        user_id = client.get("/auth/me", headers=headers).json()["id"]
+        db = SessionLocal()
+        try:
+            categorizer.suggest(db, user_id, "bakery")  # Warm the cache
+            statements = []
+
+            def record(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement)
+
+            event.listen(engine, "before_cursor_execute", record)
+            try:
+                suggestions = categorizer.suggest_many(db, user_id, ["Bakery bread", "Croissant"])
+            finally:
+                event.remove(engine, "before_cursor_execute", record)
+        finally:
+            db.close()
+
+        assert [s[0] for s in suggestions] == [auth_and_category["category_id"]] * 2
+        assert statements == []
+
+    def test_reimport_skips_duplicates(self, client, auth_and_category):
+        """Test re-importing an overlapping statement skips known lines."""
+        headers = auth_and_category["headers"]
+        line = {
+            "amount": 2.5,
+            "description": "Bus  ticket",
+            "date": "2024-04-01T07:00:00",
+            "category_id": auth_and_category["category_id"],
+        }
+        response = client.post(
+            "/transactions/import", json={"items": [line, line]}, headers=headers
+        )
+        assert response.json()["created"] == 2
+
+        later = {**line, "date": "2024-04-02T07:00:00"}
+        relabeled = {**line, "description": "BUS TICKET"}
+        response = client.post(
+            "/transactions/import",
+            json={"items": [relabeled, line, later]},
+            headers=headers,
+        )
+        result = response.json()
+        assert result["created"] == 1
+        assert result["skipped"] == 2
+        assert result["ids"][:2] == [None, None]
+        assert result["ids"][2] is not None
+
+    def test_idempotent_create_replays_response(self, client, auth_and_category):
+        """Test a retried create with the same Idempotency-Key writes once."""
+        headers = {**auth_and_category["headers"], "Idempotency-Key": "retry-1"}
+        body = {
+            "amount": 12.0,
+            "description": "Retried",
+            "date": "2024-05-01T10:00:00",
+            "category_id": auth_and_category["category_id"],
+        }
+        first = client.post("/transactions", json=body, headers=headers)
+        second = client.post("/transactions", json=body, headers=headers)
+        assert first.status_code == second.status_code == 201
+        assert second.json() == first.json()
+        assert second.headers["Idempotency-Replayed"] == "true"
+
+        response = client.get(
+            "/transactions",
+            params={"start_date": "2024-05-01T00:00:00", "end_date": "2024-05-01T23:59:59"},
+            headers=auth_and_category["headers"],
+        )
+        assert response.json()["total"] == 1
+
+        response = client.post("/transactions", json={**body, "amount": 13.0}, headers=headers)
+        assert response.status_code == 422
+
+    def test_idempotent_write_and_response_commit_together(self, client, auth_and_category, monkeypatch):
+        """Test a failure before the response is stored leaves neither key nor write behind."""
+        headers = {**auth_and_category["headers"], "Idempotency-Key": "crash-1"}
+        body = {
+            "amount": 21.0,
+            "description": "Crashed",
+            "date": "2024-05-02T10:00:00",
+            "category_id": auth_and_category["category_id"],
+        }
+
+        def crash(*args, **kwargs):
+            raise RuntimeError("process died")
+
+        monkeypatch.setattr(crud, "complete_idempotency_key", crash)
+        with pytest.raises(RuntimeError):
+            client.post("/transactions", json=body, headers=headers)
+        monkeypatch.undo()
+
+        response = client.post("/transactions", json=body, headers=headers)
+        assert response.status_code == 201
+        assert "Idempotency-Replayed" not in response.headers
+        response = client.get(
+            "/transactions",
+            params={"start_date": "2024-05-02T00:00:00", "end_date": "2024-05-02T23:59:59"},
+            headers=auth_and_category["headers"],
+        )
+        assert response.json()["total"] == 1
+
+    def test_write_buffer_group_commit(self, client, auth_and_category):
+        """Test concurrent buffered creates each get their own row or None."""
+        user_id = client.get("/auth/me", headers=auth_and_category["headers"]).json()["id"]
+        items = [
+            schemas.TransactionCreate(
+                amount=float(i + 1),
+                date=datetime(2024, 6, 1),
+                category_id=auth_and_category["category_id"] if i else 999999,
+            )
+            for i in range(20)
+        ]
+        try:
+            with ThreadPoolExecutor(max_workers=20) as pool:
+                results = list(pool.map(lambda t: write_buffer.create_transaction(t, user_id), items))
+        finally:
+            write_buffer.shutdown()
+
+        assert results[0] is None
+        assert [t.amount for t in results[1:]] == [float(i + 1) for i in range(1, 20)]
+        assert len({t.id for t in results[1:]}) == 19
+        assert all(t.category.id == auth_and_category["category_id"] for t in results[1:])
+
+    def test_write_buffer_falls_back_to_single_inserts(self, client, auth_and_category, monkeypatch):
+        """Test entries of a failed batch are created one by one and usable after commit."""
+        user_id = client.get("/auth/me", headers=auth_and_category["headers"]).json()["id"]
+
+        def fail(db, entries):
+            raise OperationalError("INSERT", {}, Exception("batch failed"))
+
+        monkeypatch.setattr(crud, "create_transactions_batch", fail)
+        transaction = schemas.TransactionCreate(
+            amount=7.25, date=datetime(2024, 6, 2), category_id=auth_and_category["category_id"]
+        )
+        try:
+            created = write_buffer.create_transaction(transaction, user_id)
+        finally:
+            write_buffer.shutdown()
+
+        response = schemas.TransactionResponse.model_validate(created)
+        assert response.amount == 7.25
+        assert response.category.id == auth_and_category["category_id"]
+
+    def test_bulk_update_transactions(self, client, auth_and_category):
+        """Test recategorizing several transactions by ID in one request."""
+        headers = auth_and_category["headers"]
+        ids = [
+            client.post(
+                "/transactions",
+                json={
+                    "amount": amount,
+                    "date": "2024-03-01T10:00:00",
+                    "category_id": auth_and_category["category_id"],
+                },
+                headers=headers,
+            ).json()["id"]
+            for amount in (5.0, 6.0)
+        ]
+        target = client.post(
+            "/categories",
+            json={"name": "Dining", "type": "expense"},
+            headers=headers,
+        ).json()["id"]
+
+        response = client.patch(
+            "/transactions/bulk",
+            json={"ids": ids, "changes": {"category_id": target}},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert response.json()["affected"] == 2
+
+        response = client.get(
+            "/transactions", params={"category_id": target}, headers=headers
+        )
+        assert sorted(t["id"] for t in response.json()["items"]) == sorted(ids)
+
+    def test_bulk_update_invalid_category(self, client, auth_and_category):
+        """Test bulk update rejects a category the user doesn't own."""
+        response = client.patch(
+            "/transactions/bulk",
+            json={"filter": {}, "changes": {"category_id": 999999}},
+            headers=auth_and_category["headers"],
+        )
+        assert response.status_code == 400
+
+    def test_bulk_requires_one_selector(self, client, auth_and_category):
+        """Test bulk operations need exactly one of ids or filter."""
+        response = client.request(
+            "DELETE",
+            "/transactions/bulk",
+            json={},
+            headers=auth_and_category["headers"],
+        )
+        assert response.status_code == 422
+
+    def test_bulk_delete_transactions_by_filter(self, client, auth_and_category):
+        """Test deleting every transaction matching a filter."""
+        headers = auth_and_category["headers"]
+        for day in ("05", "06", "07"):
+            client.post(
+                "/transactions",
+                json={
+                    "amount": 1.0,
+                    "date": f"2023-06-{day}T10:00:00",
+                    "category_id": auth_and_category["category_id"],
+                },
+                headers=headers,
+            )
+
+        response = client.request(
+            "DELETE",
+            "/transactions/bulk",
+            json={"filter": {
+                "start_date": "2023-06-01T00:00:00",
+                "end_date": "2023-06-30T23:59:59",
+                "type": "expense",
+            }},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert response.json()["affected"] == 3
+
+        response = client.get(
+            "/transactions",
+            params={"start_date": "2023-06-01T00:00:00", "end_date": "2023-06-30T23:59:59"},
+            headers=headers,
+        )
+        assert response.json()["total"] == 0
+
+
+class TestCategoryDeleteCascade:
+    """Test that category deletes leave transactions to ON DELETE SET NULL."""
+
+    @pytest.fixture
+    def auth_and_category(self, client):
+        """Create authenticated user with a category."""
+        client.post(
+            "/auth/register",
+            json={"email": "cascade@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "cascade@example.com", "password": "testpass123"},
+        )
+        token = login_response.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        cat_response = client.post(
+            "/categories",
+            json={"name": "Imported", "type": "expense"},
+            headers=headers,
+        )
+        user_id = client.get("/auth/me", headers=headers).json()["id"]
+
+        return {"headers": headers, "category_id": cat_response.json()["id"], "user_id": user_id}
+
+    def test_delete_category_sets_transactions_uncategorized(self, client, auth_and_category):
+        """Test transactions survive their category's deletion with no category."""
+        headers = auth_and_category["headers"]
+        category_id = auth_and_category["category_id"]
+        before = client.get("/transactions", headers=headers).json()["total"]
+        for amount in (10.0, 20.0):
+            client.post(
+                "/transactions",
+                json={
+                    "amount": amount,
+                    "date": "2024-02-01T10:00:00",
+                    "category_id": category_id,
+                },
+                headers=headers,
+            )
+
+        response = client.delete(f"/categories/{category_id}", headers=headers)
+        assert response.status_code == 204
+
+        response = client.get("/transactions", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["total"] == before + 2
+        assert all(t["category_id"] is None for t in response.json()["items"])
+
+    def test_delete_category_does_not_load_transactions(self, client, auth_and_category):
+        """Test deleting a large category doesn't touch rows one by one or load them."""
+        category_id = auth_and_category["category_id"]
+        user_id = auth_and_category["user_id"]
+
+        db = SessionLocal()
+        db.bulk_insert_mappings(models.Transaction, [
+            {"amount": 1.0, "date": datetime(2024, 1, 1), "category_id": category_id, "user_id": user_id}
+            for _ in range(2000)
+        ])
+        db.commit()
+        db.close()
+
+        # Baseline: what an ORM-side cascade has to materialize first
+        db = SessionLocal()
+        tracemalloc.start()
+        assert len(db.get(models.Category, category_id).transactions) == 2000
+        _, orm_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.close()
+
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        db = SessionLocal()
+        event.listen(engine, "before_cursor_execute", record)
+        tracemalloc.start()
+        try:
+            assert crud.delete_category(db, category_id, user_id)
+            _, delete_peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            event.remove(engine, "before_cursor_execute", record)
+            db.close()
+
+        # A constant number of statements, one of them the category DELETE
+        deletes = [s for s in statements if s.lstrip().upper().startswith("DELETE FROM CATEGORIES")]
+        assert len(deletes) == 1
+        assert len(statements) < 10
+        assert delete_peak * 10 < orm_peak
+
+        db = SessionLocal()
+        orphaned = db.query(models.Transaction).filter(
+            models.Transaction.user_id == user_id,
+            models.Transaction.category_id.is_(None),
+        ).count()
+        db.close()
+        assert orphaned >= 2000
+
 
 class TestReportEndpoints:
     """Test report endpoints."""
@@ -278,3 +900,771 @@ class TestReportEndpoints:
         assert response.status_code == 200
         assert "trends" in response.json()
         assert "summary" in response.json()
+
+    @requires_postgres
+    def test_get_timeseries(self, client, auth_headers):
+        """Test bucketed time series is columnar and zero-filled."""
+        category_id = client.post(
+            "/categories",
+            json={"name": "Utilities", "type": "expense"},
+            headers=auth_headers,
+        ).json()["id"]
+        for day in ("01", "03"):
+            client.post(
+                "/transactions",
+                json={"amount": 10.0, "date": f"2022-05-{day}T12:00:00", "category_id": category_id},
+                headers=auth_headers,
+            )
+
+        response = client.get(
+            "/reports/timeseries",
+            params={
+                "bucket": "day",
+                "start": "2022-05-01T00:00:00",
+                "end": "2022-05-04T00:00:00",
+                "category_ids": [category_id],
+            },
+            headers=auth_headers,
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["periods"] == ["2022-05-01", "2022-05-02", "2022-05-03", "2022-05-04"]
+        assert data["expense"] == [10.0, 0, 10.0, 0]
+        assert data["balance"] == [-10.0, 0, -10.0, 0]
+
+    def test_get_timeseries_rejects_inverted_range(self, client, auth_headers):
+        """Test time series rejects end before start."""
+        response = client.get(
+            "/reports/timeseries",
+            params={"start": "2024-02-01T00:00:00", "end": "2024-01-01T00:00:00"},
+            headers=auth_headers,
+        )
+        assert response.status_code == 400
+
+    @requires_postgres
+    def test_get_balance_history(self, client):
+        """Test running balance starts from opening balance and prior history."""
+        client.post(
+            "/auth/register",
+            json={"email": "balance@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "balance@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        client.patch("/auth/me", json={"opening_balance": 100.0}, headers=headers)
+        income = client.post(
+            "/categories", json={"name": "Salary", "type": "income"}, headers=headers
+        ).json()["id"]
+        expense = client.post(
+            "/categories", json={"name": "Rent", "type": "expense"}, headers=headers
+        ).json()["id"]
+        for amount, date, category_id in (
+            (50.0, "2021-12-15T00:00:00", income),
+            (1000.0, "2022-01-05T00:00:00", income),
+            (400.0, "2022-03-01T00:00:00", expense),
+        ):
+            client.post(
+                "/transactions",
+                json={"amount": amount, "date": date, "category_id": category_id},
+                headers=headers,
+            )
+
+        response = client.get(
+            "/reports/balance-history",
+            params={"bucket": "month", "start": "2022-01-01T00:00:00", "end": "2022-03-31T00:00:00"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["starting_balance"] == 150.0
+        assert data["periods"] == ["2022-01-01", "2022-02-01", "2022-03-01"]
+        assert data["net"] == [1000.0, 0, -400.0]
+        assert data["balance"] == [1150.0, 1150.0, 750.0]
+
+    def test_get_balance_at_tracks_back_dated_writes(self, client):
+        """Test point-in-time balance stays correct when history changes."""
+        client.post(
+            "/auth/register",
+            json={"email": "checkpoint@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "checkpoint@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        user_id = client.get("/auth/me", headers=headers).json()["id"]
+        income = client.post(
+            "/categories", json={"name": "Salary", "type": "income"}, headers=headers
+        ).json()["id"]
+        expense = client.post(
+            "/categories", json={"name": "Food", "type": "expense"}, headers=headers
+        ).json()["id"]
+        for amount, date, category_id in (
+            (1000.0, "2022-01-10T00:00:00", income),
+            (200.0, "2022-02-10T00:00:00", expense),
+            (300.0, "2022-03-10T00:00:00", expense),
+        ):
+            client.post(
+                "/transactions",
+                json={"amount": amount, "date": date, "category_id": category_id},
+                headers=headers,
+            )
+
+        response = client.get(
+            "/reports/balance-at", params={"at": "2022-03-05T00:00:00"}, headers=headers
+        )
+        assert response.status_code == 200
+        assert response.json()["balance"] == 800.0
+
+        response = client.get(
+            "/reports/balance-at", params={"at": "2022-01-31T00:00:00"}, headers=headers
+        )
+        assert response.json()["balance"] == 1000.0
+
+        # Back-dated write only drops checkpoints after it
+        client.post(
+            "/transactions",
+            json={"amount": 50.0, "date": "2022-02-20T00:00:00", "category_id": expense},
+            headers=headers,
+        )
+        db = SessionLocal()
+        periods = [
+            c.period_start for c in db.query(models.BalanceCheckpoint).filter(
+                models.BalanceCheckpoint.user_id == user_id
+            )
+        ]
+        db.close()
+        assert periods == [datetime(2022, 1, 1)]
+
+        response = client.get(
+            "/reports/balance-at", params={"at": "2022-03-31T00:00:00"}, headers=headers
+        )
+        assert response.json()["balance"] == 450.0
+        assert response.json()["total_expense"] == 550.0
+
+    def test_get_comparison_year_over_year(self, client):
+        """Test comparing a month with the same month a year earlier."""
+        client.post(
+            "/auth/register",
+            json={"email": "compare@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "compare@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        category_id = client.post(
+            "/categories", json={"name": "Travel", "type": "expense"}, headers=headers
+        ).json()["id"]
+        for amount, date in (
+            (100.0, "2023-07-04T00:00:00"),
+            (150.0, "2024-07-20T00:00:00"),
+            (999.0, "2024-06-30T00:00:00"),
+        ):
+            client.post(
+                "/transactions",
+                json={"amount": amount, "date": date, "category_id": category_id},
+                headers=headers,
+            )
+
+        response = client.get(
+            "/reports/compare",
+            params={"period": "month", "offset": 12, "date": "2024-07-15T00:00:00"},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["current"]["total_expense"] == 150.0
+        assert data["previous"]["total_expense"] == 100.0
+        [travel] = data["categories"]
+        assert travel["current"]["transaction_count"] == 1
+        assert travel["delta"] == 50.0
+        assert travel["delta_percentage"] == 50.0
+
+    @requires_postgres
+    def test_get_distribution(self, client):
+        """Test per-category percentiles and histogram."""
+        client.post(
+            "/auth/register",
+            json={"email": "distribution@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "distribution@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        category_id = client.post(
+            "/categories", json={"name": "Coffee", "type": "expense"}, headers=headers
+        ).json()["id"]
+        for amount in (1.0, 2.0, 3.0, 4.0, 10.0):
+            client.post(
+                "/transactions",
+                json={"amount": amount, "date": "2024-01-01T00:00:00", "category_id": category_id},
+                headers=headers,
+            )
+
+        response = client.get("/reports/distribution", params={"buckets": 3}, headers=headers)
+        assert response.status_code == 200
+        [coffee] = response.json()["categories"]
+        assert coffee["transaction_count"] == 5
+        assert coffee["median"] == 3.0
+        assert coffee["mean"] == 4.0
+        assert coffee["histogram"] == [3, 1, 1]
+
+    def test_get_forecast(self, client):
+        """Test forecast projects month ends and finds a monthly salary."""
+        client.post(
+            "/auth/register",
+            json={"email": "forecast@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "forecast@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        salary = client.post(
+            "/categories", json={"name": "Salary", "type": "income"}, headers=headers
+        ).json()["id"]
+        today = datetime.utcnow()
+        for months_back in range(1, 6):
+            index = today.year * 12 + today.month - 1 - months_back
+            client.post(
+                "/transactions",
+                json={
+                    "amount": 3000.0,
+                    "date": datetime(index // 12, index % 12 + 1, 1).isoformat(),
+                    "category_id": salary,
+                },
+                headers=headers,
+            )
+
+        response = client.get("/reports/forecast", params={"months": 3}, headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["current_balance"] == 15000.0
+        assert len(data["dates"]) == len(data["balance"]) == 3
+        assert all(lo <= mid <= hi for lo, mid, hi in zip(data["lower"], data["balance"], data["upper"]))
+        assert [r["day_of_month"] for r in data["recurring"]] == [1]
+
+        # Warm cache returns the same forecast
+        assert client.get("/reports/forecast", params={"months": 3}, headers=headers).json() == data
+
+    def test_anomaly_scan(self, client):
+        """Test the incremental scan flags large and duplicate charges once."""
+        client.post(
+            "/auth/register",
+            json={"email": "anomaly@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "anomaly@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        category_id = client.post(
+            "/categories", json={"name": "Lunch", "type": "expense"}, headers=headers
+        ).json()["id"]
+        for day, amount in enumerate((12.0, 11.0, 13.0, 12.5, 11.5, 12.0, 400.0), start=1):
+            client.post(
+                "/transactions",
+                json={"amount": amount, "date": f"2024-04-{day:02d}T12:00:00", "category_id": category_id},
+                headers=headers,
+            )
+        for _ in range(2):
+            client.post(
+                "/transactions",
+                json={
+                    "amount": 9.99,
+                    "description": "Streaming",
+                    "date": "2024-04-20T08:00:00",
+                    "category_id": category_id,
+                },
+                headers=headers,
+            )
+
+        anomalies.run_anomaly_scan(chunk_size=500, settle_seconds=0)
+        # Nothing new since the watermark: a rerun records nothing
+        assert anomalies.run_anomaly_scan(chunk_size=500, settle_seconds=0) == 0
+
+        response = client.get("/reports/anomalies", headers=headers)
+        assert response.status_code == 200
+        flagged = {(a["kind"], a["transaction"]["amount"]) for a in response.json()}
+        assert flagged == {("large_amount", 400.0), ("duplicate", 9.99)}
+
+    def test_anomaly_baseline_uses_earlier_rows_only(self, client):
+        """Test a charge is scored against the rows before it, not the ones after."""
+        client.post(
+            "/auth/register",
+            json={"email": "baseline@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "baseline@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        category_id = client.post(
+            "/categories", json={"name": "Coffee", "type": "expense"}, headers=headers
+        ).json()["id"]
+        # The large charge comes first, so it has no baseline yet
+        for day, amount in enumerate((400.0, 4.0, 4.5, 3.5, 4.0, 4.2, 3.8), start=1):
+            client.post(
+                "/transactions",
+                json={"amount": amount, "date": f"2024-05-{day:02d}T09:00:00", "category_id": category_id},
+                headers=headers,
+            )
+
+        # Rows newer than the settle window wait for a later run
+        assert anomalies.run_anomaly_scan(chunk_size=3, settle_seconds=3600) == 0
+        anomalies.run_anomaly_scan(chunk_size=3, settle_seconds=0)
+
+        response = client.get("/reports/anomalies", params={"kind": "large_amount"}, headers=headers)
+        assert response.status_code == 200
+        assert response.json() == []
+
+
+class _PgError(Exception):
+    """Stands in for a psycopg2 error carrying a SQLSTATE."""
+
+    def __init__(self, pgcode):
+        super().__init__(pgcode)
+        self.pgcode = pgcode
+
+
+class TestQueryBudgets:
+    """Test per-route database timeouts and their error mapping."""
+
+    @pytest.fixture
+    def auth_headers(self, client):
+        """Create authenticated user and return headers."""
+        client.post(
+            "/auth/register",
+            json={"email": "budget@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "budget@example.com", "password": "testpass123"},
+        )
+        token = login_response.json()["access_token"]
+        return {"Authorization": f"Bearer {token}"}
+
+    def test_router_timeouts_apply_to_session(self, client, auth_headers, monkeypatch):
+        """Test the reports router's budget reaches its sessions; others get the default."""
+        seen = {}
+
+        def capture(name, result):
+            def fake(db, *args, **kwargs):
+                seen[name] = db.info["timeouts"]
+                return result
+            return fake
+
+        summary = {"total_income": 0, "total_expense": 0, "balance": 0}
+        monkeypatch.setattr(crud, "get_summary", capture("reports", summary))
+        monkeypatch.setattr(crud, "get_categories", capture("categories", []))
+        assert client.get("/reports/summary", headers=auth_headers).status_code == 200
+        assert client.get("/categories", headers=auth_headers).status_code == 200
+
+        settings = get_settings()
+        assert seen["reports"] == (settings.DB_REPORTS_STATEMENT_TIMEOUT_MS, settings.DB_LOCK_TIMEOUT_MS)
+        assert seen["categories"] == (settings.DB_STATEMENT_TIMEOUT_MS, settings.DB_LOCK_TIMEOUT_MS)
+
+    @pytest.mark.parametrize("pgcode,status_code,kind", [("57014", 504, "statement"), ("55P03", 503, "lock")])
+    def test_timeouts_map_to_clean_errors(self, client, auth_headers, monkeypatch, pgcode, status_code, kind):
+        """Test an exceeded statement/lock timeout becomes a 504/503 and is counted."""
+        def timed_out(*args, **kwargs):
+            raise OperationalError("SELECT 1", {}, _PgError(pgcode))
+
+        monkeypatch.setattr(crud, "get_categories", timed_out)
+        before = metrics.value("db_timeouts_total", kind=kind, route="/categories")
+        response = client.get("/categories", headers=auth_headers)
+        assert response.status_code == status_code
+        if status_code == 503:
+            assert response.headers["Retry-After"] == "1"
+        assert metrics.value("db_timeouts_total", kind=kind, route="/categories") == before + 1
+
+
+class TestAdmission:
+    """Test rate limiting, in-flight limits and load shedding."""
+
+    def test_rate_limit_sheds_with_retry_after(self, client, monkeypatch):
+        """Test a client over its token bucket gets 429 with Retry-After."""
+        monkeypatch.setattr(admission, "buckets", admission.MemoryBuckets(rate=0.5, burst=1))
+        client.post(
+            "/auth/register",
+            json={"email": "admission@example.com", "password": "testpass123"},
+        )
+        response = client.post(
+            "/auth/register",
+            json={"email": "admission2@example.com", "password": "testpass123"},
+        )
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "2"
+        assert client.get("/health").status_code == 200  # Probes are exempt
+
+    def test_shared_buckets_are_shared_between_workers(self, tmp_path):
+        """Test two stores on the same file draw from the same bucket."""
+        path = str(tmp_path / "buckets.db")
+        first = admission.SharedBuckets(path, rate=0.01, burst=2)
+        second = admission.SharedBuckets(path, rate=0.01, burst=2)
+        assert first.take("user:1") == 0
+        assert second.take("user:1") == 0
+        assert first.take("user:1") > 0
+        assert second.take("user:2") == 0
+
+    def test_waiters_admitted_by_priority_within_user_limits(self):
+        """Test queued writes go before reports and a user never exceeds its limit."""
+        async def scenario():
+            limiter = admission.Limiter(global_limit=2, user_limit=1, max_queue=10)
+            assert await limiter.acquire("a", admission.Priority.READ, 1) is None
+            assert await limiter.acquire("b", admission.Priority.READ, 1) is None
+
+            order = []
+
+            async def request(user, priority):
+                result = await limiter.acquire(user, priority, 1)
+                order.append((user, priority, result))
+
+            waiting = [
+                asyncio.create_task(request("c", admission.Priority.REPORT)),
+                asyncio.create_task(request("a", admission.Priority.WRITE)),
+                asyncio.create_task(request("d", admission.Priority.WRITE)),
+            ]
+            await asyncio.sleep(0.01)
+            assert limiter.queued == 3
+
+            limiter.release("b")  # "a" is at its limit, so "d" runs
+            await asyncio.sleep(0.01)
+            assert order == [("d", admission.Priority.WRITE, None)]
+
+            limiter.release("a")  # Then "a"'s write, ahead of the report
+            await asyncio.sleep(0.01)
+            assert order[-1] == ("a", admission.Priority.WRITE, None)
+
+            await asyncio.gather(*waiting)  # Nothing frees up: the report times out
+            assert order[-1] == ("c", admission.Priority.REPORT, "deadline")
+            assert limiter.in_flight == 2 and limiter.queued == 0
+
+        asyncio.run(scenario())
+
+    def test_timed_out_waiters_leave_the_queue(self):
+        """Test waiters that gave up neither fill the queue nor block the fast path."""
+        async def scenario():
+            limiter = admission.Limiter(global_limit=1, user_limit=1, max_queue=2)
+            assert await limiter.acquire("a", admission.Priority.WRITE, 1) is None
+            assert await limiter.acquire("b", admission.Priority.READ, 0.01) == "deadline"
+            assert await limiter.acquire("c", admission.Priority.READ, 0.01) == "deadline"
+            cancelled = asyncio.create_task(limiter.acquire("d", admission.Priority.READ, 1))
+            await asyncio.sleep(0.01)
+            cancelled.cancel()
+            await asyncio.gather(cancelled, return_exceptions=True)
+            assert limiter.queued == 0
+
+            waiting = asyncio.create_task(limiter.acquire("e", admission.Priority.READ, 1))
+            await asyncio.sleep(0.01)
+            assert limiter.queued == 1  # Not "queue_full"
+            limiter.release("a")
+            assert await waiting is None
+            limiter.release("e")
+            assert await limiter.acquire("f", admission.Priority.READ, 1) is None  # Fast path
+            assert limiter.in_flight == 1 and limiter.queued == 0
+
+        asyncio.run(scenario())
+
+    def test_full_queue_sheds_immediately(self):
+        """Test a request finding the queue full is rejected without waiting."""
+        async def scenario():
+            limiter = admission.Limiter(global_limit=1, user_limit=1, max_queue=0)
+            assert await limiter.acquire("a", admission.Priority.WRITE, 1) is None
+            assert await limiter.acquire("b", admission.Priority.WRITE, 1) == "queue_full"
+
+        asyncio.run(scenario())
+
+
+class TestProfiling:
+    """Test opt-in per-request profiling."""
+
+    @pytest.fixture
+    def profile_dir(self, tmp_path, monkeypatch):
+        """Enable profiling with a known token, writing to a temporary directory."""
+        monkeypatch.setattr(profiling.settings, "PROFILE_ADMIN_TOKEN", "profile-secret")
+        monkeypatch.setattr(profiling.settings, "PROFILE_DIR", str(tmp_path))
+        monkeypatch.setattr(profiling.settings, "PROFILE_INTERVAL_MS", 1.0)
+        return tmp_path
+
+    def test_profiled_request_writes_artifact(self, client, profile_dir):
+        """Test a request with the token gets a flamegraph and query trace."""
+        client.post(
+            "/auth/register",
+            json={"email": "profiled@example.com", "password": "testpass123"},
+        )
+        response = client.post(
+            "/auth/login",
+            data={"username": "profiled@example.com", "password": "testpass123"},
+            headers={"X-Profile": "profile-secret", "X-Request-ID": "slow-login-1"},
+        )
+        assert response.status_code == 200
+        assert response.headers["X-Profile-Id"] == "slow-login-1"
+
+        artifact = json.loads((profile_dir / "slow-login-1.json").read_text())
+        assert artifact["path"] == "/auth/login"
+        assert artifact["status"] == 200
+        assert artifact["samples"] > 0
+        assert any("passlib" in line for line in artifact["flamegraph"])  # bcrypt dominates a login
+        assert any("FROM users" in query["statement"] for query in artifact["queries"])
+
+    def test_requests_without_token_are_not_profiled(self, client, profile_dir):
+        """Test a missing or wrong token leaves the request alone."""
+        response = client.get("/health", headers={"X-Profile": "guess"})
+        assert "X-Profile-Id" not in response.headers
+        assert "X-Profile-Id" not in client.get("/health").headers
+        assert list(profile_dir.iterdir()) == []
+
+
+class TestSyncEndpoints:
+    """Test the delta-sync change feed."""
+
+    def test_changes_feed(self, client):
+        """Test the feed returns new rows, tombstones and pages by cursor."""
+        client.post(
+            "/auth/register",
+            json={"email": "sync@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "sync@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+        category_id = client.post(
+            "/categories", json={"name": "Rent", "type": "expense"}, headers=headers
+        ).json()["id"]
+        ids = [
+            client.post(
+                "/transactions",
+                json={"amount": amount, "date": "2024-01-01T00:00:00", "category_id": category_id},
+                headers=headers,
+            ).json()["id"]
+            for amount in (100.0, 200.0, 300.0)
+        ]
+
+        first = client.get("/sync/changes", params={"limit": 2}, headers=headers).json()
+        assert first["has_more"] is True
+        assert [c["id"] for c in first["categories"]] == [category_id]
+        assert [t["id"] for t in first["transactions"]] == ids[:1]
+
+        second = client.get(
+            "/sync/changes", params={"since": first["next_since"]}, headers=headers
+        ).json()
+        assert second["has_more"] is False
+        assert [t["id"] for t in second["transactions"]] == ids[1:]
+
+        cursor = second["next_since"]
+        response = client.get("/sync/changes", params={"since": cursor}, headers=headers)
+        assert response.json()["next_since"] == cursor
+        assert response.json()["transactions"] == []
+
+        client.delete(f"/transactions/{ids[0]}", headers=headers)
+        client.put(f"/transactions/{ids[1]}", json={"amount": 250.0}, headers=headers)
+        latest = client.get("/sync/changes", params={"since": cursor}, headers=headers).json()
+        assert latest["deleted_transactions"] == [ids[0]]
+        assert [(t["id"], t["amount"]) for t in latest["transactions"]] == [(ids[1], 250.0)]
+
+    def test_websocket_pushes_changes(self, client):
+        """Test a write pushes a change event to the user's WebSocket."""
+        client.post(
+            "/auth/register",
+            json={"email": "live@example.com", "password": "testpass123"},
+        )
+        token = client.post(
+            "/auth/login",
+            data={"username": "live@example.com", "password": "testpass123"},
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        category_id = client.post(
+            "/categories", json={"name": "Fuel", "type": "expense"}, headers=headers
+        ).json()["id"]
+
+        with client.websocket_connect(f"/events/ws?token={token}") as websocket:
+            client.post(
+                "/transactions",
+                json={"amount": 40.0, "date": "2024-03-05T12:00:00", "category_id": category_id},
+                headers=headers,
+            )
+            event = websocket.receive_json()
+
+        latest = client.get("/sync/changes", headers=headers).json()["next_since"]
+        assert event == {"type": "change", "seq": latest, "balance_since": "2024-03-05T12:00:00"}
+
+
+class TestJobEndpoints:
+    """Test the background job queue."""
+
+    def test_import_job_runs_in_background(self, client):
+        """Test a queued import is picked up by a worker and reports its result."""
+        client.post(
+            "/auth/register",
+            json={"email": "jobs@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "jobs@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        category_id = client.post(
+            "/categories", json={"name": "Books", "type": "expense"}, headers=headers
+        ).json()["id"]
+
+        response = client.post(
+            "/jobs/imports",
+            json={"items": [
+                {"amount": 9.0, "date": "2024-07-01T00:00:00", "category_id": category_id},
+                {"amount": 11.0, "date": "2024-07-02T00:00:00", "category_id": category_id},
+            ]},
+            headers=headers,
+        )
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            job = client.get(f"/jobs/{job_id}", headers=headers).json()
+            if job["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(0.1)
+
+        assert job["status"] == "succeeded"
+        assert job["progress"] == 1.0
+        assert job["result"]["created"] == 2
+
+    def test_job_not_visible_to_other_users(self, client):
+        """Test a user can't read another user's job."""
+        client.post(
+            "/auth/register",
+            json={"email": "nojobs@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "nojobs@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        db = SessionLocal()
+        try:
+            job_id = db.query(models.Job.id).order_by(models.Job.id).first()[0]
+        finally:
+            db.close()
+        assert client.get(f"/jobs/{job_id}", headers=headers).status_code == 404
+
+    def test_stale_claim_does_not_record_outcome(self, client, monkeypatch):
+        """Test a worker whose lease was taken over leaves the job to the new claim."""
+        monkeypatch.setattr(jobs, "_claim", lambda: None)  # Keep the app's workers out
+        db = SessionLocal()
+        try:
+            # Running under its second claim, with a lease no worker will take over
+            job = models.Job(
+                kind="purge_idempotency_keys", status=models.JobStatus.RUNNING, attempts=2,
+                lease_expires_at=datetime(2100, 1, 1),
+            )
+            db.add(job)
+            db.commit()
+        finally:
+            db.close()
+
+        jobs._execute(job.id, 1)
+        db = SessionLocal()
+        try:
+            job = db.get(models.Job, job.id)
+        finally:
+            db.close()
+        assert job.status == models.JobStatus.RUNNING and job.result is None
+
+        jobs._execute(job.id, 2)
+        db = SessionLocal()
+        try:
+            job = db.get(models.Job, job.id)
+        finally:
+            db.close()
+        assert job.status == models.JobStatus.SUCCEEDED
+
+    def test_import_job_renews_lease_between_batches(self, client, monkeypatch):
+        """Test a long import extends its lease after every batch."""
+        client.post(
+            "/auth/register",
+            json={"email": "leases@example.com", "password": "testpass123"},
+        )
+        login_response = client.post(
+            "/auth/login",
+            data={"username": "leases@example.com", "password": "testpass123"},
+        )
+        headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+        user_id = client.get("/auth/me", headers=headers).json()["id"]
+        category_id = client.post(
+            "/categories", json={"name": "Rent", "type": "expense"}, headers=headers
+        ).json()["id"]
+        items = [
+            {"amount": float(i + 1), "date": "2024-08-01T00:00:00", "category_id": category_id}
+            for i in range(3)
+        ]
+
+        monkeypatch.setattr(jobs, "_claim", lambda: None)  # Keep the app's workers out
+        monkeypatch.setattr(crud, "IMPORT_BATCH_SIZE", 1)
+        renewals = []
+        progress = jobs.JobContext.progress
+
+        def record(context, fraction=None, db=None):
+            renewals.append(fraction)
+            progress(context, fraction, db)
+
+        monkeypatch.setattr(jobs.JobContext, "progress", record)
+        db = SessionLocal()
+        try:
+            job = models.Job(
+                kind="import_transactions", user_id=user_id, payload={"items": items},
+                status=models.JobStatus.RUNNING, attempts=1, lease_expires_at=datetime(2100, 1, 1),
+            )
+            db.add(job)
+            db.commit()
+        finally:
+            db.close()
+
+        jobs._execute(job.id, 1)
+        db = SessionLocal()
+        try:
+            job = db.get(models.Job, job.id)
+        finally:
+            db.close()
+
+        assert renewals == pytest.approx([1 / 3, 2 / 3, 1.0])
+        assert job.status == models.JobStatus.SUCCEEDED
+        assert job.result["created"] == 3
+
+    def test_worker_survives_failed_execution(self, client, monkeypatch):
+        """Test a worker keeps running jobs after one execution raised."""
+        execute = jobs._execute
+        failures = []
+
+        def fail_once(job_id, attempt):
+            if not failures:
+                failures.append(job_id)
+                raise OperationalError("UPDATE jobs", {}, Exception("connection lost"))
+            execute(job_id, attempt)
+
+        monkeypatch.setattr(jobs, "_execute", fail_once)
+        monkeypatch.setattr(jobs.settings, "JOB_LEASE_SECONDS", 1)
+        db = SessionLocal()
+        try:
+            job = jobs.enqueue(db, "purge_idempotency_keys")
+        finally:
+            db.close()
+        deadline = time.monotonic() + 15
+        while job.status != models.JobStatus.SUCCEEDED and time.monotonic() < deadline:
+            time.sleep(0.1)
+            db = SessionLocal()
+            try:
+                job = db.get(models.Job, job.id)
+            finally:
+                db.close()
+
+        assert failures == [job.id]
+        assert job.status == models.JobStatus.SUCCEEDED
+        assert job.attempts == 2
+        assert all(not task.done() for task in jobs._tasks)